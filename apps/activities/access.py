@@ -0,0 +1,170 @@
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils.functional import cached_property
+
+from apps.groups import roles
+from apps.groups.models import Group
+
+from .constants import RequestStatus
+from .models import Activity, Request
+
+
+# Annotations added by `AccessResolver.with_activity_access`
+ACTIVITY_ANNOTATIONS = ('access_group_owner', 'access_request_status')
+
+
+class GroupAccess(object):
+    """ Relationship of a user to a group """
+
+    def __init__(self, group, is_owner=False, is_member=False, is_admin=False):
+        self.group = group
+        self.is_owner = is_owner
+        self.is_member = is_member
+        self.is_admin = is_admin
+
+    @property
+    def can_view(self):
+        """ Owner or approved member """
+        return self.is_owner or self.is_member
+
+    @property
+    def can_preview(self):
+        """ Public groups without approval can be seen by everyone """
+        return self.can_view or (self.group.public and not self.group.needs_approval)
+
+    @property
+    def can_edit(self):
+        return self.is_owner or self.is_admin
+
+
+class ActivityAccess(object):
+    """ Relationship of a user to an activity and its group """
+
+    def __init__(self, activity, is_owner=False, is_group_owner=False, is_member=False,
+                 is_admin=False, request_status=None):
+        self.activity = activity
+        self.is_owner = is_owner
+        self.is_group_owner = is_group_owner
+        self.is_member = is_member
+        self.is_admin = is_admin
+        self.request_status = request_status
+
+    @property
+    def can_view(self):
+        """ Same rules as `ActivityQuerySet.visible_to` """
+        if self.activity.is_deleted:
+            return False
+
+        return self.activity.public or \
+            self.is_owner or \
+            self.is_group_owner or \
+            self.is_member or \
+            self.request_status in (RequestStatus.PENDING, RequestStatus.APPROVED)
+
+    @property
+    def can_edit(self):
+        return self.is_owner
+
+    @property
+    def can_moderate(self):
+        """ Owner of the activity or owner/admin of its group """
+        return self.is_owner or self.is_group_owner or self.is_admin
+
+
+class AccessResolver(object):
+    """
+    Loads the relationship of a user to activities and groups
+
+    Memberships come from the cached roles map, see `apps.groups.roles`, read once per resolver.
+    Groups are resolved from the map and their own row alone, so only activities have access annotations.
+    Every activity costs at most one query, none when it was fetched with `with_activity_access`,
+    and is remembered afterwards. Use `get_access(user)` to share the resolver for the rest of the request
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._activities = {}
+        self._groups = {}
+
+    @property
+    def user_id(self):
+        return self.user.pk if self.user.is_authenticated else None
+
+    @cached_property
+    def roles(self):
+        return roles.get_roles(self.user_id)
+
+    def with_activity_access(self, queryset):
+        """ Annotate the user's relationship to the activities """
+        if self.user_id is None:
+            return queryset
+
+        requests = Request.objects.filter(
+            activity=OuterRef('pk'),
+            user=self.user_id,
+            is_deleted=False).order_by('-created_at')
+
+        return queryset.annotate(
+            access_group_owner=Exists(
+                Group.objects.filter(pk=OuterRef('group'), user=self.user_id, is_deleted=False)),
+            access_request_status=Subquery(requests.values('status')[:1]))
+
+    def activity(self, activity):
+        """ :return ActivityAccess """
+        if activity.pk not in self._activities:
+            values = self._load(activity)
+            member, admin = self._get_role(activity.group_id)
+
+            self._activities[activity.pk] = ActivityAccess(
+                activity,
+                is_owner=self.user_id is not None and activity.user_id == self.user_id,
+                is_group_owner=bool(values.get('access_group_owner')),
+                is_member=member,
+                is_admin=admin,
+                request_status=values.get('access_request_status'))
+
+        return self._activities[activity.pk]
+
+    def group(self, group):
+        """ :return GroupAccess """
+        if group.pk not in self._groups:
+            member, admin = self._get_role(group.pk)
+
+            self._groups[group.pk] = GroupAccess(
+                group,
+                is_owner=self.user_id is not None and group.user_id == self.user_id,
+                is_member=member,
+                is_admin=admin)
+
+        return self._groups[group.pk]
+
+    def _get_role(self, group_id):
+        """ :return (approved member, approved admin) """
+        if self.user_id is None or group_id is None:
+            return False, False
+
+        return roles.get_flags(self.roles.get(group_id, None))
+
+    def _load(self, activity):
+        if self.user_id is None:
+            return {}
+
+        if all(hasattr(activity, name) for name in ACTIVITY_ANNOTATIONS):
+            return {name: getattr(activity, name) for name in ACTIVITY_ANNOTATIONS}
+
+        queryset = self.with_activity_access(Activity.objects.filter(pk=activity.pk))
+
+        return queryset.values(*ACTIVITY_ANNOTATIONS).first() or {}
+
+
+def get_access(user):
+    """
+    Access resolver of the user
+
+    Kept on the user object, which lives as long as the request, like Django's permission cache
+    """
+    try:
+        return user._access_resolver
+    except AttributeError:
+        user._access_resolver = AccessResolver(user)
+
+        return user._access_resolver
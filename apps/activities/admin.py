@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from .models import (
     ActivityType,
+    ActivityVisibility,
     GroupActivity,
     IndividualActivity,
     Request)
@@ -68,7 +69,24 @@ class RequestAdmin(admin.ModelAdmin):
     ]
 
 
+class ActivityVisibilityAdmin(admin.ModelAdmin):
+    list_display = [
+        '__str__',
+        'reason',
+    ]
+
+    list_filter = [
+        'reason',
+    ]
+
+    raw_id_fields = [
+        'activity',
+        'user'
+    ]
+
+
 admin.site.register(ActivityType, ActivityTypeAdmin)
 admin.site.register(IndividualActivity, ActivityAdmin)
 admin.site.register(GroupActivity, ActivityAdmin)
 admin.site.register(Request, RequestAdmin)
+admin.site.register(ActivityVisibility, ActivityVisibilityAdmin)
@@ -13,3 +13,28 @@ class RequestStatus:
 class ActivityFormat:
     INDIVIDUAL = 'individual'
     GROUP = 'group'
+
+
+class NearbySearch:
+    """ Limits of the nearby activities search, distances are in kilometers """
+    INITIAL_RADIUS = 1
+    DEFAULT_RADIUS = 50
+    MAX_RADIUS = 200
+
+    DEFAULT_K = 20
+    MAX_K = 100
+
+
+class VisibilityReason:
+    """ Why a user can see a private activity, see `apps.activities.visibility` """
+    OWNER = 'owner'
+    GROUP_OWNER = 'group_owner'
+    MEMBER = 'member'
+    REQUEST = 'request'
+
+    CHOICES = (
+        (OWNER, 'Owner'),
+        (GROUP_OWNER, 'Group owner'),
+        (MEMBER, 'Group member'),
+        (REQUEST, 'Requested to join'),
+    )
@@ -0,0 +1,84 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.activities.spatial_index import ActivityIndex
+
+
+class Command(BaseCommand):
+    help = 'Measure memory footprint and query latency of the activity index on generated activities'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[100000, 1000000],
+            help='Numbers of indexed activities')
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=1000)
+        parser.add_argument(
+            '--distance',
+            type=float,
+            default=10,
+            help='Search distance in kilometers')
+        parser.add_argument(
+            '--k',
+            type=int,
+            default=20)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        tomorrow = timezone.now() + datetime.timedelta(days=1)
+
+        # activities are spread over Europe, the queries land among them
+        def location():
+            return generator.uniform(36, 70), generator.uniform(-10, 30)
+
+        for size in options['sizes']:
+            rows = [(pk,) + location() + (tomorrow,) for pk in range(1, size + 1)]
+            index = ActivityIndex(max_age=float('inf'))
+
+            start = time.perf_counter()
+            index.load(rows)
+            build_time = time.perf_counter() - start
+
+            memory = sum(
+                array.nbytes for array in (
+                    index.geohashes, index.pks, index.latitudes, index.longitudes, index.times))
+
+            del rows
+
+            # keep the benchmark off the cache and the database
+            index.is_stale = lambda: False
+
+            queries = [location() for _ in range(options['queries'])]
+            latencies = []
+            found = 0
+
+            for latitude, longitude in queries:
+                start = time.perf_counter()
+                results = index.query(latitude, longitude, options['distance'], k=options['k'])
+                latencies.append(time.perf_counter() - start)
+                found += len(results)
+
+            latencies.sort()
+
+            self.stdout.write(
+                '{size:>9} activities: build {build:.2f}s, memory {memory:.1f}MB, '
+                'query p50 {p50:.3f}ms, p99 {p99:.3f}ms, {found:.1f} results per query'.format(
+                    size=size,
+                    build=build_time,
+                    memory=memory / 1024 / 1024,
+                    p50=latencies[len(latencies) // 2] * 1000,
+                    p99=latencies[int(len(latencies) * 0.99)] * 1000,
+                    found=found / len(queries)))
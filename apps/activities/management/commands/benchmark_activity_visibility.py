@@ -0,0 +1,128 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.activities import visibility
+from apps.activities.constants import RequestStatus
+from apps.activities.models import Activity, ActivityVisibility, Request
+from apps.groups.models import Group, Membership
+from apps.users.models import User
+from apps.utils.management.transactions import rolled_back
+
+
+class Command(BaseCommand):
+    help = 'Compare activity visibility read from the materialized table with joining requests and memberships'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--activities', type=int, default=50000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument('--samples', type=int, default=200, help='Users measured')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+
+        # the generated data is not kept
+        with rolled_back():
+            self.run(options, generator)
+
+    def run(self, options, generator):
+        start = time.perf_counter()
+        users, activities = self.seed(options, generator)
+        self.stdout.write('Seeded {requests} requests in {elapsed:.1f}s'.format(
+            requests=options['requests'], elapsed=time.perf_counter() - start))
+
+        # bulk inserts do not send signals
+        start = time.perf_counter()
+        inserted, deleted = visibility.rebuild()
+        self.stdout.write('Rebuilt {rows} visibility rows in {elapsed:.1f}s'.format(
+            rows=inserted, elapsed=time.perf_counter() - start))
+
+        sample_users = generator.sample(users, min(options['samples'], len(users)))
+        pairs = [(user, generator.choice(activities)) for user in sample_users]
+
+        for materialized in (False, True):
+            with override_settings(ACTIVITY_VISIBILITY_MATERIALIZED=materialized):
+                start = time.perf_counter()
+
+                for user in sample_users:
+                    Activity.objects.visible_to(user).order_by('-time')[:20].count()
+
+                list_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+
+                for user, activity in pairs:
+                    visibility.is_visible(user, activity)
+
+                check_time = time.perf_counter() - start
+
+            self.stdout.write('{label}: {list:.2f}ms per visible list, {check:.2f}ms per access check'.format(
+                label='Materialized' if materialized else 'Joined',
+                list=list_time / len(sample_users) * 1e3,
+                check=check_time / len(pairs) * 1e3))
+
+        # incremental maintenance of a single save
+        start = time.perf_counter()
+
+        for user, activity in pairs:
+            Request.objects.create(user=user, activity=activity, status=RequestStatus.PENDING)
+
+        self.stdout.write('Request save with the visibility refresh: {:.2f}ms'.format(
+            (time.perf_counter() - start) / len(pairs) * 1e3))
+
+    def seed(self, options, generator):
+        users = User.objects.bulk_create(
+            [
+                User(email='visibility{}@benchmark.gymder.com'.format(i), password='!')
+                for i in range(options['users'])
+            ])
+        users = list(User.objects.filter(email__endswith='@benchmark.gymder.com'))
+
+        groups = Group.objects.bulk_create(
+            [
+                Group(title='Benchmark {}'.format(i), user=generator.choice(users), public=False)
+                for i in range(options['groups'])
+            ])
+        groups = list(Group.objects.filter(title__startswith='Benchmark '))
+
+        Membership.objects.bulk_create(
+            [
+                Membership(group=group, user=user, status=RequestStatus.APPROVED)
+                for group in groups
+                for user in generator.sample(users, min(20, len(users)))
+            ],
+            ignore_conflicts=True)
+
+        # multi-table children can not be bulk created, the parent table is enough here
+        Activity.objects.bulk_create(
+            [
+                Activity(
+                    title='Benchmark {}'.format(i),
+                    user=generator.choice(users),
+                    group=generator.choice(groups) if generator.random() < 0.3 else None,
+                    public=generator.random() < 0.5)
+                for i in range(options['activities'])
+            ])
+        activities = list(Activity.objects.filter(title__startswith='Benchmark '))
+
+        statuses = [RequestStatus.APPROVED, RequestStatus.PENDING, RequestStatus.DENIED]
+        batch = []
+
+        for i in range(options['requests']):
+            batch.append(Request(
+                user=generator.choice(users),
+                activity=generator.choice(activities),
+                status=generator.choice(statuses)))
+
+            if len(batch) == 10000:
+                Request.objects.bulk_create(batch)
+                batch = []
+
+        Request.objects.bulk_create(batch)
+
+        return users, activities
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.activities import visibility
+from apps.activities.models import Activity
+
+
+class Command(BaseCommand):
+    help = 'Compare the activity visibility table with the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Activities compared at a time')
+        parser.add_argument('--fix', action='store_true', help='Refresh the activities which differ')
+        parser.add_argument('--show', type=int, default=10, help='Differing rows to print')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Activity.objects.order_by('pk').values_list('pk', flat=True))
+
+        missing = set()
+        stale = set()
+
+        for start in range(0, len(ids), batch_size):
+            batch_missing, batch_stale = visibility.diff(activity_ids=ids[start:start + batch_size])
+            missing |= batch_missing
+            stale |= batch_stale
+
+        for label, rows in (('Missing', missing), ('Stale', stale)):
+            self.stdout.write('{label}: {count}'.format(label=label, count=len(rows)))
+
+            for user_id, activity_id, reason in sorted(rows)[:options['show']]:
+                self.stdout.write('  user {} activity {} {}'.format(user_id, activity_id, reason))
+
+        if not missing and not stale:
+            self.stdout.write('Activity visibility is consistent')
+            return
+
+        if not options['fix']:
+            raise CommandError('Activity visibility is inconsistent, run with --fix to refresh it')
+
+        activity_ids = sorted(set(activity_id for user_id, activity_id, reason in missing | stale))
+
+        for start in range(0, len(activity_ids), batch_size):
+            visibility.refresh(activity_ids=activity_ids[start:start + batch_size])
+
+        self.stdout.write('Refreshed {} activities'.format(len(activity_ids)))
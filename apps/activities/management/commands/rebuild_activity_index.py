@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.activities.spatial_index import activity_index, bump_index_version
+from apps.utils.shared_cache import is_shared
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the in-process activity index in every worker sharing the cache'
+
+    def handle(self, *args, **options):
+        if not is_shared():
+            # the version would only change in this process
+            raise CommandError(
+                'The cache is not shared with the workers, set CACHE_LOCATION. '
+                'Workers rebuild their index once it is older than ACTIVITY_INDEX_MAX_AGE')
+
+        start = time.perf_counter()
+        activity_index.build()
+        elapsed = time.perf_counter() - start
+
+        # workers read the version every ACTIVITY_INDEX_CHECK_INTERVAL and rebuild when it changed
+        bump_index_version()
+
+        self.stdout.write(
+            'Indexed {count} activities in {elapsed:.3f}s, workers will rebuild within {interval}s'.format(
+                count=len(activity_index), elapsed=elapsed, interval=settings.ACTIVITY_INDEX_CHECK_INTERVAL))
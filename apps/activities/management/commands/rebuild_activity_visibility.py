@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.activities import visibility
+
+
+class Command(BaseCommand):
+    help = 'Recompute the activity visibility table from activities, groups, memberships and requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Activities refreshed at a time')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        inserted, deleted = visibility.rebuild(batch_size=options['batch_size'])
+
+        self.stdout.write('Inserted {inserted} and deleted {deleted} rows in {elapsed:.3f}s'.format(
+            inserted=inserted, deleted=deleted, elapsed=time.perf_counter() - start))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.activities.models import Activity
+from apps.activities.search import is_full_text_supported, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Recompute the full-text search vectors of all activities (Postgres only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if not is_full_text_supported():
+            raise CommandError('Full-text search needs Postgres, other databases search with icontains')
+
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        ids = list(Activity.objects.order_by('pk').values_list('pk', flat=True))
+
+        for i in range(0, len(ids), batch_size):
+            update_search_vectors(ids[i:i + batch_size])
+
+        self.stdout.write('Updated {count} activities in {elapsed:.3f}s'.format(
+            count=len(ids), elapsed=time.perf_counter() - start))
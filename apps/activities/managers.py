@@ -1,6 +1,135 @@
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models import Q
+from django.db.models.query import ModelIterable
 
+from .constants import RequestStatus
 
-class ActivityManager(models.Manager):
+
+def get_subclass_relations(model):
+    """ Names of the reverse relations to the multi-table children of the model """
+    return [
+        relation.get_accessor_name()
+        for relation in model._meta.related_objects
+        if relation.one_to_one and relation.parent_link
+    ]
+
+
+def get_loaded_subclass(instance, relations):
+    """
+    Return the child loaded together with the instance or None when it has no child
+    Relations have to be selected with `select_related`, otherwise every call queries
+    """
+    for relation in relations:
+        try:
+            return getattr(instance, relation)
+        except ObjectDoesNotExist:
+            continue
+
+    return None
+
+
+class SubclassModelIterable(ModelIterable):
+    """ Yields the child of every row instead of the parent model """
+
+    def __iter__(self):
+        queryset = self.queryset
+        relations = get_subclass_relations(queryset.model)
+        annotations = list(queryset.query.annotation_select)
+
+        for instance in super().__iter__():
+            child = get_loaded_subclass(instance, relations)
+
+            if child is None:
+                yield instance
+                continue
+
+            # relations and annotations were loaded on the parent
+            for name, value in instance._state.fields_cache.items():
+                if name not in relations:
+                    child._state.fields_cache.setdefault(name, value)
+
+            for name in annotations:
+                setattr(child, name, getattr(instance, name))
+
+            yield child
+
+
+class ActivityQuerySet(models.QuerySet):
     def only_active(self):
         return self.exclude(is_deleted=True)
+
+    def visible_to(self, user):
+        """
+        Activities the user can see, in a single query:
+        own and public ones, activities of groups the user owns or is an approved member of
+        and activities the user asked to join
+
+        Reads the materialized `ActivityVisibility` table with `ACTIVITY_VISIBILITY_MATERIALIZED`
+        """
+        from apps.groups.models import Group, Membership
+        from .models import ActivityVisibility, Request
+
+        if settings.ACTIVITY_VISIBILITY_MATERIALIZED:
+            visible = ActivityVisibility.objects.filter(user=user).values('activity')
+
+            return self.filter(Q(public=True) | Q(pk__in=visible), is_deleted=False)
+
+        owned_groups = Group.objects.filter(user=user, is_deleted=False).values('pk')
+        member_groups = Membership.objects.filter(
+            user=user,
+            is_deleted=False,
+            status=RequestStatus.APPROVED,
+            group__is_deleted=False).values('group')
+        requested = Request.objects.filter(
+            user=user,
+            is_deleted=False,
+            status__in=[RequestStatus.PENDING, RequestStatus.APPROVED]).values('activity')
+
+        return self.filter(
+            Q(user=user) |
+            Q(public=True) |
+            Q(group__in=owned_groups) |
+            Q(group__in=member_groups) |
+            Q(pk__in=requested),
+            is_deleted=False)
+
+    def search(self, query):
+        """ Full-text search on Postgres, see `apps.activities.search` """
+        from .search import search_activities
+
+        return search_activities(self, query)
+
+    def with_subclasses(self):
+        """
+        Return `IndividualActivity` and `GroupActivity` instances instead of `Activity`
+        Child tables are left joined, so it is still a single query
+        """
+        relations = get_subclass_relations(self.model)
+
+        if not relations:
+            return self
+
+        queryset = self.select_related(*relations)
+        queryset._iterable_class = SubclassModelIterable
+
+        return queryset
+
+
+class ActivityManager(models.Manager):
+    def get_queryset(self):
+        return ActivityQuerySet(self.model, using=self._db)
+
+    def only_active(self):
+        return self.get_queryset().only_active()
+
+    def visible_to(self, user):
+        return self.get_queryset().visible_to(user)
+
+    def with_subclasses(self):
+        return self.get_queryset().with_subclasses()
+
+    def get_subclass(self, *args, **kwargs):
+        """ Get the activity as `IndividualActivity` or `GroupActivity` in one query """
+        return self.with_subclasses().get(*args, **kwargs)
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:07
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+INDEX_NAME = 'activities_activity_search_vector_gin'
+
+
+def create_search_index(apps, schema_editor):
+    # GIN indexes and tsvector only exist in Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        'CREATE INDEX {} ON activities_activity USING gin (search_vector)'.format(INDEX_NAME))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS {}'.format(INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0008_auto_20191216_1825'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
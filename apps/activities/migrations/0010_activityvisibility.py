@@ -0,0 +1,64 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_visibility(apps, schema_editor):
+    Activity = apps.get_model('activities', 'Activity')
+    Request = apps.get_model('activities', 'Request')
+    ActivityVisibility = apps.get_model('activities', 'ActivityVisibility')
+
+    sources = (
+        ('owner', Activity.objects.filter(is_deleted=False), 'pk', 'user_id'),
+        (
+            'group_owner',
+            Activity.objects.filter(is_deleted=False, group__is_deleted=False, group__user__isnull=False),
+            'pk', 'group__user_id'),
+        (
+            'member',
+            Activity.objects.filter(
+                is_deleted=False,
+                group__memberships__is_deleted=False,
+                group__memberships__status='approved'),
+            'pk', 'group__memberships__user_id'),
+        (
+            'request',
+            Request.objects.filter(
+                is_deleted=False, activity__is_deleted=False, status__in=['pending', 'approved']),
+            'activity_id', 'user_id'),
+    )
+
+    for reason, queryset, activity_field, user_field in sources:
+        rows = [
+            ActivityVisibility(user_id=user_id, activity_id=activity_id, reason=reason)
+            for activity_id, user_id in queryset.values_list(activity_field, user_field).iterator()
+        ]
+        ActivityVisibility.objects.bulk_create(rows, batch_size=300, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0009_activity_search_vector'),
+        ('groups', '0002_auto_20191111_2107'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityVisibility',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('owner', 'Owner'), ('group_owner', 'Group owner'), ('member', 'Group member'), ('request', 'Requested to join')], max_length=12)),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibilities', to='activities.Activity')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visible_activities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Activity visibilities',
+                'unique_together': {('user', 'activity', 'reason')},
+            },
+        ),
+        migrations.RunPython(fill_visibility, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0010_activityvisibility'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['time', 'id'], name='activities__time_60f4f6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['group', 'time', 'id'], name='activities__group_i_2d2d43_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0011_auto_20261018_1115'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['public', 'time'], name='activity_public_time_live'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['activity', 'user', 'status'], name='request_activity_user_live'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['user', 'status'], name='request_user_status_live'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_approved_counts(apps, schema_editor):
+    Activity = apps.get_model('activities', 'Activity')
+    Request = apps.get_model('activities', 'Request')
+
+    counts = Request.objects.filter(
+        activity=OuterRef('pk'),
+        status='approved',
+        is_deleted=False).order_by().values('activity').annotate(count=Count('pk')).values('count')
+
+    Activity.objects.update(approved_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0012_auto_20261018_1121'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='approved_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_approved_counts, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,21 @@
 from decimal import Decimal
 
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.dispatch import receiver
-from django.db.models.signals import pre_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
 
+from apps.groups.models import Group, Membership
 from apps.utils.constants import Currencies
-from apps.utils.models import BaseModel, Tag, Address
+from apps.utils.counters import Counter, CounterFieldsMixin
+from apps.utils.models import BaseModel, Tag, Address, touches
 from apps.users.models import User
 
-from .constants import RequestStatus, ActivityFormat
-from .managers import ActivityManager
+from .constants import RequestStatus, ActivityFormat, VisibilityReason
+from .managers import ActivityManager, get_loaded_subclass, get_subclass_relations
 
 
 class ActivityType(BaseModel):
@@ -28,7 +31,7 @@ class ActivityType(BaseModel):
         return self.title
 
 
-class Activity(BaseModel):
+class Activity(CounterFieldsMixin, BaseModel):
     title = models.CharField(max_length=100)
     description = models.TextField(null=True, blank=True)
     is_group = models.BooleanField(default=False)
@@ -77,8 +80,27 @@ class Activity(BaseModel):
     public = models.BooleanField(default=True)
     needs_approval = models.BooleanField(default=True)
 
+    # title, description, tags and address, kept up to date on Postgres only
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # approved requests which are not deleted, see `APPROVED_REQUESTS`
+    approved_count = models.PositiveIntegerField(default=0, editable=False)
+
     objects = ActivityManager()
     FORMAT = None
+    counter_fields = ('approved_count',)
+
+    class Meta:
+        indexes = [
+            # keyset pagination orderings
+            models.Index(fields=('time', 'id')),
+            models.Index(fields=('group', 'time', 'id')),
+            # upcoming public activities
+            models.Index(
+                fields=('public', 'time'),
+                name='activity_public_time_live',
+                condition=models.Q(is_deleted=False)),
+        ]
 
     def __str__(self):
         return self.title
@@ -86,13 +108,20 @@ class Activity(BaseModel):
     @cached_property
     def child(self):
         """ Get subchild of the activity """
-        try:
-            activity = GroupActivity.objects.get(uuid=self.uuid)
-        except:
-            try:
-                activity = IndividualActivity.objects.get(uuid=self.uuid)
-            except:
-                activity = None
+        if self.FORMAT is not None:
+            return self
+
+        relations = get_subclass_relations(Activity)
+
+        # joined by `with_subclasses` or `select_related`
+        if all(relation in self._state.fields_cache for relation in relations):
+            return get_loaded_subclass(self, relations)
+
+        activity = Activity.objects.get_subclass(pk=self.pk)
+
+        if activity.FORMAT is None:
+            return None
+
         return activity
 
     @cached_property
@@ -105,10 +134,14 @@ class Activity(BaseModel):
         else:
             return RequestStatus.APPROVED
 
-    @cached_property
+    @property
     def number_of_attendees(self):
-        return self.requests.filter(
-            is_deleted=False, status=RequestStatus.APPROVED).count()
+        return self.approved_count
+
+    @property
+    def is_full(self):
+        """ Individual activities take one attendee """
+        return self.number_of_attendees >= getattr(self, 'max_attendees', 1)
 
 
 class IndividualActivity(Activity):
@@ -148,6 +181,61 @@ def my_handler(sender, instance, *args, **kwargs):
         instance.is_group = True
 
 
+@receiver(post_save, sender=IndividualActivity)
+@receiver(post_save, sender=GroupActivity)
+def update_activity_index(sender, instance, *args, **kwargs):
+    from .spatial_index import activity_index
+
+    activity_index.update_activity(instance)
+
+
+@receiver(post_delete, sender=IndividualActivity)
+@receiver(post_delete, sender=GroupActivity)
+def remove_from_activity_index(sender, instance, *args, **kwargs):
+    from .spatial_index import activity_index
+
+    activity_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Address)
+def update_activity_index_address(sender, instance, created=False, *args, **kwargs):
+    from .spatial_index import activity_index
+
+    # new addresses do not have activities yet
+    if not created:
+        activity_index.update_address(instance)
+
+
+@receiver(post_save, sender=IndividualActivity)
+@receiver(post_save, sender=GroupActivity)
+def update_activity_search_vector(sender, instance, *args, **kwargs):
+    from .search import update_search_vectors
+
+    update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Activity.tags.through)
+def update_tags_search_vector(sender, instance, action, reverse=False, pk_set=None, *args, **kwargs):
+    from .search import update_search_vectors
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        update_search_vectors([instance.pk])
+    elif pk_set:
+        # tag side, the changed activities are in the set
+        update_search_vectors(pk_set)
+
+
+@receiver(post_save, sender=Address)
+def update_address_search_vector(sender, instance, created=False, *args, **kwargs):
+    from .search import update_search_vectors
+
+    if not created:
+        update_search_vectors(instance.activities.values_list('pk', flat=True))
+
+
 class Request(BaseModel):
     activity = models.ForeignKey(
         Activity,
@@ -165,6 +253,109 @@ class Request(BaseModel):
     
     message = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # access checks and attendee counts
+            models.Index(
+                fields=('activity', 'user', 'status'),
+                name='request_activity_user_live',
+                condition=models.Q(is_deleted=False)),
+            # activities the user asked to join
+            models.Index(
+                fields=('user', 'status'),
+                name='request_user_status_live',
+                condition=models.Q(is_deleted=False)),
+        ]
+
     def __str__(self):
         return '{user} - {activity}'.format(
             user=str(self.user), activity=str(self.activity))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        APPROVED_REQUESTS.remember(instance)
+
+        return instance
+
+
+APPROVED_REQUESTS = Counter(
+    Request, 'activity', Activity, 'approved_count', status=RequestStatus.APPROVED, is_deleted=False)
+
+
+@receiver(post_save, sender=Request)
+def count_saved_request(sender, instance, created=False, update_fields=None, *args, **kwargs):
+    APPROVED_REQUESTS.saved(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Request)
+def count_deleted_request(sender, instance, *args, **kwargs):
+    APPROVED_REQUESTS.deleted(instance)
+
+
+class ActivityVisibility(models.Model):
+    """
+    Users who can see a private activity and why, public activities are not stored
+
+    Maintained by the receivers below, see `apps.activities.visibility`
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='visible_activities')
+    activity = models.ForeignKey(
+        Activity,
+        on_delete=models.CASCADE,
+        related_name='visibilities')
+    reason = models.CharField(max_length=12, choices=VisibilityReason.CHOICES)
+
+    class Meta:
+        unique_together = ('user', 'activity', 'reason')
+        verbose_name_plural = 'Activity visibilities'
+
+    def __str__(self):
+        return '{user} - {activity} ({reason})'.format(
+            user=self.user_id, activity=self.activity_id, reason=self.reason)
+
+
+@receiver(post_save, sender=IndividualActivity)
+@receiver(post_save, sender=GroupActivity)
+def update_activity_visibility(sender, instance, update_fields=None, *args, **kwargs):
+    from . import visibility
+
+    if touches(update_fields, visibility.ACTIVITY_FIELDS):
+        visibility.refresh(activity_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def update_request_visibility(sender, instance, update_fields=None, *args, **kwargs):
+    from . import visibility
+
+    if touches(update_fields, visibility.REQUEST_FIELDS):
+        visibility.refresh(
+            activity_ids=[instance.activity_id],
+            user_ids=[instance.user_id],
+            reasons=[VisibilityReason.REQUEST])
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def update_membership_visibility(sender, instance, update_fields=None, *args, **kwargs):
+    from . import visibility
+
+    if touches(update_fields, visibility.MEMBERSHIP_FIELDS):
+        visibility.refresh(
+            activity_ids=Activity.objects.filter(group_id=instance.group_id).values_list('pk', flat=True),
+            user_ids=[instance.user_id],
+            reasons=[VisibilityReason.MEMBER])
+
+
+@receiver(post_save, sender=Group)
+def update_group_visibility(sender, instance, created=False, update_fields=None, *args, **kwargs):
+    from . import visibility
+
+    # new groups do not have activities yet
+    if not created and touches(update_fields, visibility.GROUP_FIELDS):
+        visibility.refresh(
+            activity_ids=Activity.objects.filter(group=instance).values_list('pk', flat=True))
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, Q, TextField, Value
+
+from .models import Activity
+
+
+def is_full_text_supported():
+    """ `tsvector` only exists in Postgres, other databases fall back to `icontains` """
+    return connection.vendor == 'postgresql'
+
+
+def build_search_vector(activity):
+    """
+    Weighted vector of the activity's title, description, tags and address
+    Tags and address have to be loaded, they are not in the activity table
+    """
+    parts = (
+        (activity.title, 'A'),
+        (' '.join(tag.title for tag in activity.tags.all()), 'B'),
+        (activity.description, 'C'),
+        (activity.address.address if activity.address else None, 'D'),
+    )
+
+    vector = None
+
+    for text, weight in parts:
+        part = SearchVector(
+            Value(text or '', output_field=TextField()),
+            weight=weight,
+            config=settings.ACTIVITY_SEARCH_CONFIG)
+        vector = part if vector is None else vector + part
+
+    return vector
+
+
+def update_search_vectors(activity_ids):
+    """ Recompute the search vectors of the activities, does nothing without Postgres """
+    if not is_full_text_supported():
+        return
+
+    activities = Activity.objects.filter(
+        pk__in=activity_ids).select_related('address').prefetch_related('tags')
+
+    for activity in activities:
+        # update does not send signals, so it does not trigger another update
+        Activity.objects.filter(pk=activity.pk).update(search_vector=build_search_vector(activity))
+
+
+def search_activities(queryset, query):
+    """
+    Filter activities matching the query, best matches first
+
+    Postgres ranks the indexed search vectors, other databases match
+    title, description, tags and address with `icontains` in the original order
+    """
+    if is_full_text_supported():
+        search_query = SearchQuery(query, config=settings.ACTIVITY_SEARCH_CONFIG)
+
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-time')
+
+    matching = Activity.objects.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query) |
+        Q(tags__title__icontains=query) |
+        Q(address__address__icontains=query)
+    ).values('pk')
+
+    # tags are joined in the subquery, so activities are not duplicated
+    return queryset.filter(pk__in=matching)
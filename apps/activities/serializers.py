@@ -1,15 +1,20 @@
+from django.db.models import Prefetch
+
 from rest_framework import serializers
 
 from apps.groups.serializer import GroupSerializer
 from apps.users.serializers import UserSerializer
 from apps.utils.constants import Currencies
+from apps.utils.fast_serializers import ValuesSerializer
 from apps.utils.models import Tag
+from apps.utils.pagination import decode_cursor
 from apps.utils.serializers import (
     AddressSerializer,
     TagSerializer
 )
+from apps.utils.serializers_mixins import PrefetchPlanMixin
 
-from .constants import RequestStatus
+from .constants import NearbySearch, RequestStatus
 from .models import (
     ActivityType,
     GroupActivity,
@@ -18,7 +23,7 @@ from .models import (
 )
 
 
-class RequestSerializer(serializers.ModelSerializer):
+class RequestSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     """ Used for returning attendees to event """
     uuid = serializers.UUIDField(format='hex', read_only=True)
     user = UserSerializer(read_only=True)
@@ -31,6 +36,9 @@ class RequestSerializer(serializers.ModelSerializer):
             'user',
             'message'
         )
+        select_related = (
+            'user',
+        )
 
 
 class ActivityTypeSerializer(serializers.ModelSerializer):
@@ -46,7 +54,7 @@ class ActivityTypeSerializer(serializers.ModelSerializer):
         )
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     uuid = serializers.UUIDField(format='hex', read_only=True)
     title = serializers.CharField(max_length=100)
     description = serializers.CharField(max_length=500, required=False)
@@ -60,6 +68,12 @@ class ActivitySerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
     is_group = serializers.BooleanField(read_only=True)
     formatted_dates = serializers.DateTimeField(format='%d %B %Y, %H:%M', source='time', read_only=True)
+    number_of_attendees = serializers.IntegerField(source='approved_count', read_only=True)
+    # only group activities have these, None for individual ones
+    max_attendees = serializers.IntegerField(source='child.max_attendees', read_only=True, default=None)
+    price = serializers.DecimalField(
+        max_digits=12, decimal_places=4, source='child.price', read_only=True, default=None)
+    currency = serializers.CharField(source='child.currency', read_only=True, default=None)
 
     class Meta:
         model = IndividualActivity
@@ -78,10 +92,71 @@ class ActivitySerializer(serializers.ModelSerializer):
             'is_group',
             'formatted_dates',
             'number_of_attendees',
+            'max_attendees',
+            'price',
+            'currency',
+        )
+        select_related = (
+            'address',
+            'activity_type',
+            'user',
+            # child tables, so `Activity.child` does not query
+            'individualactivity',
+            'groupactivity',
         )
+        prefetch_related = (
+            # same order as `FastActivitySerializer`
+            Prefetch('tags', queryset=Tag.objects.order_by('pk')),
+        )
+
 
+class FastActivitySerializer(ValuesSerializer):
+    """ `ActivitySerializer` for read-only lists, see `apps.utils.fast_serializers` """
+    serializer_class = ActivitySerializer
+    sources = {
+        'max_attendees': 'groupactivity__max_attendees',
+        'price': 'groupactivity__price',
+        'currency': 'groupactivity__currency',
+    }
 
-class IndividualActivitySerializer(serializers.ModelSerializer):
+
+class NearbyActivitySerializer(ActivitySerializer):
+    """ Activity with its distance in meters from the searched location """
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = IndividualActivity
+        fields = ActivitySerializer.Meta.fields + (
+            'distance',
+        )
+        select_related = ActivitySerializer.Meta.select_related
+        prefetch_related = ActivitySerializer.Meta.prefetch_related
+
+
+class NearbySearchSerializer(serializers.Serializer):
+    """
+    Parameters of the nearby activities search
+    Radius is in meters
+    """
+    radius = serializers.IntegerField(
+        min_value=1,
+        max_value=NearbySearch.MAX_RADIUS * 1000,
+        default=NearbySearch.DEFAULT_RADIUS * 1000)
+    k = serializers.IntegerField(
+        min_value=1,
+        max_value=NearbySearch.MAX_K,
+        default=NearbySearch.DEFAULT_K)
+    cursor = serializers.CharField(required=False)
+
+    def validate_cursor(self, value):
+        try:
+            cursor = decode_cursor(value)
+            return float(cursor['distance']), int(cursor['id'])
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError('Invalid cursor')
+
+
+class IndividualActivitySerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     uuid = serializers.UUIDField(format='hex', read_only=True)
     title = serializers.CharField(max_length=100, required=True)
     description = serializers.CharField(max_length=500, required=False, allow_blank=True)
@@ -129,6 +204,19 @@ class IndividualActivitySerializer(serializers.ModelSerializer):
             'formatted_day_number',
             'group',
         )
+        select_related = (
+            'address',
+            'activity_type',
+            'user',
+            'group',
+        )
+        prefetch_related = (
+            'tags',
+            Prefetch(
+                'requests',
+                queryset=Request.objects.filter(is_deleted=False).select_related('user'),
+                to_attr='active_requests'),
+        )
 
     def create(self, validated_data):
         """
@@ -201,10 +289,18 @@ class IndividualActivitySerializer(serializers.ModelSerializer):
         return self.instance
 
     def get_requests(self, obj):
-        requests = obj.requests.filter(is_deleted=False)
+        # prefetched by `prepare_queryset`
+        if hasattr(obj, 'active_requests'):
+            requests = obj.active_requests
+        else:
+            requests = obj.requests.filter(is_deleted=False)
+
         return RequestSerializer(requests, many=True).data
 
     def get_approved_requests(self, obj):
+        if hasattr(obj, 'active_requests'):
+            return sum(1 for request in obj.active_requests if request.status == RequestStatus.APPROVED)
+
         return obj.requests.filter(is_deleted=False, status=RequestStatus.APPROVED).count()
 
 
@@ -222,6 +318,8 @@ class GroupActivitySerializer(IndividualActivitySerializer):
             'price',
             'currency'
         )
+        select_related = IndividualActivitySerializer.Meta.select_related
+        prefetch_related = IndividualActivitySerializer.Meta.prefetch_related
 
     def validate_currency(self, value):
         if value not in Currencies.ALL:
@@ -258,7 +356,7 @@ class GroupActivitySerializer(IndividualActivitySerializer):
 
 
 
-class UserRequestSerializer(serializers.ModelSerializer):
+class UserRequestSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     """ Used for returning events to user view page"""
     uuid = serializers.UUIDField(format='hex', read_only=True)
     activity = ActivitySerializer(read_only=True)
@@ -270,3 +368,6 @@ class UserRequestSerializer(serializers.ModelSerializer):
             'status',
             'activity',
         )
+        select_related = (
+            'activity',
+        )
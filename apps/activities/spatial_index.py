@@ -0,0 +1,248 @@
+import threading
+import time
+
+import numpy as np
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from apps.utils import geohash
+from apps.utils.location_utils import select_closest
+from apps.utils.shared_cache import is_shared
+
+from .models import Activity
+
+
+INDEX_VERSION_KEY = 'activity-index-version'
+
+
+class ActivityIndex:
+    """
+    Worker-local spatial index of public upcoming activities
+
+    Activities are kept in arrays sorted by their integer geohash, so the cells
+    around a location are contiguous slices found with a binary search.
+    Changes made through `update_activity`/`update_address` go to a small
+    delta kept next to the arrays until the next rebuild.
+
+    The index is built by the warmup request, or by the first query of a worker which
+    did not get one. It is rebuilt when it is older than `max_age` seconds, when the delta
+    grows over `max_delta` or when the rebuild command bumps the version in the cache,
+    which is read at most every `check_interval` seconds. Rebuilds run in a background
+    thread, one at a time, and queries keep using the old arrays meanwhile.
+    Saves made by other workers are only picked up by rebuilds,
+    so `max_age` bounds how stale the results can be.
+    """
+    def __init__(self, max_age, max_delta=10000, check_interval=10):
+        self.max_age = max_age
+        self.max_delta = max_delta
+        self.check_interval = check_interval
+
+        self.lock = threading.RLock()
+        # held by the thread building the index
+        self.build_lock = threading.Lock()
+        self.version = None
+        self.checked_at = None
+
+        self.load([])
+        # nothing has been loaded from the database yet
+        self.built_at = None
+
+    def __len__(self):
+        with self.lock:
+            removed = np.isin(self.pks, list(self.removed)).sum() if self.removed else 0
+            return len(self.pks) - int(removed) + len(self.added)
+
+    def load(self, rows):
+        """
+        Replace the contents of the index
+        `rows` are (pk, latitude, longitude, time) of the indexed activities
+        """
+        rows = [row for row in rows if row[1] is not None and row[2] is not None]
+
+        pks = np.array([row[0] for row in rows], dtype=np.int64)
+        latitudes = np.array([row[1] for row in rows], dtype=np.float64)
+        longitudes = np.array([row[2] for row in rows], dtype=np.float64)
+        times = np.array([row[3].timestamp() for row in rows], dtype=np.float64)
+        hashes = geohash.encode_integers(latitudes, longitudes)
+
+        order = np.argsort(hashes, kind='stable')
+
+        with self.lock:
+            self.geohashes = hashes[order]
+            self.pks = pks[order]
+            self.latitudes = latitudes[order]
+            self.longitudes = longitudes[order]
+            self.times = times[order]
+
+            self.added = {}
+            self.removed = set()
+            self.built_at = self.checked_at = time.monotonic()
+
+    def build(self):
+        """ Load all public upcoming activities from the database """
+        version = cache.get(INDEX_VERSION_KEY)
+
+        rows = Activity.objects.filter(
+            public=True,
+            is_deleted=False,
+            time__gte=timezone.now(),
+            address__latitude__isnull=False,
+            address__longitude__isnull=False
+        ).values_list('pk', 'address__latitude', 'address__longitude', 'time')
+
+        self.load(rows.iterator())
+        self.version = version
+
+    def refresh(self):
+        """ Build the index if it was never built, start a rebuild in the background if it is stale """
+        if self.built_at is None:
+            with self.build_lock:
+                # built by another thread while waiting
+                if self.built_at is None:
+                    self.build()
+        elif self.is_stale() and self.build_lock.acquire(blocking=False):
+            thread = threading.Thread(target=self._rebuild, daemon=True)
+            thread.start()
+
+    def _rebuild(self):
+        try:
+            self.build()
+        finally:
+            self.build_lock.release()
+            # the thread has its own connection, do not leave it open
+            connection.close()
+
+    def is_stale(self):
+        now = time.monotonic()
+
+        if now - self.built_at > self.max_age:
+            return True
+
+        if len(self.added) + len(self.removed) > self.max_delta:
+            return True
+
+        # the version only changes in other processes through a shared cache
+        if not is_shared() or now - self.checked_at < self.check_interval:
+            return False
+
+        self.checked_at = now
+
+        return cache.get(INDEX_VERSION_KEY) != self.version
+
+    def query(self, latitude, longitude, distance, exclude=None, k=None, after=None):
+        """
+        Find indexed activities in the distance of coordinates
+
+        See `apps.utils.location_utils.select_closest` for `k` and `after`
+        Distance is in kilometers
+        :return list of (pk, distance in meters) from the closest
+        """
+        self.refresh()
+
+        cells = geohash.cells_for_distance(latitude, longitude, distance)
+
+        with self.lock:
+            if cells:
+                ranges = [
+                    np.arange(*np.searchsorted(self.geohashes, geohash.integer_range(cell)))
+                    for cell in cells]
+                indexes = np.concatenate(ranges)
+            else:
+                indexes = np.arange(len(self.pks))
+
+            pks = self.pks[indexes]
+            latitudes = self.latitudes[indexes]
+            longitudes = self.longitudes[indexes]
+            times = self.times[indexes]
+
+            if self.removed:
+                keep = ~np.isin(pks, list(self.removed))
+                pks, latitudes, longitudes, times = pks[keep], latitudes[keep], longitudes[keep], times[keep]
+
+            added = [
+                (pk, entry) for pk, entry in self.added.items()
+                if not cells or entry[0].startswith(tuple(cells))]
+
+        if added:
+            pks = np.concatenate([pks, [pk for pk, _ in added]])
+            latitudes = np.concatenate([latitudes, [entry[1] for _, entry in added]])
+            longitudes = np.concatenate([longitudes, [entry[2] for _, entry in added]])
+            times = np.concatenate([times, [entry[3] for _, entry in added]])
+
+        # activities leave the index once they have started
+        keep = times >= timezone.now().timestamp()
+
+        if exclude is not None:
+            keep &= pks != exclude
+
+        return select_closest(
+            latitude,
+            longitude,
+            pks[keep],
+            latitudes[keep],
+            longitudes[keep],
+            distance * 1000,
+            k=k,
+            after=after)
+
+    def update_activity(self, activity):
+        """ Add, move or remove the activity after it has changed """
+        if self.built_at is None:
+            return
+
+        address = activity.address
+
+        if activity.public and not activity.is_deleted and address is not None:
+            self._set(activity.pk, address.latitude, address.longitude, activity.time)
+        else:
+            self.remove(activity.pk)
+
+    def update_address(self, address):
+        """ Move the activities located at the address after it has changed """
+        if self.built_at is None:
+            return
+
+        activities = Activity.objects.filter(
+            address=address,
+            public=True,
+            is_deleted=False
+        ).values_list('pk', 'time')
+
+        for pk, activity_time in activities:
+            self._set(pk, address.latitude, address.longitude, activity_time)
+
+    def remove(self, pk):
+        with self.lock:
+            self.added.pop(pk, None)
+            self.removed.add(pk)
+
+    def _set(self, pk, latitude, longitude, activity_time):
+        if latitude is None or longitude is None:
+            self.remove(pk)
+            return
+
+        entry = (
+            geohash.encode(latitude, longitude),
+            float(latitude),
+            float(longitude),
+            activity_time.timestamp())
+
+        with self.lock:
+            self.removed.add(pk)
+            self.added[pk] = entry
+
+
+def bump_index_version():
+    """ Make every worker sharing the cache rebuild its index on the next query """
+    try:
+        cache.incr(INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(INDEX_VERSION_KEY, 1, None)
+
+
+activity_index = ActivityIndex(
+    max_age=settings.ACTIVITY_INDEX_MAX_AGE,
+    check_interval=settings.ACTIVITY_INDEX_CHECK_INTERVAL)
@@ -1,3 +1,199 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.users.models import User
+from apps.utils.models import Address, Tag
+
+from .constants import RequestStatus
+from .models import Activity, IndividualActivity, Request
+from .spatial_index import INDEX_VERSION_KEY, ActivityIndex, activity_index
+
+
+NUMBER_OF_ATTENDEES = 3
+
+
+class AttendeeCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+        cls.attendees = [
+            User.objects.create_user(
+                email='attendee{}@gymder.com'.format(i), password='password', username='attendee{}'.format(i))
+            for i in range(NUMBER_OF_ATTENDEES)
+        ]
+
+        cls.create_activities(5)
+
+    @classmethod
+    def create_activities(cls, count):
+        for i in range(count):
+            activity = Activity.objects.create(
+                title='Run {}'.format(i), user=cls.owner, time=timezone.now() + timedelta(days=i + 1))
+
+            for attendee in cls.attendees:
+                Request.objects.create(activity=activity, user=attendee, status=RequestStatus.APPROVED)
+
+            # neither counted
+            Request.objects.create(activity=activity, user=cls.owner, status=RequestStatus.PENDING)
+            Request.objects.create(
+                activity=activity, user=cls.owner, status=RequestStatus.APPROVED, is_deleted=True)
+
+    def test_counts_are_loaded_with_the_list(self):
+        activities = list(Activity.objects.filter(user=self.owner))
+
+        with self.assertNumQueries(0):
+            counts = [activity.number_of_attendees for activity in activities]
+
+        self.assertEqual(counts, [NUMBER_OF_ATTENDEES] * 5)
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        self.client.force_login(self.owner)
+
+        def count_request_queries():
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('api:user-future-activities'))
+
+            self.assertEqual(response.status_code, 200)
+
+            return len([query for query in context.captured_queries if 'activities_request' in query['sql']])
+
+        before = count_request_queries()
+        self.create_activities(5)
+
+        self.assertEqual(count_request_queries(), before)
+
+
+class ActivityIndexRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = ActivityIndex(max_age=300, check_interval=10)
+        self.builds = 0
+        self.building = threading.Event()
+        self.release = threading.Event()
+
+    def build(self):
+        self.builds += 1
+        self.building.set()
+        self.release.wait(5)
+        self.index.load([])
+
+    def test_first_query_builds_once(self):
+        self.release.set()
+
+        with mock.patch.object(self.index, 'build', self.build):
+            threads = [threading.Thread(target=self.index.refresh) for i in range(3)]
+
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.builds, 1)
+
+    def test_stale_index_is_rebuilt_in_the_background(self):
+        self.index.load([])
+        self.index.built_at -= 301
+
+        with mock.patch.object(self.index, 'build', self.build):
+            # neither waits for the rebuild, the second one does not start another
+            self.index.refresh()
+            self.assertTrue(self.building.wait(5))
+            self.index.refresh()
+
+            self.release.set()
+
+            while self.index.build_lock.locked():
+                time.sleep(0.01)
+
+        self.assertEqual(self.builds, 1)
+        self.assertFalse(self.index.is_stale())
+
+    @override_settings(LOCAL_CACHE_IS_SHARED=True)
+    def test_version_is_read_every_check_interval(self):
+        self.index.load([])
+        self.index.version = cache.get(INDEX_VERSION_KEY)
+
+        with mock.patch('apps.activities.spatial_index.cache') as index_cache:
+            index_cache.get.return_value = self.index.version
+
+            for i in range(3):
+                self.assertFalse(self.index.is_stale())
+
+            self.assertEqual(index_cache.get.call_count, 0)
+
+            self.index.checked_at -= 10
+            index_cache.get.return_value = 'bumped'
+            self.assertTrue(self.index.is_stale())
+            self.assertEqual(index_cache.get.call_count, 1)
+
+    @override_settings(ACTIVITY_INDEX_ENABLED=True)
+    def test_warmup_builds_the_index(self):
+        with mock.patch.object(activity_index, 'refresh') as refresh:
+            response = self.client.get('/_ah/warmup')
+
+        self.assertEqual(response.status_code, 200)
+        refresh.assert_called_once_with()
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+
+        def create(title, description=None, tags=(), address=None):
+            # activity saves update the vectors through the proxy models
+            activity = IndividualActivity.objects.create(
+                title=title, description=description, user=cls.user, time=timezone.now() + timedelta(days=1),
+                address=Address.objects.create(address=address) if address else None)
+            activity.tags.add(*[Tag.objects.get_or_create(title=tag)[0] for tag in tags])
+            return activity
+
+        cls.title = create('Morning run', tags=('running', 'outdoors'))
+        cls.description = create('Meetup', description='A slow run around the lakes')
+        cls.tag = create('Intervals', tags=('running', 'track'))
+        cls.address = create('Swim', address='Runddelen 1, Copenhagen')
+        cls.other = create('Yoga', description='Stretching')
+
+    def search(self, query):
+        return [activity.pk for activity in Activity.objects.all().search(query)]
+
+    @skipUnless(connection.vendor != 'postgresql', 'Postgres uses the full-text search')
+    def test_search_without_full_text(self):
+        self.assertCountEqual(self.search('run'), [self.title.pk, self.description.pk, self.tag.pk, self.address.pk])
+        self.assertEqual(self.search('TRACK'), [self.tag.pk])
+        self.assertEqual(self.search('nothing like it'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs Postgres')
+    def test_full_text_search(self):
+        # stemmed words of title, tags and description, the best weighted first
+        self.assertEqual(self.search('running'), [self.title.pk, self.tag.pk, self.description.pk])
+        self.assertEqual(self.search('lakes'), [self.description.pk])
+        self.assertEqual(self.search('nothing like it'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Full-text search needs Postgres')
+    def test_search_vectors_follow_changes(self):
+        self.other.tags.add(Tag.objects.create(title='mobility'))
+        self.assertEqual(self.search('mobility'), [self.other.pk])
+
+        self.other.tags.clear()
+        self.assertEqual(self.search('mobility'), [])
+
+        self.other.title = 'Pilates'
+        self.other.save()
+        self.assertEqual(self.search('pilates'), [self.other.pk])
+
+        address = self.address.address
+        address.address = 'Nørrebrogade 5, Copenhagen'
+        address.save()
+        self.assertEqual(self.search('nørrebrogade'), [self.address.pk])
@@ -1,25 +1,41 @@
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
+from django.utils import timezone
 
-from apps.groups.utils import has_access
-from apps.utils.location_utils import get_degree_of_longitude, get_distance
+from apps.utils.location_utils import (
+    get_degree_of_longitude,
+    get_geohash_filter,
+    select_closest)
 from apps.utils.models import Address
 
+from .access import get_access
+from .constants import NearbySearch
 from .models import Activity
+from .spatial_index import activity_index
 
 
 def can_edit_activity(activity, user, raise_exception=False):
-    if activity.user != user:
+    if get_access(user).activity(activity).can_edit:
+        return True
+
+    if raise_exception:
         raise PermissionDenied()
-    return True
+    return False
 
 
-def can_view_activity(activity, user, raise_exception=False):
-    group = activity.group
+def lock_activity(activity):
+    """
+    Lock the activity row until the transaction ends and reload its attendee count,
+    joins and approvals of other requests wait for the capacity check
+    """
+    activity.approved_count = Activity.objects.select_for_update().values_list(
+        'approved_count', flat=True).get(pk=activity.pk)
 
-    if user.is_superuser or \
-        activity.user == user or \
-             activity.public or \
-                  has_access(user, activity.group, raise_exception=raise_exception):
+    return activity
+
+
+def can_view_activity(activity, user, raise_exception=False):
+    if user.is_superuser or get_access(user).activity(activity).can_view:
         return True
 
     if raise_exception:
@@ -27,19 +43,90 @@ def can_view_activity(activity, user, raise_exception=False):
     return False
 
 
-def find_close_to_address(address, distance=10, activity=None):
+def find_close_to_address(address, distance=10, activity=None, k=None, after=None):
     """
     Find activities in the distance of address
+
+    See `find_close_to_coordinates` for the arguments
     """
     if not isinstance(address, Address):
         raise TypeError('address has to be of type apps.utils.Address')
-    
-    latitude = address.latitude
-    longitude = address.longitude
 
-    if not latitude or not longitude:
+    if address.latitude is None or address.longitude is None:
         raise ValueError('latitude/longitude in address is not defined')
 
+    return find_close_to_coordinates(
+        address.latitude,
+        address.longitude,
+        distance=distance,
+        activity=activity,
+        k=k,
+        after=after)
+
+
+def find_close_to_coordinates(latitude, longitude, distance=10, activity=None, k=None, after=None,
+                              queryset=None):
+    """
+    Find public upcoming activities in the distance of coordinates
+
+    Provide `activity` to leave it out of the results
+    Provide `k` to only return the k closest activities
+    Provide `after` as (distance, pk) of the last activity already seen to continue from it
+    Provide `queryset` to load the found activities with the relations it selects
+    Activities are returned from the closest with `distance` in meters attached
+
+    Candidates come from the in-process activity index when it is enabled,
+    the database is then only used to load the found activities
+
+    Distance is in kilometers
+    """
+    closest = _find_closest(latitude, longitude, distance, activity=activity, k=k, after=after)
+
+    return _load_activities(closest, queryset=queryset)
+
+
+def _find_closest(latitude, longitude, distance, activity=None, k=None, after=None):
+    """ :return list of (pk, distance in meters) from the closest """
+    exclude = activity.pk if activity else None
+
+    if settings.ACTIVITY_INDEX_ENABLED:
+        return activity_index.query(
+            latitude, longitude, distance, exclude=exclude, k=k, after=after)
+
+    return _query_close_activities(
+        latitude, longitude, distance, exclude=exclude, k=k, after=after)
+
+
+def _load_activities(closest, queryset=None):
+    """ Load activities of (pk, distance) pairs in the same order with `distance` attached """
+    if queryset is None:
+        queryset = Activity.objects.select_related('address')
+
+    # the index may be behind saves made by other workers, so the candidates are filtered again
+    activities = queryset.filter(
+        public=True,
+        is_deleted=False,
+        time__gte=timezone.now()).in_bulk([pk for pk, _ in closest])
+
+    results = []
+
+    for pk, activity_distance in closest:
+        # activity might have been removed, hidden or started since it was indexed
+        if pk not in activities:
+            continue
+
+        close_activity = activities[pk]
+        close_activity.distance = activity_distance
+        results.append(close_activity)
+
+    return results
+
+
+def _query_close_activities(latitude, longitude, distance, exclude=None, k=None, after=None):
+    """
+    Find activities in the distance of coordinates directly in the database
+    :return list of (pk, distance in meters) from the closest
+    """
     lat_variation = float(distance) / float(111)
     lon_variation = float(distance) / get_degree_of_longitude(latitude)
 
@@ -48,40 +135,68 @@ def find_close_to_address(address, distance=10, activity=None):
     max_lon = float(longitude) + lon_variation
     min_lon = float(longitude) - lon_variation
 
-    activities = Activity.objects.filter(
+    candidates = Activity.objects.filter(
+        get_geohash_filter(latitude, longitude, distance, field='address__geohash'),
         address__latitude__gte=min_lat,
         address__latitude__lte=max_lat,
         address__longitude__gte=min_lon,
         address__longitude__lte=max_lon,
-        is_deleted=False)
-    
-    if activity:
-        activities = activities.exclude([activity])
-    
-    # TODO remove me if too slow. This is just for validation
-    # create an empty queryset to store the filtered results
-    # filtered_activites = Activity.objects.none()
-    filtered_activities = []
+        public=True,
+        is_deleted=False,
+        time__gte=timezone.now())
     
-    for activity in activities:
-        if not hasattr(activity, 'address'):
-            continue
-        if not activity.address.latitude or not activity.address.longitude:
-            continue
+    if exclude is not None:
+        candidates = candidates.exclude(pk=exclude)
 
-        dist = get_distance(address, activity.address, format='km')
+    candidates = list(candidates.values_list(
+        'pk', 'address__latitude', 'address__longitude'))
 
-        if dist <= dist:
-            filtered_activities.append(activity)
-    
-    return filtered_activities
+    if len(candidates) == 0:
+        return []
+
+    pks, latitudes, longitudes = zip(*candidates)
+
+    return select_closest(
+        latitude, longitude, pks, latitudes, longitudes, distance * 1000, k=k, after=after)
+
+
+def find_nearest_to_coordinates(latitude, longitude, k=NearbySearch.DEFAULT_K,
+                                radius=NearbySearch.DEFAULT_RADIUS, activity=None, after=None,
+                                queryset=None):
+    """
+    Find the k activities closest to coordinates within the radius
+
+    Search starts from a small ring around the coordinates and doubles it until
+    k activities are found, so dense areas never scan the whole radius
+    Provide `after` as (distance, pk) of the last activity already seen to fetch the next ones
+    Provide `queryset` to load the found activities with the relations it selects
+
+    Radius is in kilometers, `after` distance in meters
+    """
+    ring = NearbySearch.INITIAL_RADIUS
+
+    if after is not None:
+        # activities after the cursor can not be closer than it
+        while ring * 1000 < after[0] and ring < radius:
+            ring *= 2
+
+    while True:
+        ring = min(ring, radius)
+
+        closest = _find_closest(latitude, longitude, ring, activity=activity, k=k, after=after)
+
+        # activities are only loaded for the final ring
+        if len(closest) >= k or ring >= radius:
+            return _load_activities(closest, queryset=queryset)
+
+        ring *= 2
 
 
-def find_close_to_activity(activity, distance=10):
+def find_close_to_activity(activity, distance=10, k=None):
     """
     Find activities close to activity
     """
     if not isinstance(activity, Activity):
         raise TypeError('address has to be of type apps.activities.Activity')
 
-    return find_close_to_address(activity.address, distance=distance, activity=activity)
+    return find_close_to_address(activity.address, distance=distance, activity=activity, k=k)
@@ -1,16 +1,20 @@
 from datetime import datetime
 
+from django.conf import settings
 from django.views import View
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 
-from apps.activities.serializers import ActivitySerializer
+from apps.activities.serializers import FastActivitySerializer
 from apps.activities.constants import RequestStatus
+from apps.pages.generations import activity_scope, user_scope
 from apps.pages.views_mixins import PageViewMixin
 from apps.users.serializers import UserSerializer
 from apps.utils.models import Tag
 from apps.utils.serializers import TagSerializer
 
+from .access import get_access
 from .models import (
     Activity, 
     GroupActivity, 
@@ -22,6 +26,7 @@ from .serializers import (
     GroupActivitySerializer,
     RequestSerializer
 )
+from .spatial_index import activity_index
 from .utils import can_view_activity
 
 
@@ -33,7 +38,13 @@ class ActivityView(PageViewMixin):
         # capture the created tag. Might show more info on the first run
         created = request.GET.get('created', None)
 
-        activity = get_object_or_404(Activity, uuid=kwargs['uuid'])
+        access = get_access(request.user)
+
+        # both serializers load the same relations
+        activity = get_object_or_404(
+            access.with_activity_access(
+                IndividualActivitySerializer.prepare_queryset(Activity.objects.all())).with_subclasses(),
+            uuid=kwargs['uuid'])
 
         can_view_activity(activity, request.user, raise_exception=True)
 
@@ -45,12 +56,12 @@ class ActivityView(PageViewMixin):
         except:
             user_request = None
 
-        if activity.is_group:
-            activity = get_object_or_404(GroupActivity, uuid=activity.uuid)
+        if isinstance(activity, GroupActivity):
             serializer = GroupActivitySerializer(activity)
-        else:
-            activity = get_object_or_404(IndividualActivity, uuid=activity.uuid)
+        elif isinstance(activity, IndividualActivity):
             serializer = IndividualActivitySerializer(activity)
+        else:
+            raise Http404()
 
         user = request.user
         user_serializer = UserSerializer(user)
@@ -59,7 +70,7 @@ class ActivityView(PageViewMixin):
             'user': user_serializer.data,
             'activity': serializer.data,
             'created': created == 'true',
-            'is_owner': activity.user == user,
+            'is_owner': access.activity(activity).is_owner,
             'user_request': user_request
         }
 
@@ -87,16 +98,27 @@ class ActivitiesView(PageViewMixin):
     BUNDLE_NAME = 'activities_view'
     TITLE = 'Activities'
 
-    def create_js_context(self, request, *args, **kwargs):
-        activities = Activity.objects.filter(
-            Q(user=request.user) | Q(
-                requests__user=request.user,
-                requests__status=RequestStatus.APPROVED,
-                requests__is_deleted=False
-            ),
+    def get_activities(self, user):
+        """ Activities the user owns or attends """
+        requests = Request.objects.filter(
+            user=user,
+            status=RequestStatus.APPROVED,
+            is_deleted=False)
+
+        # a subquery instead of joining requests, which repeats owned activities
+        return Activity.objects.filter(
+            Q(user=user) | Q(pk__in=requests.values('activity')),
             is_deleted=False
         )
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        activity_ids = self.get_activities(request.user).values_list('pk', flat=True)
+
+        return [user_scope(request.user.pk)] + [activity_scope(pk) for pk in activity_ids]
+
+    def create_js_context(self, request, *args, **kwargs):
+        activities = self.get_activities(request.user)
+
         all_activities = activities.filter(time__gte=datetime.today()).order_by('-time')
         
         past_activities = activities.filter(time__lt=datetime.today()).order_by('-time')
@@ -106,9 +128,9 @@ class ActivitiesView(PageViewMixin):
             time__gte=datetime.today(),
             user=request.user).order_by('-time')
 
-        serializer = ActivitySerializer(all_activities, many=True)
-        owned_activities_serializer = ActivitySerializer(owned_activities, many=True)
-        past_activities_serializer = ActivitySerializer(past_activities, many=True)
+        serializer = FastActivitySerializer(all_activities)
+        owned_activities_serializer = FastActivitySerializer(owned_activities)
+        past_activities_serializer = FastActivitySerializer(past_activities)
 
         return {
             'activities': serializer.data,
@@ -124,26 +146,30 @@ class SearchActivitiesView(PageViewMixin):
 
 class TagFilterView(PageViewMixin):
     BUNDLE_NAME = 'activity_tag_filtering'
-    serializer_class = ActivitySerializer
+    serializer_class = FastActivitySerializer
 
     def create_js_context(self, request, *args, **kwargs):
         tag = get_object_or_404(Tag, uuid=kwargs['uuid'])
 
-        activities = Activity.objects.filter(
-            Q(user=request.user) | Q(public=True) |
-            Q(
-                requests__user=request.user,
-                requests__status=RequestStatus.APPROVED,
-                requests__is_deleted=False
-            ),
-            is_deleted=False,
-            tags=tag
-        ).filter(time__gte=datetime.today()).order_by('-time')
+        activities = Activity.objects.visible_to(request.user).filter(
+            tags=tag,
+            time__gte=datetime.today()
+        ).order_by('-time')
 
-        serializer = self.serializer_class(activities, many=True)
+        serializer = self.serializer_class(activities)
         tag_serializer = TagSerializer(tag)
 
         return {
             'activities': serializer.data,
             'tag': tag_serializer.data
         }
+
+
+class WarmupView(View):
+    """ App Engine warmup request, builds the nearby index before the instance gets traffic """
+
+    def get(self, request, *args, **kwargs):
+        if settings.ACTIVITY_INDEX_ENABLED:
+            activity_index.refresh()
+
+        return HttpResponse()
@@ -0,0 +1,156 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from apps.groups.models import Membership
+
+from .constants import RequestStatus, VisibilityReason
+from .models import Activity, ActivityVisibility, Request
+
+
+# Fields which change who can see an activity, saves touching none of them skip the refresh
+ACTIVITY_FIELDS = {'user', 'group', 'is_deleted'}
+REQUEST_FIELDS = {'user', 'activity', 'status', 'is_deleted'}
+MEMBERSHIP_FIELDS = {'user', 'group', 'status', 'is_deleted'}
+GROUP_FIELDS = {'user', 'is_deleted'}
+
+# Rows inserted at a time, within the 999 query parameters of sqlite
+INSERT_BATCH_SIZE = 300
+
+
+def is_enabled():
+    """ Whether reads use the table, it is maintained either way """
+    return settings.ACTIVITY_VISIBILITY_MATERIALIZED
+
+
+def _scoped(queryset, activity_field, user_field, activity_ids, user_ids):
+    if activity_ids is not None:
+        queryset = queryset.filter(**{activity_field + '__in': activity_ids})
+
+    if user_ids is not None:
+        queryset = queryset.filter(**{user_field + '__in': user_ids})
+
+    return queryset
+
+
+def get_expected_rows(activity_ids=None, user_ids=None, reasons=None):
+    """
+    Compute the visibility rows from activities, groups, memberships and requests
+    Limited to the activities, users and reasons when given
+    :return set of (user id, activity id, reason)
+    """
+    sources = (
+        (
+            VisibilityReason.OWNER,
+            Activity.objects.filter(is_deleted=False),
+            'pk', 'user_id'),
+        (
+            VisibilityReason.GROUP_OWNER,
+            Activity.objects.filter(
+                is_deleted=False, group__is_deleted=False, group__user__isnull=False),
+            'pk', 'group__user_id'),
+        (
+            VisibilityReason.MEMBER,
+            # conditions in one filter apply to the same membership
+            Activity.objects.filter(
+                is_deleted=False,
+                group__is_deleted=False,
+                group__memberships__is_deleted=False,
+                group__memberships__status=RequestStatus.APPROVED),
+            'pk', 'group__memberships__user_id'),
+        (
+            VisibilityReason.REQUEST,
+            Request.objects.filter(
+                is_deleted=False,
+                activity__is_deleted=False,
+                status__in=[RequestStatus.PENDING, RequestStatus.APPROVED]),
+            'activity_id', 'user_id'),
+    )
+
+    rows = set()
+
+    for reason, queryset, activity_field, user_field in sources:
+        if reasons is not None and reason not in reasons:
+            continue
+
+        queryset = _scoped(queryset, activity_field, user_field, activity_ids, user_ids)
+
+        rows.update(
+            (user_id, activity_id, reason)
+            for activity_id, user_id in queryset.values_list(activity_field, user_field))
+
+    return rows
+
+
+def get_stored_rows(activity_ids=None, user_ids=None, reasons=None):
+    queryset = _scoped(ActivityVisibility.objects.all(), 'activity_id', 'user_id', activity_ids, user_ids)
+
+    if reasons is not None:
+        queryset = queryset.filter(reason__in=reasons)
+
+    return set(queryset.values_list('user_id', 'activity_id', 'reason'))
+
+
+def diff(activity_ids=None, user_ids=None, reasons=None):
+    """ :return (missing rows, stale rows) of the stored table """
+    expected = get_expected_rows(activity_ids, user_ids, reasons)
+    stored = get_stored_rows(activity_ids, user_ids, reasons)
+
+    return expected - stored, stored - expected
+
+
+def refresh(activity_ids=None, user_ids=None, reasons=None):
+    """
+    Bring the stored rows of the activities and users in line with the source tables
+    Nothing limits it to the whole table, `reasons` limits it to the rows a change can affect
+    :return (number of inserted rows, number of deleted rows)
+    """
+    with transaction.atomic():
+        missing, stale = diff(activity_ids, user_ids, reasons)
+
+        stale = list(stale)
+
+        # sqlite limits the number of query parameters
+        for start in range(0, len(stale), 100):
+            ActivityVisibility.objects.filter(reduce(or_, (
+                Q(user_id=user_id, activity_id=activity_id, reason=reason)
+                for user_id, activity_id, reason in stale[start:start + 100]
+            ))).delete()
+
+        ActivityVisibility.objects.bulk_create(
+            [
+                ActivityVisibility(user_id=user_id, activity_id=activity_id, reason=reason)
+                for user_id, activity_id, reason in missing
+            ],
+            batch_size=INSERT_BATCH_SIZE,
+            ignore_conflicts=True)
+
+    return len(missing), len(stale)
+
+
+def rebuild(batch_size=1000):
+    """ Refresh the whole table a batch of activities at a time """
+    inserted = deleted = 0
+    ids = list(Activity.objects.order_by('pk').values_list('pk', flat=True))
+
+    for start in range(0, len(ids), batch_size):
+        batch_inserted, batch_deleted = refresh(activity_ids=ids[start:start + batch_size])
+        inserted += batch_inserted
+        deleted += batch_deleted
+
+    return inserted, deleted
+
+
+def is_visible(user, activity):
+    """ Whether the user can see the activity, see `ActivityQuerySet.visible_to` """
+    if activity.public and not activity.is_deleted:
+        return True
+
+    if not is_enabled():
+        return Activity.objects.visible_to(user).filter(pk=activity.pk).exists()
+
+    # public activities are not stored
+    return ActivityVisibility.objects.filter(user=user, activity=activity).exists()
@@ -1,3 +1,859 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from apps.activities.constants import RequestStatus
+from apps.activities.models import Activity, ActivityType, GroupActivity, IndividualActivity, Request
+from apps.activities.serializers import ActivitySerializer, FastActivitySerializer
+from apps.activities.spatial_index import activity_index
+from apps.activities.utils import _find_closest, find_close_to_coordinates, find_nearest_to_coordinates
+from apps.communication.models import Comment, Post
+from apps.communication.serializers import FastPostSerializer, PostSerializer
+from apps.groups import roles
+from apps.groups.constants import MembershipTypes
+from apps.groups.models import Group, Membership
+from apps.groups.serializer import (
+    FastGroupSerializer,
+    FastMembershipSerializer,
+    FastUserMembershipSerializer,
+    GroupSerializer,
+    MembershipSerializer,
+    UserMembershipSerializer
+)
+from apps.users.models import User
+from apps.utils.constants import EnrichmentStatus
+from apps.utils.enrichment import create_pending_address
+from apps.utils.location_pings import location_ping_buffer
+from apps.utils.models import Address, AddressEnrichmentJob, Tag
+from apps.utils.pagination import CURSOR_QUERY_PARAM, encode_cursor
+from apps.utils.queries import QueryRecorder, get_query_budget
+
+
+# Namespaces of the routes which are checked
+NAMESPACES = ('api', 'mobile', 'pages', 'activities', 'groups', 'users')
+
+NUMBER_OF_ACTIVITIES = 10
+NUMBER_OF_ATTENDEES = 5
+
+
+def get_routes(resolver=None, namespace=None):
+    """ :return [(view name, URL keyword argument names)] of the checked namespaces """
+    if resolver is None:
+        resolver = get_resolver()
+
+    routes = []
+
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in NAMESPACES:
+                routes += get_routes(pattern, pattern.namespace)
+        elif isinstance(pattern, URLPattern) and namespace and pattern.name:
+            routes.append((
+                '{}:{}'.format(namespace, pattern.name),
+                tuple(pattern.pattern.regex.groupindex)))
+
+    return routes
+
+
+class SeededTestCase(TestCase):
+    """ Owner with activities, a group, requests, posts and comments """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+        attendees = [
+            User.objects.create_user(
+                email='attendee{}@gymder.com'.format(i), password='password', username='attendee{}'.format(i))
+            for i in range(NUMBER_OF_ATTENDEES)
+        ]
+
+        cls.tag = Tag.objects.create(title='running')
+        cls.other_tag = Tag.objects.create(title='outdoors')
+        activity_type = ActivityType.objects.create(title='running', approved=True)
+
+        cls.group = Group.objects.create(title='Runners', user=cls.user)
+        cls.membership = Membership.objects.create(
+            group=cls.group, user=attendees[0], status=RequestStatus.APPROVED)
+
+        for i in range(NUMBER_OF_ACTIVITIES):
+            address = Address.objects.create(
+                address='Street {}, Copenhagen'.format(i),
+                city='Copenhagen',
+                country='Denmark',
+                latitude=Decimal('55.676') + Decimal(i) / 1000,
+                longitude=Decimal('12.568'))
+
+            if i % 2:
+                activity = GroupActivity.objects.create(
+                    title='Group run {}'.format(i), user=cls.user, group=cls.group, address=address,
+                    activity_type=activity_type, time=timezone.now() + timedelta(days=i + 1))
+            else:
+                activity = IndividualActivity.objects.create(
+                    title='Run {}'.format(i), user=cls.user, address=address,
+                    activity_type=activity_type, time=timezone.now() + timedelta(days=i + 1))
+
+            # tags are listed in the order they were created
+            activity.tags.add(*([cls.other_tag, cls.tag] if i % 3 else [cls.tag]))
+
+            for attendee in attendees:
+                Request.objects.create(activity=activity, user=attendee, status=RequestStatus.APPROVED)
+
+        cls.activity = activity
+        cls.request = activity.requests.first()
+
+        cls.post = Post.objects.create(body='See you there', user=cls.user, activity=cls.activity)
+        cls.group_post = Post.objects.create(body='Welcome', user=cls.user, group=cls.group)
+
+        for attendee in attendees:
+            Comment.objects.create(body='Count me in', user=attendee, post=cls.post)
+
+        cls.comment = cls.post.comments.first()
+
+    def tearDown(self):
+        # write the pings of nearby searches while the test's tables are still there
+        location_ping_buffer.flush()
+
+
+class QueryBudgetTests(SeededTestCase):
+    """
+    Requests every route with a fixed dataset and checks the queries against `QUERY_BUDGETS`
+
+    New routes with URL arguments need an entry in `get_route_kwargs`
+    """
+
+    def get_route_kwargs(self, view_name):
+        activity = {'uuid': self.activity.uuid.hex}
+        group = {'uuid': self.group.uuid.hex}
+        post = {'uuid': self.post.uuid.hex}
+
+        return {
+            'api:activity-tag-filter': {'identifier': self.tag.title},
+            'api:activity': activity,
+            'api:activity-tags': activity,
+            'api:activity-address': activity,
+            'api:activity-posts': activity,
+            'api:activity-requests': activity,
+            'api:requests': dict(activity, request_uuid=self.request.uuid.hex),
+            'api:posts': post,
+            'api:add-comment': post,
+            'api:delete-comment': dict(post, comment_uuid=self.comment.uuid.hex),
+            'api:memberships': {'uuid': self.membership.uuid.hex},
+            'api:groups': group,
+            'api:groups-memberships': group,
+            'api:group-posts': group,
+            'api:groups-activities': group,
+            'mobile:activity-view': activity,
+            'mobile:activity-posts': activity,
+            'activities:tag-filter': {'uuid': self.tag.uuid.hex},
+            'activities:preview': activity,
+            'activities:attendees': activity,
+            'groups:preview': group,
+            'groups:members': group,
+            'groups:activities': group,
+            'groups:create-activites': group,
+            'users:user-profile': {'uuid': self.user.uuid.hex},
+        }[view_name]
+
+    def get_route_params(self, view_name):
+        return {
+            'api:search-activities': {'query': 'run'},
+            'api:nearby-activities': {'latitude': '55.676', 'longitude': '12.568'},
+        }.get(view_name, {})
+
+    def test_routes_are_found(self):
+        view_names = [view_name for view_name, arguments in get_routes()]
+
+        self.assertIn('api:search-activities', view_names)
+        self.assertIn('mobile:user-activities', view_names)
+        self.assertIn('activities:preview', view_names)
+
+    # Bundles are built by webpack, which does not run with the tests
+    @mock.patch('webpack_loader.loader.WebpackLoader.get_bundle', return_value=[])
+    def test_routes_within_query_budget(self, get_bundle):
+        for view_name, arguments in get_routes():
+            with self.subTest(route=view_name):
+                kwargs = self.get_route_kwargs(view_name) if arguments else {}
+                path = reverse(view_name, kwargs=kwargs)
+
+                # some routes log the user out
+                self.client.force_login(self.user)
+
+                with QueryRecorder() as recorder:
+                    response = self.client.get(path, self.get_route_params(view_name))
+
+                self.assertLess(response.status_code, 500)
+                self.assertWithinBudget(recorder, view_name, 'GET', path)
+
+    def test_writes_within_query_budget(self):
+        """ Joins, approvals, comments and memberships, which update counters and visibility """
+        joiner = User.objects.create_user(email='joiner@gymder.com', password='password', username='joiner')
+        comment = Comment.objects.create(body='Me too', user=self.user, post=self.post)
+        # the seeded activities are full
+        open_activity = GroupActivity.objects.create(
+            title='Swim', user=self.user, group=self.group, time=timezone.now() + timedelta(days=1))
+
+        activity = {'uuid': self.activity.uuid.hex}
+        request = dict(activity, request_uuid=self.request.uuid.hex)
+        post = {'uuid': self.post.uuid.hex}
+
+        writes = (
+            (joiner, 'post', 'api:activity-requests', {'uuid': open_activity.uuid.hex}, {}),
+            # asking again leaves
+            (joiner, 'post', 'api:activity-requests', {'uuid': open_activity.uuid.hex}, {}),
+            (self.user, 'delete', 'api:requests', request, {}),
+            (self.user, 'post', 'api:requests', request, {}),
+            (self.user, 'post', 'api:add-comment', post, {'body': 'See you there'}),
+            (self.user, 'delete', 'api:delete-comment', dict(post, comment_uuid=comment.uuid.hex), {}),
+            (self.user, 'post', 'api:groups-memberships', {'uuid': self.group.uuid.hex}, {'user_uuid': joiner.uuid.hex}),
+        )
+
+        for user, method, view_name, kwargs, data in writes:
+            with self.subTest(route=view_name, method=method):
+                path = reverse(view_name, kwargs=kwargs)
+                self.client.force_login(user)
+
+                with QueryRecorder() as recorder:
+                    response = getattr(self.client, method)(path, data)
+
+                self.assertLess(response.status_code, 400)
+                self.assertWithinBudget(recorder, view_name, method.upper(), path)
+
+    def assertWithinBudget(self, recorder, view_name, method, path):
+        budget = get_query_budget(view_name, method)
+
+        self.assertLessEqual(
+            recorder.count,
+            budget,
+            '{} {} issued {} queries, budget is {}. Most repeated:\n{}'.format(
+                method,
+                path,
+                recorder.count,
+                budget,
+                '\n'.join('{}x {}'.format(times, sql) for sql, times in recorder.most_common())))
+
+
+class KeysetPaginationTests(TestCase):
+    """ Walks list endpoints page by page """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+
+        time = timezone.now() + timedelta(days=1)
+
+        # pairs share the time, so the primary key decides the order
+        cls.activities = [
+            IndividualActivity.objects.create(
+                title='Run {}'.format(i), user=cls.user, time=time + timedelta(hours=i // 2))
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_pages(self, path, page_size):
+        pages = []
+        params = {'page_size': page_size}
+
+        while True:
+            response = self.client.get(path, params)
+            self.assertEqual(response.status_code, 200)
+
+            pages.append([activity['uuid'] for activity in response.json()])
+
+            if 'Link' not in response:
+                return pages
+
+            # <url>; rel="next"
+            url = response['Link'].split(';')[0].strip('<>')
+            params = parse_qs(urlparse(url).query)
+
+    def test_pages_follow_ordering(self):
+        pages = self.get_pages(reverse('api:user-future-activities'), 3)
+
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(
+            [uuid for page in pages for uuid in page],
+            [activity.uuid.hex for activity in self.activities])
+
+    def test_owned_activities_with_requests_are_listed_once(self):
+        for i in range(3):
+            attendee = User.objects.create_user(
+                email='attendee{}@gymder.com'.format(i), password='password', username='attendee{}'.format(i))
+            Request.objects.create(activity=self.activities[0], user=attendee, status=RequestStatus.APPROVED)
+
+        pages = self.get_pages(reverse('api:user-future-activities'), 3)
+
+        self.assertEqual(
+            [uuid for page in pages for uuid in page],
+            [activity.uuid.hex for activity in self.activities])
+
+    def test_descending_pages(self):
+        pages = self.get_pages(reverse('api:individual-activities'), 2)
+
+        self.assertEqual(
+            [uuid for page in pages for uuid in page],
+            [activity.uuid.hex for activity in reversed(self.activities)])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('api:user-future-activities'), {CURSOR_QUERY_PARAM: 'invalid'})
+
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(API_MAX_PAGE_SIZE=5)
+    def test_page_size_is_capped(self):
+        response = self.client.get(reverse('api:user-future-activities'), {'page_size': 100})
+
+        self.assertEqual(len(response.json()), 5)
+        self.assertIn('Link', response)
+
+
+@override_settings(LOCAL_CACHE_IS_SHARED=True)
+class AccessTests(TestCase):
+    """ Permission checks of posts and private activities """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+        cls.admin = User.objects.create_user(email='admin@gymder.com', password='password', username='admin')
+        cls.stranger = User.objects.create_user(
+            email='stranger@gymder.com', password='password', username='stranger')
+
+        cls.group = Group.objects.create(title='Runners', user=cls.owner, public=False, needs_approval=True)
+        Membership.objects.create(
+            group=cls.group, user=cls.admin, status=RequestStatus.APPROVED, membership_type=MembershipTypes.ADMIN)
+
+        cls.activity = IndividualActivity.objects.create(title='Run', user=cls.owner, public=False)
+
+    def test_private_activity(self):
+        path = reverse('api:activity', kwargs={'uuid': self.activity.uuid.hex})
+
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(path).status_code, 403)
+
+        Request.objects.create(activity=self.activity, user=self.stranger, status=RequestStatus.PENDING)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_group_post_delete(self):
+        for user, status_code in ((self.stranger, 403), (self.admin, 200)):
+            post = Post.objects.create(body='Welcome', user=self.owner, group=self.group)
+            path = reverse('api:posts', kwargs={'uuid': post.uuid.hex})
+
+            self.client.force_login(user)
+
+            with self.subTest(user=user.username):
+                self.assertEqual(self.client.delete(path).status_code, status_code)
+
+    def test_group_edit(self):
+        path = reverse('api:groups', kwargs={'uuid': self.group.uuid.hex})
+
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(path).status_code, 403)
+
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+    def test_cached_roles_follow_memberships(self):
+        path = reverse('api:groups', kwargs={'uuid': self.group.uuid.hex})
+
+        self.client.force_login(self.stranger)
+        self.assertEqual(self.client.get(path).status_code, 403)
+
+        membership = Membership.objects.create(
+            group=self.group, user=self.stranger, status=RequestStatus.APPROVED)
+        self.assertEqual(self.client.get(path).status_code, 200)
+
+        membership.is_deleted = True
+        membership.save(update_fields=['is_deleted'])
+        self.assertEqual(self.client.get(path).status_code, 403)
+
+    @override_settings(LOCAL_CACHE_IS_SHARED=False)
+    def test_roles_need_a_shared_cache(self):
+        roles.get_roles(self.admin.pk)
+
+        # other workers would not see the bumped versions
+        with self.assertNumQueries(1):
+            self.assertTrue(roles.is_admin(self.admin.pk, self.group.pk))
+
+
+class NearbyActivitiesTests(SeededTestCase):
+
+    def setUp(self):
+        # from the closest to the seeded coordinates
+        self.activities = list(Activity.objects.order_by('address__latitude'))
+
+    @override_settings(ACTIVITY_INDEX_ENABLED=True)
+    def test_index_candidates_are_filtered_again(self):
+        def find():
+            return [activity.pk for activity in find_close_to_coordinates(55.676, 12.568)]
+
+        self.assertIn(self.activity.pk, find())
+
+        # updates skip the index, like saves made by another worker
+        Activity.objects.filter(pk=self.activity.pk).update(public=False)
+        self.assertNotIn(self.activity.pk, find())
+
+        Activity.objects.filter(pk=self.activity.pk).update(public=True, is_deleted=True)
+        self.assertNotIn(self.activity.pk, find())
+
+    def search_modes(self):
+        """ Run the block with and without the activity index """
+        for enabled in (False, True):
+            with self.subTest(index=enabled), override_settings(ACTIVITY_INDEX_ENABLED=enabled):
+                if enabled:
+                    # other tests leave rows of their rolled back data in it
+                    activity_index.build()
+
+                yield
+
+    def find_nearest(self, latitude, longitude, **kwargs):
+        """ :return (pks of found activities, radii of the searched rings) """
+        with mock.patch('apps.activities.utils._find_closest', wraps=_find_closest) as find_closest:
+            activities = find_nearest_to_coordinates(latitude, longitude, **kwargs)
+
+        return [activity.pk for activity in activities], [call[0][2] for call in find_closest.call_args_list]
+
+    def test_empty_rings_are_expanded(self):
+        # about 5 km south of the seeded activities
+        for _ in self.search_modes():
+            pks, rings = self.find_nearest(55.631, 12.568, k=3)
+
+            self.assertEqual(rings, [1, 2, 4, 8])
+            self.assertEqual(pks, [activity.pk for activity in self.activities[:3]])
+
+    def test_rings_stop_at_the_radius(self):
+        for _ in self.search_modes():
+            self.assertEqual(self.find_nearest(55.631, 12.568, k=3, radius=3), ([], [1, 2, 3]))
+
+            # fewer than k in the radius
+            pks, rings = self.find_nearest(55.676, 12.568, k=20, radius=6)
+            self.assertEqual(rings, [1, 2, 4, 6])
+            self.assertEqual(pks, [activity.pk for activity in self.activities])
+
+    def test_cursor_pages(self):
+        # same place as another activity, paged by pk
+        twin = IndividualActivity.objects.create(
+            title='Twin run', user=self.user, address=self.activities[3].address,
+            time=timezone.now() + timedelta(days=1))
+
+        self.client.force_login(self.user)
+
+        for _ in self.search_modes():
+            seen = []
+            params = {'latitude': '55.676', 'longitude': '12.568', 'k': 3}
+
+            while True:
+                response = self.client.get(reverse('api:nearby-activities'), params)
+                self.assertEqual(response.status_code, 200)
+
+                seen += [activity['uuid'] for activity in response.json()]
+
+                if 'Link' not in response:
+                    break
+
+                url = response['Link'].split(';')[0].strip('<>')
+                params = parse_qs(urlparse(url).query)
+
+            expected = sorted(self.activities + [twin], key=lambda activity: (activity.address.latitude, activity.pk))
+            self.assertEqual(seen, [activity.uuid.hex for activity in expected])
+
+    def test_invalid_cursor(self):
+        self.client.force_login(self.user)
+
+        for cursor in ('not a cursor', encode_cursor({'distance': 'far'}), encode_cursor([1, 2])):
+            response = self.client.get(
+                reverse('api:nearby-activities'), {'latitude': '55.676', 'longitude': '12.568', 'cursor': cursor})
+
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('cursor', response.json())
+
+
+class CanonicalAddressTests(TestCase):
+
+    def city_address(self):
+        return Address(latitude=Decimal('55.67601'), longitude=Decimal('12.56801'), city='Copenhagen', country='Denmark')
+
+    def test_city_only_address_takes_details(self):
+        city = Address.objects.get_canonical(self.city_address())
+
+        address = Address.objects.get_canonical(Address(
+            latitude=Decimal('55.67602'), longitude=Decimal('12.56802'),
+            address='Vesterbrogade 1, Copenhagen', street='Vesterbrogade', city='Copenhagen', country='Denmark'))
+
+        self.assertEqual(address.pk, city.pk)
+        city.refresh_from_db()
+        self.assertEqual(city.address, 'Vesterbrogade 1, Copenhagen')
+        self.assertEqual(city.latitude, Decimal('55.67601'))
+
+        # a city only lookup does not take the details back
+        self.assertEqual(Address.objects.get_canonical(self.city_address()).address, 'Vesterbrogade 1, Copenhagen')
+
+    @override_settings(ADDRESS_ENRICHMENT_DEFERRED=True)
+    def test_city_only_address_is_geocoded_later(self):
+        city = Address.objects.get_canonical(self.city_address())
+
+        address = create_pending_address(lat=Decimal('55.67601'), lng=Decimal('12.56801'))
+
+        self.assertEqual(address.pk, city.pk)
+        self.assertEqual(address.enrichment_status, EnrichmentStatus.PENDING)
+        self.assertTrue(AddressEnrichmentJob.objects.filter(address=city).exists())
+
+
+    def test_two_users_save_the_same_coordinates(self):
+        users = [
+            User.objects.create_user(
+                email='user{}@gymder.com'.format(i), password='password', username='user{}'.format(i))
+            for i in range(2)
+        ]
+
+        for user, coordinates in zip(users, (('55.67601', '12.56801'), ('55.67603', '12.56799'))):
+            self.client.force_login(user)
+            response = self.client.post(
+                reverse('api:user-address'), {'latitude': coordinates[0], 'longitude': coordinates[1]})
+            self.assertEqual(response.status_code, 201)
+
+        address = Address.objects.get()
+        self.assertIsNone(address.user)
+        self.assertEqual(
+            list(User.objects.filter(pk__in=[user.pk for user in users]).values_list('address', flat=True)),
+            [address.pk, address.pk])
+
+        # attaching the shared address to an activity does not make it the user's
+        response = self.client.post(reverse('api:individual-activities'), json.dumps({
+            'title': 'Run',
+            'time': (timezone.now() + timedelta(days=1)).isoformat(),
+            'duration': 60,
+            'address_uuid': address.uuid.hex,
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(Activity.objects.get().address_id, address.pk)
+        address.refresh_from_db()
+        self.assertIsNone(address.user)
+
+
+class CommentCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+        cls.group = Group.objects.create(title='Runners', user=cls.user)
+        cls.post = Post.objects.create(body='Welcome', user=cls.user, group=cls.group)
+
+    def get_count(self):
+        return Post.objects.get(pk=self.post.pk).comment_count
+
+    def test_comment_view_counts(self):
+        self.client.force_login(self.user)
+
+        path = reverse('api:add-comment', kwargs={'uuid': self.post.uuid.hex})
+        self.assertEqual(self.client.post(path, {'body': 'First'}).status_code, 201)
+        self.assertEqual(self.client.post(path, {'body': 'Second'}).status_code, 201)
+        self.assertEqual(self.get_count(), 2)
+
+        path = reverse('api:delete-comment', kwargs={
+            'uuid': self.post.uuid.hex, 'comment_uuid': self.post.comments.first().uuid.hex})
+
+        # deleting again does not count twice
+        for i in range(2):
+            self.assertEqual(self.client.delete(path).status_code, 200)
+            self.assertEqual(self.get_count(), 1)
+
+    def test_reconcile(self):
+        # bulk inserts skip the counter
+        Comment.objects.bulk_create([
+            Comment(body='Bulk', user=self.user, post=self.post),
+            Comment(body='Deleted', user=self.user, post=self.post, is_deleted=True),
+        ])
+
+        call_command('reconcile_comment_counts', dry_run=True, stdout=StringIO())
+        self.assertEqual(self.get_count(), 0)
+
+        call_command('reconcile_comment_counts', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.get_count(), 1)
+
+
+class CounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+        cls.users = [
+            User.objects.create_user(
+                email='user{}@gymder.com'.format(i), password='password', username='user{}'.format(i))
+            for i in range(3)
+        ]
+        cls.group = Group.objects.create(title='Runners', user=cls.owner)
+        cls.activity = GroupActivity.objects.create(
+            title='Group run', user=cls.owner, group=cls.group, max_attendees=2, needs_approval=False)
+
+    def get_count(self):
+        return Activity.objects.get(pk=self.activity.pk).approved_count
+
+    def test_join_and_leave(self):
+        path = reverse('api:activity-requests', kwargs={'uuid': self.activity.uuid.hex})
+
+        for user, status_code in zip(self.users, (201, 201, 403)):
+            self.client.force_login(user)
+            self.assertEqual(self.client.post(path).status_code, status_code)
+
+        self.assertEqual(self.get_count(), 2)
+
+        # leaving a full activity
+        self.client.force_login(self.users[0])
+        self.assertEqual(self.client.post(path).json(), {'deleted': True})
+        self.assertEqual(self.get_count(), 1)
+
+    def test_approve_and_deny(self):
+        requests = [
+            Request.objects.create(activity=self.activity, user=user, status=RequestStatus.PENDING)
+            for user in self.users
+        ]
+        self.client.force_login(self.owner)
+
+        def get_path(request):
+            return reverse('api:requests', kwargs={
+                'uuid': self.activity.uuid.hex, 'request_uuid': request.uuid.hex})
+
+        for request, status_code in zip(requests, (200, 200, 400)):
+            self.assertEqual(self.client.post(get_path(request)).status_code, status_code)
+
+        self.assertEqual(self.get_count(), 2)
+
+        self.assertEqual(self.client.delete(get_path(requests[0])).status_code, 200)
+        self.assertEqual(self.get_count(), 1)
+        self.assertEqual(self.client.post(get_path(requests[2])).status_code, 200)
+        self.assertEqual(self.get_count(), 2)
+
+    def test_members(self):
+        # the owner is a member
+        self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 1)
+
+        stale = Group.objects.get(pk=self.group.pk)
+        membership = Membership.objects.create(group=self.group, user=self.users[0], status=RequestStatus.PENDING)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 1)
+
+        membership = Membership.objects.get(pk=membership.pk)
+        membership.status = RequestStatus.APPROVED
+        membership.save(update_fields=['status'])
+
+        # saving an old copy keeps the count
+        stale.title = 'Sprinters'
+        stale.save()
+        self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 2)
+
+        membership.delete()
+        self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 1)
+
+    def test_membership_view(self):
+        membership = Membership.objects.create(group=self.group, user=self.users[0], status=RequestStatus.PENDING)
+        path = reverse('api:memberships', kwargs={'uuid': membership.uuid.hex})
+
+        self.client.force_login(self.owner)
+
+        # approving again does not count twice
+        for i in range(2):
+            self.assertEqual(self.client.post(path, {'status': RequestStatus.APPROVED}).status_code, 200)
+            self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 2)
+
+        self.assertEqual(self.client.delete(path).status_code, 200)
+        self.assertEqual(self.client.delete(path).status_code, 404)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).member_count, 1)
+
+    def test_check_counters(self):
+        Request.objects.create(activity=self.activity, user=self.users[0], status=RequestStatus.APPROVED)
+        Request.objects.update(is_deleted=True)
+
+        with self.assertRaises(CommandError):
+            call_command('check_counters', stdout=StringIO())
+
+        call_command('check_counters', fix=True, stdout=StringIO())
+        call_command('check_counters', stdout=StringIO())
+        self.assertEqual(self.get_count(), 0)
+
+
+class ConditionalGetTests(SeededTestCase):
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertNotModified(self, path, modify=None):
+        """ The ETag answers with a 304 until `modify` runs """
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+
+        with QueryRecorder() as recorder:
+            cached = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertLess(recorder.count, 8)
+
+        if modify is not None:
+            modify()
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_activity(self):
+        path = reverse('api:activity', kwargs={'uuid': self.activity.uuid.hex})
+
+        self.assertNotModified(path, lambda: self.request.save(update_fields=['status']))
+        self.assertNotModified(path, lambda: self.activity.tags.add(self.other_tag))
+        self.assertNotModified(path, lambda: self.activity.tags.remove(self.other_tag))
+
+    def test_post(self):
+        path = reverse('api:posts', kwargs={'uuid': self.post.uuid.hex})
+
+        self.assertNotModified(path, lambda: Comment.objects.create(body='Me too', user=self.user, post=self.post))
+        self.assertNotModified(path, lambda: self.comment.delete())
+
+    def test_group(self):
+        path = reverse('api:groups', kwargs={'uuid': self.group.uuid.hex})
+
+        def leave():
+            self.membership.is_deleted = True
+            self.membership.save(update_fields=['is_deleted'])
+
+        self.assertNotModified(path, leave)
+
+    def test_self_user(self):
+        path = reverse('api:self-user')
+
+        self.assertNotModified(path, lambda: self.client.post(path, {'first_name': 'Runner'}))
+
+    def test_access_is_checked_first(self):
+        path = reverse('api:activity', kwargs={'uuid': self.activity.uuid.hex})
+        etag = self.client.get(path)['ETag']
+
+        self.activity.public = False
+        self.activity.save(update_fields=['public'])
+
+        stranger = User.objects.create_user(email='stranger@gymder.com', password='password', username='stranger')
+        self.client.force_login(stranger)
+
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+
+# Bundles are built by webpack, which does not run with the tests
+@mock.patch('webpack_loader.loader.WebpackLoader.get_bundle', return_value=[])
+@override_settings(LOCAL_CACHE_IS_SHARED=True)
+class PageContextCacheTests(SeededTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def get_context(self, path):
+        """ :return (JS context, queries) """
+        with QueryRecorder() as recorder:
+            response = self.client.get(path)
+
+        self.assertEqual(response.status_code, 200)
+
+        return json.loads(response.context['context']), recorder.count
+
+    def test_cached_until_save(self, get_bundle):
+        path = reverse('activities:view')
+        context, queries = self.get_context(path)
+
+        cached, cached_queries = self.get_context(path)
+        self.assertEqual(cached, context)
+        self.assertLess(cached_queries, queries)
+
+        self.request.status = RequestStatus.DENIED
+        self.request.save(update_fields=['status'])
+
+        context, queries = self.get_context(path)
+        activity = next(item for item in context['activities'] if item['uuid'] == self.activity.uuid.hex)
+        self.assertEqual(activity['number_of_attendees'], NUMBER_OF_ATTENDEES - 1)
+        self.assertGreater(queries, cached_queries)
+
+    def test_membership_changes(self, get_bundle):
+        path = reverse('groups:members', kwargs={'uuid': self.group.uuid.hex})
+        context, queries = self.get_context(path)
+
+        self.membership.is_deleted = True
+        self.membership.save(update_fields=['is_deleted'])
+
+        self.assertEqual(len(self.get_context(path)[0]['memberships']), len(context['memberships']) - 1)
+
+    def test_cached_per_user(self, get_bundle):
+        path = reverse('groups:index')
+        self.get_context(path)
+
+        self.client.force_login(self.membership.user)
+        context, queries = self.get_context(path)
+
+        self.assertEqual([group['uuid'] for group in context['groups']], [self.group.uuid.hex])
+        self.assertEqual(context['owned_groups'], [])
+
+    def test_unrelated_saves_keep_the_cache(self, get_bundle):
+        path = reverse('activities:view')
+        self.get_context(path)
+        cached, cached_queries = self.get_context(path)
+
+        stranger = User.objects.create_user(email='stranger@gymder.com', password='password', username='stranger')
+        self.assertTrue(Client().login(email='stranger@gymder.com', password='password'))
+        IndividualActivity.objects.create(title='Swim', user=stranger, time=timezone.now() + timedelta(days=1))
+
+        self.assertEqual(self.get_context(path), (cached, cached_queries))
+
+    def test_cleared_tag(self, get_bundle):
+        path = reverse('activities:view')
+        self.get_context(path)
+
+        self.other_tag.activities.clear()
+
+        context, queries = self.get_context(path)
+        self.assertEqual(
+            {tag['title'] for activity in context['activities'] for tag in activity['tags']}, {self.tag.title})
+
+    @override_settings(LOCAL_CACHE_IS_SHARED=False)
+    def test_not_cached_without_a_shared_cache(self, get_bundle):
+        path = reverse('activities:view')
+
+        self.assertEqual(self.get_context(path)[1], self.get_context(path)[1])
+
+
+class FastSerializerTests(SeededTestCase):
+    """ `.values()` serializers have to render the same JSON as the DRF ones """
+
+    def assertSameJSON(self, serializer_class, fast_serializer_class, queryset):
+        render = JSONRenderer().render
+        expected = serializer_class(serializer_class.prepare_queryset(queryset), many=True).data
+
+        self.assertEqual(render(fast_serializer_class(queryset).data), render(expected))
+
+    def test_activities(self):
+        # no address, tags or attendees
+        IndividualActivity.objects.create(title='Swim', user=self.user, time=timezone.now())
+
+        self.assertSameJSON(
+            ActivitySerializer, FastActivitySerializer, Activity.objects.order_by('pk'))
+
+    def test_groups(self):
+        Group.objects.create(title='Swimmers')
+
+        self.assertSameJSON(GroupSerializer, FastGroupSerializer, Group.objects.order_by('pk'))
+
+    def test_memberships(self):
+        memberships = Membership.objects.order_by('pk')
+
+        self.assertSameJSON(MembershipSerializer, FastMembershipSerializer, memberships)
+        self.assertSameJSON(UserMembershipSerializer, FastUserMembershipSerializer, memberships)
+
+    def test_posts(self):
+        self.assertSameJSON(PostSerializer, FastPostSerializer, Post.objects.order_by('pk'))
+
+    def test_empty(self):
+        self.assertEqual(FastActivitySerializer(Activity.objects.none()).data, [])
@@ -2,9 +2,10 @@ from datetime import datetime
 from itertools import chain
 import uuid
 
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, Q, prefetch_related_objects
 from django.shortcuts import get_object_or_404
-from django.http import Http404, HttpResponseForbidden, HttpResponseBadRequest
+from django.http import Http404, HttpResponseForbidden
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -20,15 +21,24 @@ from apps.activities.models import (
 )
 from apps.activities.serializers import (
     ActivitySerializer, 
+    FastActivitySerializer,
     IndividualActivitySerializer,
     GroupActivitySerializer,
+    NearbyActivitySerializer,
+    NearbySearchSerializer,
     RequestSerializer,
     UserRequestSerializer
 )
-from apps.activities.utils import can_edit_activity, can_view_activity, find_close_to_address
+from apps.activities.utils import (
+    can_edit_activity,
+    can_view_activity,
+    find_nearest_to_coordinates,
+    lock_activity
+)
 from apps.communication.models import Post, Comment
 from apps.communication.serializers import (
     CommentSerializer, 
+    FastPostSerializer,
     PostSerializer,
     FullPostSerializer)  
 from apps.groups.constants import MembershipTypes
@@ -36,20 +46,27 @@ from apps.groups.models import Group, Membership
 from apps.groups.serializer import (
     GroupSerializer,
     BriefGroupSerializer,
+    FastGroupSerializer,
+    FastMembershipSerializer,
+    FastUserMembershipSerializer,
     MembershipSerializer,
     UserMembershipSerializer
 )
 from apps.groups.utils import has_access, can_edit
 from apps.users.models import User
 from apps.users.serializers import UserSerializer
+from apps.utils.conditional import count, latest
+from apps.utils.location_pings import record_location
 from apps.utils.location_utils import get_similar_addresses
 from apps.utils.models import Tag
+from apps.utils.pagination import KeysetPagination, encode_cursor, get_next_link
 from apps.utils.serializers import (
     TagSerializer,
     AddressSerializer,
+    AddressLookupSerializer,
     MinimalAddressSerializer
 )
-from apps.utils.views_mixins import PutPatchMixin
+from apps.utils.views_mixins import ConditionalGetMixin, FastListMixin, PutPatchMixin
 
 from .views_mixins import (
     FindActivityMixin,
@@ -78,24 +95,53 @@ class GroupActivityView(ActivityMixin, APIView):
     serializer_class = GroupActivitySerializer
 
 
-class ActivityView(PutPatchMixin, FindActivityMixin, APIView):
+class ActivityView(ConditionalGetMixin, PutPatchMixin, FindActivityMixin, APIView):
     """
     Individual and group activity UD
     """
     individual_serializer_class = IndividualActivitySerializer
     group_serializer_class = GroupActivitySerializer
 
+    def get_version_annotations(self):
+        requests = Request.objects.all()
+        tags = Activity.tags.through.objects.all()
+
+        return {
+            'version_user': F('user__updated_at'),
+            'version_group': F('group__updated_at'),
+            'version_activity_type': F('activity_type__updated_at'),
+            # addresses are filled in by the enrichment
+            'version_address_place': F('address__google_place_id'),
+            'version_address_latitude': F('address__latitude'),
+            'version_address_longitude': F('address__longitude'),
+            'version_requests': latest(requests, 'activity'),
+            'version_request_count': count(requests, 'activity'),
+            'version_request_users': latest(requests.filter(is_deleted=False), 'activity', 'user__updated_at'),
+            'version_tags': latest(tags, 'activity', 'pk'),
+            'version_tag_count': count(tags, 'activity'),
+        }
+
     def get(self, request, *args, **kwargs):
-        activity = self.get_activity(kwargs['uuid'], request.user)
+        # both serializers load the same relations
+        select, prefetch = self.individual_serializer_class.get_prefetch_plan()
+
+        # the rest of the relations is only loaded when the client does not have this version
+        activity = self.get_activity(
+            kwargs['uuid'],
+            request.user,
+            queryset=self.with_versions(Activity.objects.select_related(*select)))
 
         can_view_activity(activity, request.user, raise_exception=True)
-        
-        if activity.FORMAT == ActivityFormat.INDIVIDUAL:
-            serializer = self.individual_serializer_class(activity)
-        else:
-            serializer = self.group_serializer_class(activity)
 
-        return Response(serializer.data)
+        def get_data():
+            prefetch_related_objects([activity], *prefetch)
+
+            if activity.FORMAT == ActivityFormat.INDIVIDUAL:
+                return self.individual_serializer_class(activity).data
+
+            return self.group_serializer_class(activity).data
+
+        return self.get_conditional_response(request, activity, get_data)
 
     def post(self, request, *args, **kwargs):
         activity = self.get_activity(kwargs['uuid'], request.user)
@@ -189,11 +235,14 @@ class ActivityTagsView(FindActivityMixin, APIView):
         return Response()
 
 
-class ActivityTagFilterView(ListAPIView):
+class ActivityTagFilterView(FastListMixin, ListAPIView):
     """
     Search activities based on tags
     """
     serializer_class = ActivitySerializer
+    fast_serializer_class = FastActivitySerializer
+    pagination_class = KeysetPagination
+    ordering = ('-time', '-pk')
 
     def get_queryset(self):
         tag_identifier = self.kwargs.get('identifier', None)
@@ -209,16 +258,10 @@ class ActivityTagFilterView(ListAPIView):
         else:
             tag = get_object_or_404(Tag, title=tag_identifier)
 
-        return Activity.objects.filter(
-            Q(user=self.request.user) | Q(public=True) |
-            Q(
-                requests__user=self.request.user,
-                requests__status=RequestStatus.APPROVED,
-                requests__is_deleted=False
-            ),
-            is_deleted=False,
-            tags=tag
-        ).filter(time__gte=datetime.today()).order_by('-time')
+        return Activity.objects.visible_to(self.request.user).filter(
+            tags=tag,
+            time__gte=datetime.today()
+        )
 
 
 class RegisterActivityAddress(FindActivityMixin, APIView):
@@ -243,9 +286,6 @@ class RegisterActivityAddress(FindActivityMixin, APIView):
 
         address_instance = serializer.save()
 
-        address_instance.user = request.user
-        address_instance.save(update_fields=['user'])
-
         activity.address = address_instance
         activity.save(update_fields=['address'])
 
@@ -254,37 +294,64 @@ class RegisterActivityAddress(FindActivityMixin, APIView):
 
 class NearbyActivitiesView(APIView):
     """
-    Return the activities nearby coordinates
+    Return the activities nearby coordinates, closest first
 
     Specify `longitude` and `latitude` in the request
+    Optionally specify `radius` in meters and `k` for the maximum number of activities
+
+    Coordinates are not stored as an address, they only go to the buffered location history
+
+    If there might be more activities in the radius, the `Link` header
+    points to the next ones with a `cursor` parameter
     """
     address_serializer_class = MinimalAddressSerializer
-    serializer_class = ActivitySerializer
+    search_serializer_class = NearbySearchSerializer
+    serializer_class = NearbyActivitySerializer
 
     def get(self, request, *args, **kwargs):
         address_serializer = self.address_serializer_class(data=request.data)
+        params = request.data
 
         try:
             address_serializer.is_valid(raise_exception=True)
         except:
             address_serializer = self.address_serializer_class(data=request.GET)
             address_serializer.is_valid(raise_exception=True)
+            params = request.GET
+
+        search_serializer = self.search_serializer_class(data=params)
+        search_serializer.is_valid(raise_exception=True)
 
-        address_instance = address_serializer.save()
+        k = search_serializer.validated_data['k']
+        latitude = address_serializer.validated_data['latitude']
+        longitude = address_serializer.validated_data['longitude']
 
-        address_instance.user = request.user
-        address_instance.save(update_fields=['user'])
+        record_location(request.user, latitude, longitude)
 
-        activities = find_close_to_address(address_instance)
+        activities = find_nearest_to_coordinates(
+            latitude,
+            longitude,
+            k=k,
+            radius=search_serializer.validated_data['radius'] / 1000,
+            after=search_serializer.validated_data.get('cursor', None),
+            queryset=self.serializer_class.prepare_queryset(Activity.objects.all()))
 
         serializer = self.serializer_class(activities, many=True)
+        headers = {}
 
-        return Response(status=status.HTTP_200_OK, data=serializer.data)
+        if len(activities) == k:
+            last = activities[-1]
+            cursor = encode_cursor({'distance': last.distance, 'id': last.pk})
+            headers['Link'] = get_next_link(request, cursor)
+
+        return Response(status=status.HTTP_200_OK, data=serializer.data, headers=headers)
 
 
 class SearchActivitiesView(APIView):
     """
-    Search activities
+    Search activities visible to the user
+
+    With `query` the best matches come first
     """
     serializer_class =  ActivitySerializer
 
@@ -294,27 +361,12 @@ class SearchActivitiesView(APIView):
         if query is None:
             query = request.GET.get('query', None)
 
-        memberships = request.user.memberships.filter(status=RequestStatus.APPROVED)
+        activities = Activity.objects.visible_to(request.user)
 
-        activities = Activity.objects.filter(Q(user=request.user) | Q(public=True), is_deleted=False)
-        groups = request.user.owned_groups.filter(is_deleted=False)
-        requests = request.user.requests.filter(
-            Q(status=RequestStatus.PENDING) | Q(status=RequestStatus.APPROVED), is_deleted=False)
-
-        for group in groups:
-            activities |= group.activities.filter(is_deleted=False)
-        
-        for membership in memberships:
-            activities |= membership.group.activities.filter(is_deleted=False)
+        if query:
+            activities = activities.search(query)
 
-        for r in requests:
-            activities |= Activity.objects.filter(pk=r.activity.pk)
-
-        if query is not None:
-            activities = activities.filter(
-                Q(title__icontains=query) | Q(description__icontains=query) | Q(tags__title__icontains=query) | Q(address__address__icontains=query))
-
-        serializer = self.serializer_class(activities, many=True)
+        serializer = FastActivitySerializer(activities)
         return Response(status=status.HTTP_200_OK, data=serializer.data)
 
 
@@ -327,7 +379,7 @@ class ActivityRequestView(FindActivityMixin, APIView):
     def get(self, request, *args, **kwargs):
         activity = self.get_activity(uuid=kwargs['uuid'], user=request.user)
 
-        requests = activity.requests.filter(is_deleted=False)
+        requests = self.serializer_class.prepare_queryset(activity.requests.filter(is_deleted=False))
 
         serializer = self.serializer_class(requests, many=True)
 
@@ -336,38 +388,32 @@ class ActivityRequestView(FindActivityMixin, APIView):
     def post(self, request, *args, **kwargs):
         activity = self.get_activity(uuid=kwargs['uuid'], user=request.user)
 
-        # check if the request already exists
-        user_request = Request.objects.filter(
-            user=request.user, 
-            activity=activity, 
-            is_deleted=False)
+        if activity.user_id == request.user.pk:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        if hasattr(activity, 'max_attendees'):
-            # it is a group activity, check if it has less than the max_attendees
-            if activity.number_of_attendees >= activity.max_attendees:
-                return Response(
-                    status=status.HTTP_403_FORBIDDEN, data={'detail': 'aready full'})
-        elif not user_request.exists():
-            # it is an individual activity, check if it has at least one attendee
-            if activity.number_of_attendees != 0:
-                return Response(
-                    status=status.HTTP_403_FORBIDDEN, data={'detail': 'already full'})
+        with transaction.atomic():
+            lock_activity(activity)
 
-        if activity.user == request.user:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+            # check if the request already exists
+            user_request = Request.objects.filter(
+                user=request.user,
+                activity=activity,
+                is_deleted=False).first()
 
-        user_request, created = Request.objects.get_or_create(
-            user=request.user,
-            activity=activity,
-            is_deleted=False)
+            # asking again leaves the activity, also when it is full
+            if user_request is not None:
+                user_request.is_deleted = True
+                user_request.save(update_fields=['is_deleted'])
+                return Response({'deleted': True})
 
-        if not created:
-            user_request.is_deleted = True
-            user_request.save(update_fields=['is_deleted'])
-            return Response({'deleted': True})
+            if activity.is_full:
+                return Response(
+                    status=status.HTTP_403_FORBIDDEN, data={'detail': 'already full'})
 
-        user_request.status = activity.default_status
-        user_request.save(update_fields=['status'])
+            user_request = Request.objects.create(
+                user=request.user,
+                activity=activity,
+                status=activity.default_status)
 
         serializer = self.serializer_class(user_request)
 
@@ -402,21 +448,22 @@ class RequestView(FindActivityMixin, APIView):
 
         can_edit_activity(activity, request.user, raise_exception=True)
 
-        user_request = get_object_or_404(
-            Request,
-            uuid=kwargs['request_uuid'],
-            activity=activity,
-            is_deleted=False)
-        
-        if hasattr(activity, 'max_attendees') and activity.max_attendees >= activity.number_of_attendees:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        elif activity.number_of_attendees != 0:
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            lock_activity(activity)
 
-        user_request.status = RequestStatus.APPROVED
-        user_request.save(update_fields=['status'])
+            user_request = get_object_or_404(
+                Request.objects.select_for_update(),
+                uuid=kwargs['request_uuid'],
+                activity=activity,
+                is_deleted=False)
 
-        serializer = self.serializer_class(user_request)
+            if user_request.status != RequestStatus.APPROVED and activity.is_full:
+                return Response(status=status.HTTP_400_BAD_REQUEST, data={'detail': 'already full'})
+
+            user_request.status = RequestStatus.APPROVED
+            user_request.save(update_fields=['status'])
+
+        serializer = self.serializer_class(self.get_request(user_request))
 
         return Response(data=serializer.data)
 
@@ -424,27 +471,38 @@ class RequestView(FindActivityMixin, APIView):
         activity = self.get_activity(uuid=kwargs['uuid'], user=request.user)
         can_edit_activity(activity, request.user, raise_exception=True)
 
-        user_request = get_object_or_404(
-            Request,
-            uuid=kwargs['request_uuid'],
-            activity=activity,
-            is_deleted=False)
+        with transaction.atomic():
+            # a concurrent approval is counted before this one reads the status
+            user_request = get_object_or_404(
+                Request.objects.select_for_update(),
+                uuid=kwargs['request_uuid'],
+                activity=activity,
+                is_deleted=False)
 
-        user_request.status = RequestStatus.DENIED
-        user_request.save(update_fields=['status'])
+            user_request.status = RequestStatus.DENIED
+            user_request.save(update_fields=['status'])
 
-        serializer = self.serializer_class(user_request)
+        serializer = self.serializer_class(self.get_request(user_request))
 
         return Response(data=serializer.data)
 
+    def get_request(self, user_request):
+        """ Reload the saved request with the relations the serializer reads """
+        return self.serializer_class.prepare_queryset(Request.objects.all()).get(pk=user_request.pk)
+
 # User views
 
 
-class SelfUserView(RetrieveAPIView):
+class SelfUserView(ConditionalGetMixin, RetrieveAPIView):
     serializer_class = UserSerializer
     
     def get_object(self):
         return self.request.user
+
+    def get(self, request, *args, **kwargs):
+        user = self.get_object()
+
+        return self.get_conditional_response(request, user, lambda: self.serializer_class(user).data)
     
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(instance=request.user, data=request.data)
@@ -501,28 +559,36 @@ class UserTagsView(ListAPIView):
         return Response()
 
 
-class UserActivitiesView(ListAPIView):
+class UserActivitiesView(FastListMixin, ListAPIView):
     """ Get future user activities """
     serializer_class = ActivitySerializer
+    fast_serializer_class = FastActivitySerializer
+    pagination_class = KeysetPagination
+    ordering = ('time', 'pk')
 
     def get_queryset(self):
+        requests = Request.objects.filter(
+            user=self.request.user,
+            status=RequestStatus.APPROVED,
+            is_deleted=False)
+
+        # a subquery instead of joining requests, which repeats owned activities
         return Activity.objects.filter(
             time__gte=datetime.today(),
             is_deleted=False
         ).filter(
-            Q(user=self.request.user) | Q(
-                requests__user=self.request.user,
-                requests__status=RequestStatus.APPROVED,
-                requests__is_deleted=False
-            )
+            Q(user=self.request.user) | Q(pk__in=requests.values('activity'))
         )
 
 
-class UserMembershipsView(ListAPIView):
+class UserMembershipsView(FastListMixin, ListAPIView):
     """
     Retrieve all user group memberships
     """
     serializer_class = UserMembershipSerializer
+    fast_serializer_class = FastUserMembershipSerializer
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-pk')
 
     def get_queryset(self):
         return self.request.user.memberships.filter(
@@ -544,38 +610,41 @@ class UserAddressView(APIView):
             data=serializer.data)
 
     def post(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data)
+        # city and country are enough for the user location
+        serializer = self.serializer_class(data=request.data, context={'detailed': False})
 
         serializer.is_valid(raise_exception=True)
 
-        instance = serializer.save()
-
         user = request.user
 
+        instance = serializer.save()
+
         user.address = instance
         user.save(update_fields=['address'])
 
-        instance.user = user
-        instance.save(update_fields=['user'])
-
         return Response(
             status=status.HTTP_201_CREATED, 
             data=serializer.data)
 
 
-class UserGroupView(ListAPIView):
+class UserGroupView(FastListMixin, ListAPIView):
     """
     User group view
     """
     serializer_class = GroupSerializer
+    fast_serializer_class = FastGroupSerializer
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-pk')
 
     def get_queryset(self):
+        memberships = self.request.user.memberships.filter(
+            status=RequestStatus.APPROVED,
+            is_deleted=False)
+
+        # a subquery instead of joining memberships, which repeats owned groups
         groups = Group.objects.filter(
             is_deleted=False).filter(
-                Q(user=self.request.user) | Q(
-                    memberships__user=self.request.user, 
-                    memberships__status=RequestStatus.APPROVED,
-                    memberships__is_deleted=False)
+                Q(user=self.request.user) | Q(pk__in=memberships.values('group'))
             )
         
         return groups
@@ -594,18 +663,28 @@ class UserGroupView(ListAPIView):
 # Groups views
 
 
-class GroupView(GroupMixin, PutPatchMixin, APIView):
+class GroupView(ConditionalGetMixin, GroupMixin, PutPatchMixin, APIView):
     """
     User group view
     """
     serializer_class = BriefGroupSerializer
 
-    def get(self, request, *args, **kwargs):
-        group = self.get_group(uuid=kwargs['uuid'], user=request.user)
+    def get_version_annotations(self):
+        memberships = Membership.objects.all()
 
-        serializer = self.serializer_class(group)
+        return {
+            'version_user': F('user__updated_at'),
+            'version_memberships': latest(memberships, 'group'),
+            'version_membership_count': count(memberships, 'group'),
+        }
 
-        return Response(data=serializer.data)
+    def get(self, request, *args, **kwargs):
+        group = self.get_group(
+            uuid=kwargs['uuid'],
+            user=request.user,
+            queryset=self.with_versions(self.serializer_class.prepare_queryset(Group.objects.all())))
+
+        return self.get_conditional_response(request, group, lambda: self.serializer_class(group).data)
 
     def post(self, request, *args, **kwargs):
         group = self.get_group_edit(uuid=kwargs['uuid'], user=request.user)
@@ -640,8 +719,7 @@ class GroupMembershipsView(GroupMixin, APIView):
     def get(self, request, *args, **kwargs):
         group = self.get_group(kwargs['uuid'], request.user)
 
-        serializer = self.serializer_class(
-            group.memberships.filter(is_deleted=False), many=True)
+        serializer = FastMembershipSerializer(group.memberships.filter(is_deleted=False))
         
         return Response(data=serializer.data)
 
@@ -706,13 +784,17 @@ class MembershipView(MembershipMixin, APIView):
 
         Only the superuser and group admin/owner can access this
         """
-        membership = self.get_membership_edit(
-            uuid=kwargs['uuid'], user=request.user)
+        with transaction.atomic():
+            # a concurrent approval is counted before this one reads the status
+            membership = self.get_membership_edit(
+                uuid=kwargs['uuid'],
+                user=request.user,
+                queryset=Membership.objects.select_for_update(of=('self',)))
 
-        serializer = self.serializer_class(membership, data=request.data)
+            serializer = self.serializer_class(membership, data=request.data)
 
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
 
         return Response(status=status.HTTP_200_OK, data=serializer.data)
 
@@ -722,19 +804,27 @@ class MembershipView(MembershipMixin, APIView):
 
         Can be accessed by superuser, group admin and the user of the membership
         """
-        membership = self.get_membership_delete(kwargs['uuid'], user=request.user)
+        with transaction.atomic():
+            # a concurrent delete is counted before this one reads the membership
+            membership = self.get_membership_delete(
+                kwargs['uuid'],
+                user=request.user,
+                queryset=Membership.objects.select_for_update(of=('self',)))
 
-        membership.is_deleted = True
-        membership.save(update_fields=['is_deleted'])
+            membership.is_deleted = True
+            membership.save(update_fields=['is_deleted'])
 
         return Response(status=status.HTTP_200_OK)
 
 
-class GroupActivitiesView(GroupMixin, ListAPIView):
+class GroupActivitiesView(GroupMixin, FastListMixin, ListAPIView):
     """
     Group activities CRUD
     """
     serializer_class = ActivitySerializer
+    fast_serializer_class = FastActivitySerializer
+    pagination_class = KeysetPagination
+    ordering = ('-time', '-pk')
 
     def get_queryset(self):
         group = self.get_group(self.kwargs['uuid'], self.request.user)
@@ -745,11 +835,14 @@ class GroupActivitiesView(GroupMixin, ListAPIView):
 # Communication views
 
 
-class GroupPostView(GroupMixin, ListAPIView):
+class GroupPostView(GroupMixin, FastListMixin, ListAPIView):
     """
     Get or create posts inside a group
     """
     serializer_class = PostSerializer
+    fast_serializer_class = FastPostSerializer
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-pk')
 
     def get_queryset(self):
         group = self.get_group(self.kwargs['uuid'], self.request.user)
@@ -772,17 +865,19 @@ class GroupPostView(GroupMixin, ListAPIView):
             data=serializer.data)
 
 
-class ActivityPostView(FindActivityMixin, ListAPIView):
+class ActivityPostView(FindActivityMixin, FastListMixin, ListAPIView):
     """
     Get or create posts inside activity
     """
     serializer_class = PostSerializer
+    fast_serializer_class = FastPostSerializer
+    pagination_class = KeysetPagination
+    ordering = ('-created_at', '-pk')
 
     def get_queryset(self):
-        print(self.kwargs['uuid'])
         activity = self.get_activity(self.kwargs['uuid'], self.request.user)
 
-        posts = activity.posts.filter(is_deleted=False).order_by('-created_at')
+        posts = activity.posts.filter(is_deleted=False)
 
         return posts
     
@@ -800,7 +895,7 @@ class ActivityPostView(FindActivityMixin, ListAPIView):
             data=serializer.data)
 
 
-class PostView(PostMixin, PutPatchMixin, APIView):
+class PostView(ConditionalGetMixin, PostMixin, PutPatchMixin, APIView):
     """
     Post view
 
@@ -810,14 +905,23 @@ class PostView(PostMixin, PutPatchMixin, APIView):
     """
     serializer_class = FullPostSerializer
 
-    def get(self, request, *args, **kwargs):
-        post = self.get_post(kwargs['uuid'], request.user)
+    def get_version_annotations(self):
+        comments = Comment.objects.all()
 
-        serializer = self.serializer_class(post)
+        return {
+            'version_user': F('user__updated_at'),
+            'version_comments': latest(comments, 'post'),
+            'version_comment_count': count(comments, 'post'),
+            'version_comment_users': latest(comments.filter(is_deleted=False), 'post', 'user__updated_at'),
+        }
 
-        return Response(
-            status=status.HTTP_200_OK,
-            data=serializer.data)
+    def get(self, request, *args, **kwargs):
+        post = self.get_post(
+            kwargs['uuid'],
+            request.user,
+            queryset=self.with_versions(self.serializer_class.prepare_queryset(Post.objects.all())))
+
+        return self.get_conditional_response(request, post, lambda: self.serializer_class(post).data)
 
     def post(self, request, *args, **kwargs):
         post = get_object_or_404(Post, uuid=kwargs['uuid'], is_deleted=False)
@@ -855,7 +959,9 @@ class CommentView(PostMixin, APIView):
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        serializer.save(user=request.user, post=post)
+        # the comment and the count of its post are committed together
+        with transaction.atomic():
+            serializer.save(user=request.user, post=post)
 
         return Response(status=status.HTTP_201_CREATED, data=serializer.data)
 
@@ -866,13 +972,15 @@ class CommentView(PostMixin, APIView):
         if 'comment_uuid' not in kwargs:
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        comment = get_object_or_404(Comment, uuid=kwargs['comment_uuid'])
+        with transaction.atomic():
+            # a concurrent delete is counted before this one reads the comment
+            comment = get_object_or_404(Comment.objects.select_for_update(), uuid=kwargs['comment_uuid'])
 
-        if comment.user != request.user:
-            return HttpResponseForbidden()
+            if comment.user_id != request.user.pk:
+                return HttpResponseForbidden()
 
-        comment.is_deleted = True
-        comment.save(update_fields=['is_deleted'])
+            comment.is_deleted = True
+            comment.save(update_fields=['is_deleted'])
 
         return Response(status=status.HTTP_200_OK)
 
@@ -884,10 +992,12 @@ class GetSimilarAddressesView(APIView):
     serializer_class = AddressSerializer
 
     def post(self, request, *args, **kwargs):
-        if 'address' not in request.data:
-            return HttpResponseBadRequest()
+        lookup = AddressLookupSerializer(data=request.data)
+
+        if not lookup.is_valid():
+            return Response(data=lookup.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        addresses = get_similar_addresses(request.data['address'])
+        addresses = get_similar_addresses(**lookup.validated_data)
 
         serializer = AddressSerializer(addresses, many=True)
 
@@ -1,15 +1,16 @@
 from django.core.exceptions import PermissionDenied
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 
 from rest_framework.response import Response
 from rest_framework import status
 
-from apps.activities.constants import RequestStatus
-from apps.activities.models import GroupActivity, IndividualActivity
+from apps.activities.access import get_access
+from apps.activities.models import Activity
 from apps.communication.models import Post
-from apps.groups.constants import MembershipTypes
 from apps.groups.models import Group, Membership
 from apps.utils.models import Address
+from apps.utils.pagination import KeysetPagination
 
 
 class FindActivityMixin(object):
@@ -17,42 +18,24 @@ class FindActivityMixin(object):
     Mixin to help find the activity based on UUID.
     """
 
-    def get_activity(self, uuid, user):
+    def get_activity(self, uuid, user, queryset=None):
         """
         Finds appropriate activity and returns activity if user has enough rights
+        Provide `queryset` to load relations together with the activity
         """
-        try:
-            activity = IndividualActivity.objects.get(uuid=uuid, is_deleted=False)
-        except:
-            activity = get_object_or_404(GroupActivity, uuid=uuid, is_deleted=False)
+        if queryset is None:
+            queryset = Activity.objects.all()
 
-        if activity.public:
-            return activity
-        
-        if activity.user == user:
-            return activity
-
-        request = activity.requests.filter(
-            user=user,
-            is_deleted=False,
-            status__in=[RequestStatus.PENDING, RequestStatus.APPROVED])
+        access = get_access(user)
 
-        if request.exists():
-            return activity
-
-        group = activity.group
+        activity = get_object_or_404(
+            access.with_activity_access(queryset).with_subclasses(), uuid=uuid, is_deleted=False)
 
-        if group is not None:
-            if group.user == user:
-                return activity
-            
-            membership = group.memberships.filter(
-                user=user, 
-                status=RequestStatus.APPROVED, 
-                is_deleted=False)
+        if activity.FORMAT is None:
+            raise Http404()
 
-            if membership.exists():
-                return activity
+        if access.activity(activity).can_view:
+            return activity
 
         raise PermissionDenied()
 
@@ -65,13 +48,19 @@ class ActivityMixin(object):
     """
     object_class = None
     serializer_class = None
+    pagination_class = KeysetPagination
+    ordering = ('-time', '-pk')
 
     def get(self, request, *args, **kwargs):
-        activities = self.object_class.objects.all()
+        activities = self.serializer_class.prepare_queryset(
+            self.object_class.objects.all())
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(activities, request, view=self)
 
-        serializer = self.serializer_class(activities, many=True)
+        serializer = self.serializer_class(page, many=True)
 
-        return Response(status=status.HTTP_200_OK, data=serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
@@ -84,10 +73,6 @@ class ActivityMixin(object):
             try:
                 address = Address.objects.get(uuid=request.data['address_uuid'])
 
-                # attach the "creator" of the address
-                address.user = request.user
-                address.save(update_fields=['user'])
-
                 instance.address = address
                 instance.save(update_fields=['address'])
             except Exception as e:
@@ -117,15 +102,13 @@ class GroupMixin(object):
 
     Use `get_group_edit` for updating/deleting it
     """
-    def get_group(self, uuid, user):
-        group = get_object_or_404(Group, uuid=uuid, is_deleted=False)
+    def get_group(self, uuid, user, queryset=None):
+        if queryset is None:
+            queryset = Group.objects.all()
 
-        membership = group.memberships.filter(user=user, status=RequestStatus.APPROVED)
-        
-        if membership.exists() or \
-            group.user==user or \
-                (group.public==True and group.needs_approval==False ):
-            
+        group = get_object_or_404(queryset, uuid=uuid, is_deleted=False)
+
+        if get_access(user).group(group).can_preview:
             return group
 
         raise PermissionDenied()
@@ -133,17 +116,9 @@ class GroupMixin(object):
     def get_group_edit(self, uuid, user):
         group = self.get_group(uuid, user)
 
-        membership = group.memberships.filter(user=user, status=RequestStatus.APPROVED)
-
-        if group.user == user:
+        if get_access(user).group(group).can_edit:
             return group
 
-        if membership.exists():
-            membership = membership.first()
-
-            if membership.membership_type == MembershipTypes.ADMIN:
-                return group
-
         raise PermissionDenied()
 
 
@@ -160,55 +135,34 @@ class MembershipMixin(object):
     Use `get_membership_delete` if it for removing it
     Can be accessed by group admins and the membership user
     """
-    def get_membership(self, uuid, user):
-        membership = get_object_or_404(Membership, uuid=uuid, is_deleted=False)
-
-        if membership.user == user:
-            return membership
+    def get_membership(self, uuid, user, queryset=None):
+        if queryset is None:
+            queryset = Membership.objects.all()
 
-        group = membership.group
+        membership = get_object_or_404(
+            queryset.select_related('group'), uuid=uuid, is_deleted=False)
 
-        if group.public:
+        if membership.user_id == user.pk:
             return membership
 
-        group_membership = group.memberships.filter(
-            user=user, 
-            is_deletef=False, 
-            status=RequestStatus.APPROVED)
-
-        if group_membership.exists():
+        if membership.group.public or get_access(user).group(membership.group).can_view:
             return membership
         
         raise PermissionDenied()
 
-    def get_membership_edit(self, uuid, user):
-        membership = self.get_membership(uuid, user)
-        group = membership.group
+    def get_membership_edit(self, uuid, user, queryset=None):
+        membership = self.get_membership(uuid, user, queryset=queryset)
 
-        if membership.group.user == user:
+        if get_access(user).group(membership.group).can_edit:
             return membership
-        else:
-            group_membership = group.memberships.filter(
-                user=user, is_deleted=False, status=RequestStatus.APPROVED)
-
-            if group_membership.exists() and \
-                group_membership.membership_type == MembershipTypes.ADMIN:
-                return membership
         
         raise PermissionDenied()
 
-    def get_membership_delete(self, uuid, user):
-        membership = self.get_membership(uuid, user)
+    def get_membership_delete(self, uuid, user, queryset=None):
+        membership = self.get_membership(uuid, user, queryset=queryset)
 
-        if membership.group.user == user or membership.user:
+        if membership.user_id == user.pk or get_access(user).group(membership.group).can_edit:
             return membership
-        else:
-            group_membership = membership.group.memberships.filter(
-                user=user, is_deleted=False, status=RequestStatus.APPROVED)
-
-            if group_membership.exists() and \
-                group_membership.membership_type == MembershipTypes.ADMIN:
-                return membership
 
         raise PermissionDenied()
 
@@ -217,69 +171,40 @@ class PostMixin(object):
     """
     Post mixin for retrieving posts
     """
-    def get_post(self, uuid, user):
-        post = get_object_or_404(Post, uuid=uuid, is_deleted=False)
-
-        group = post.group
-        activity = post.activity
-
-        if post.user != user:
-            if group is not None:
-                membership = group.memberships.filter(
-                    user=user,
-                    is_deleted=False,
-                    status=RequestStatus.APPROVED)
-                
-                if not membership.exists() and group.user != user:
-                    raise PermissionDenied()
-            elif activity is not None:
-                if not activity.public:
-                    activity_group = activity.group
-                    
-                    if activity_group is not None:
-                        memberships = activity_group.memberships.filter(
-                            user=user,
-                            is_deleted=False,
-                            status=RequestStatus.APPROVED)
-                        
-                        if not membership.exists() and activity_group != user:
-                            raise PermissionDenied()
-                    elif activity.user != user and \
-                        not activity.requests.filter(
-                            user=user, 
-                            status__in=[RequestStatus.APPROVED, RequestStatus.PENDING], 
-                            is_deleted=False).exists():
-                        raise PermissionDenied()
+    def get_post(self, uuid, user, queryset=None):
+        if queryset is None:
+            queryset = Post.objects.all()
+
+        post = get_object_or_404(
+            queryset.select_related('group', 'activity'), uuid=uuid, is_deleted=False)
+
+        if post.user_id == user.pk:
+            return post
+
+        access = get_access(user)
+
+        if post.group is not None and not access.group(post.group).can_view:
+            raise PermissionDenied()
+
+        if post.activity is not None and not access.activity(post.activity).can_view:
+            raise PermissionDenied()
 
         return post
     
     def get_post_delete(self, uuid, user):
-        post = get_object_or_404(Post, uuid=uuid, is_deleted=False)
-
-        group = post.group
-        activity = post.activity
-
-        if post.user == user:
-            if group is not None:
-                membership = group.memberships.filter(
-                    user=user,
-                    is_deleted=False,
-                    status=RequestStatus.APPROVED,
-                    membership_type=MembershipTypes.ADMIN)
-                
-                if not membership.exists() and group.user != user:
-                    raise PermissionDenied()
-            elif activity is not None:
-                if activity.user != user:
-                    activity_group = activity.group
-
-                    if activity_group is not None:
-                        memberships = activity_group.memberships.filter(
-                            user=user,
-                            is_deleted=False,
-                            status=RequestStatus.APPROVED,
-                            membership_type=MembershipTypes.ADMIN)
-                        
-                        if not memberships.exists() and activity_group.user != user:
-                            raise PermissionDenied()
-        return post
+        """ Authors can remove their posts, as well as the group admins or the activity owner """
+        post = get_object_or_404(
+            Post.objects.select_related('group', 'activity'), uuid=uuid, is_deleted=False)
+
+        if post.user_id == user.pk:
+            return post
+
+        access = get_access(user)
+
+        if post.group is not None and access.group(post.group).can_edit:
+            return post
+
+        if post.activity is not None and access.activity(post.activity).can_moderate:
+            return post
+
+        raise PermissionDenied()
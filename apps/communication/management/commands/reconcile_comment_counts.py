@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from apps.communication.models import COMMENTS, Post
+
+
+class Command(BaseCommand):
+    help = 'Recount the comments of posts whose stored comment count is wrong'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Posts compared at a time')
+        parser.add_argument('--dry-run', action='store_true', help='Only print the wrong counts')
+        parser.add_argument('--show', type=int, default=10, help='Wrong counts to print')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+
+        wrong = {}
+
+        for start in range(0, len(ids), batch_size):
+            batch = COMMENTS.diff(ids[start:start + batch_size])
+
+            if batch and not options['dry_run']:
+                COMMENTS.reconcile(list(batch))
+
+            wrong.update(batch)
+
+        for pk, (stored, counted) in sorted(wrong.items())[:options['show']]:
+            self.stdout.write('  post {} stored {} counted {}'.format(pk, stored, counted))
+
+        self.stdout.write('{action} {count} of {total} posts'.format(
+            action='Would fix' if options['dry_run'] else 'Fixed', count=len(wrong), total=len(ids)))
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0002_auto_20191113_2154'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['group', 'created_at', 'id'], name='post_group_created_live'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['activity', 'created_at', 'id'], name='post_activity_created_live'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0003_auto_20261018_1115'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['post', 'created_at'], name='comment_post_created_live'),
+        ),
+    ]
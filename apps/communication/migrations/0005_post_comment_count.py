@@ -0,0 +1,32 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_counts(apps, schema_editor):
+    Post = apps.get_model('communication', 'Post')
+    Comment = apps.get_model('communication', 'Comment')
+
+    counts = Comment.objects.filter(
+        post=OuterRef('pk'),
+        is_deleted=False).order_by().values('post').annotate(count=Count('pk')).values('count')
+
+    Post.objects.update(comment_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0004_auto_20261018_1121'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_comment_counts, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,12 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
+from apps.utils.counters import Counter, CounterFieldsMixin
 from apps.utils.models import BaseModel
 
 
-class Post(BaseModel):
+class Post(CounterFieldsMixin, BaseModel):
     body = models.TextField(
         null=False,
         blank=False)
@@ -27,6 +30,25 @@ class Post(BaseModel):
         related_name='posts',
         on_delete=models.CASCADE)
 
+    # comments which are not deleted, see `COMMENTS`
+    comment_count = models.PositiveIntegerField(
+        default=0)
+
+    counter_fields = ('comment_count',)
+
+    class Meta:
+        # keyset pagination orderings, deleted posts are never listed
+        indexes = [
+            models.Index(
+                fields=('group', 'created_at', 'id'),
+                name='post_group_created_live',
+                condition=models.Q(is_deleted=False)),
+            models.Index(
+                fields=('activity', 'created_at', 'id'),
+                name='post_activity_created_live',
+                condition=models.Q(is_deleted=False)),
+        ]
+
     def __str__(self):
         return str(self.user)
 
@@ -48,5 +70,33 @@ class Comment(BaseModel):
         related_name='comments',
         on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', 'created_at'),
+                name='comment_post_created_live',
+                condition=models.Q(is_deleted=False)),
+        ]
+
     def __str__(self):
         return str(self.user)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        COMMENTS.remember(instance)
+
+        return instance
+
+
+COMMENTS = Counter(Comment, 'post', Post, 'comment_count', is_deleted=False)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created=False, update_fields=None, *args, **kwargs):
+    COMMENTS.saved(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, *args, **kwargs):
+    COMMENTS.deleted(instance)
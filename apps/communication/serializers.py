@@ -1,16 +1,18 @@
 from rest_framework import serializers
 
 from apps.users.serializers import UserSerializer
+from apps.utils.fast_serializers import ValuesSerializer
+from apps.utils.serializers_mixins import PrefetchPlanMixin
 
 from .models import Post, Comment
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     uuid = serializers.UUIDField(format='hex', read_only=True)
     user = UserSerializer(read_only=True)
     body = serializers.CharField(max_length=500)
     date = serializers.DateTimeField(format='%H:%M on %d, %B %Y', source='created_at', read_only=True)
-    comments = serializers.SerializerMethodField()
+    comments = serializers.IntegerField(source='comment_count', read_only=True)
 
     class Meta:
         model = Post
@@ -22,9 +24,9 @@ class PostSerializer(serializers.ModelSerializer):
             'created_at',
             'comments'
         )
-
-    def get_comments(self, obj):
-        return len(obj.comments.filter(is_deleted=False))
+        select_related = (
+            'user',
+        )
 
     def update(self, instance, validated_data):
         instance.body = validated_data['body']
@@ -49,7 +51,12 @@ class PostSerializer(serializers.ModelSerializer):
         return self.instance
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class FastPostSerializer(ValuesSerializer):
+    """ `PostSerializer` for read-only lists, see `apps.utils.fast_serializers` """
+    serializer_class = PostSerializer
+
+
+class CommentSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     uuid = serializers.UUIDField(format='hex', read_only=True)
     user = UserSerializer(read_only=True)
     post = serializers.UUIDField(format='hex', read_only=True, source='post.uuid')
@@ -65,6 +72,10 @@ class CommentSerializer(serializers.ModelSerializer):
             'body',
             'date'
         )
+        select_related = (
+            'user',
+            'post',
+        )
 
     def update(self, instance, validated_data):
         instance.body = validated_data['body']
@@ -94,6 +105,6 @@ class FullPostSerializer(PostSerializer):
     comments = serializers.SerializerMethodField()
 
     def get_comments(self, obj):
-        comments = obj.comments.filter(is_deleted=False)
+        comments = CommentSerializer.prepare_queryset(obj.comments.filter(is_deleted=False))
 
         return CommentSerializer(comments, many=True).data
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_auto_20191111_2107'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['created_at', 'id'], name='groups_grou_created_752b76_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='groups_memb_user_id_70e22e_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0003_auto_20261018_1115'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['group', 'user', 'status'], name='membership_group_user_live'),
+        ),
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(condition=models.Q(is_deleted=False), fields=['user', 'status'], name='membership_user_status_live'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.7 on 2026-10-18 11:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_member_counts(apps, schema_editor):
+    Group = apps.get_model('groups', 'Group')
+    Membership = apps.get_model('groups', 'Membership')
+
+    counts = Membership.objects.filter(
+        group=OuterRef('pk'),
+        status='approved',
+        is_deleted=False).order_by().values('group').annotate(count=Count('pk')).values('count')
+
+    Group.objects.update(member_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0004_auto_20261018_1121'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_member_counts, migrations.RunPython.noop),
+    ]
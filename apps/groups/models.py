@@ -1,14 +1,15 @@
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from apps.activities.constants import RequestStatus
-from apps.utils.models import BaseModel
+from apps.utils.counters import Counter, CounterFieldsMixin
+from apps.utils.models import BaseModel, touches
 
 from .constants import MembershipTypes
 
 
-class Group(BaseModel):
+class Group(CounterFieldsMixin, BaseModel):
     title = models.CharField(max_length=100)
     description = models.TextField(
         null=True,
@@ -23,6 +24,17 @@ class Group(BaseModel):
         blank=True,
         on_delete=models.SET_NULL)
 
+    # approved memberships which are not deleted, see `MEMBERS`
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+
+    counter_fields = ('member_count',)
+
+    class Meta:
+        # keyset pagination orderings
+        indexes = [
+            models.Index(fields=('created_at', 'id')),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -48,11 +60,67 @@ class Membership(BaseModel):
         choices=MembershipTypes.CHOICES,
         default=MembershipTypes.PARTICIPANT)
 
+    class Meta:
+        indexes = [
+            # keyset pagination ordering
+            models.Index(fields=('user', 'created_at', 'id')),
+            # membership checks and member lists
+            models.Index(
+                fields=('group', 'user', 'status'),
+                name='membership_group_user_live',
+                condition=models.Q(is_deleted=False)),
+            # groups of the user
+            models.Index(
+                fields=('user', 'status'),
+                name='membership_user_status_live',
+                condition=models.Q(is_deleted=False)),
+        ]
+
     def __str__(self):
         return '{group} - {user}'.format(group=str(self.group), user=str(self.user))
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        MEMBERS.remember(instance)
+
+        return instance
+
+
+MEMBERS = Counter(
+    Membership, 'group', Group, 'member_count', status=RequestStatus.APPROVED, is_deleted=False)
+
 
 @receiver(post_save, sender=Group)
 def create_admin_membership(sender, instance=None, created=False, *args, **kwargs):
     if instance is not None and instance.user is not None:
         Membership.objects.get_or_create(group=instance, user=instance.user)
+
+
+@receiver(post_save, sender=Membership)
+def count_saved_membership(sender, instance, created=False, update_fields=None, *args, **kwargs):
+    MEMBERS.saved(instance, created=created, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=Membership)
+def count_deleted_membership(sender, instance, *args, **kwargs):
+    MEMBERS.deleted(instance)
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def bump_member_roles(sender, instance=None, update_fields=None, *args, **kwargs):
+    from . import roles
+
+    if touches(update_fields, roles.MEMBERSHIP_FIELDS):
+        roles.bump_version(instance.user_id)
+
+
+@receiver(post_save, sender=Group)
+def bump_group_roles(sender, instance=None, created=False, update_fields=None, *args, **kwargs):
+    from . import roles
+
+    # new groups have no members yet, the owner's membership bumps the owner
+    if not created and touches(update_fields, roles.GROUP_FIELDS):
+        for user_id in instance.memberships.values_list('user_id', flat=True).distinct():
+            roles.bump_version(user_id)
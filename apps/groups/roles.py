@@ -0,0 +1,121 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.activities.constants import RequestStatus
+from apps.utils.shared_cache import is_shared
+
+from .constants import MembershipTypes
+
+
+# Fields which change the roles, saves touching none of them keep the cached map
+MEMBERSHIP_FIELDS = {'user', 'group', 'status', 'membership_type', 'is_deleted'}
+GROUP_FIELDS = {'is_deleted'}
+
+VERSION_KEY = 'group-roles-version:{user_id}'
+ROLES_KEY = 'group-roles:{user_id}:{version}'
+
+
+def get_roles(user_id):
+    """
+    Memberships of the user as {group id: (status, membership type)}
+
+    Read from the cache, loaded from the database on a miss.
+    Keys include a version bumped by membership and group saves, see `bump_version`.
+    Always loaded when the cache is not shared by the workers
+    """
+    if not is_shared():
+        return load_roles(user_id)
+
+    version = get_version(user_id)
+    key = ROLES_KEY.format(user_id=user_id, version=version)
+
+    roles = cache.get(key)
+
+    if roles is None:
+        roles = load_roles(user_id)
+        cache.set(key, roles, settings.GROUP_ROLES_CACHE_TIMEOUT)
+
+    return roles
+
+
+def load_roles(user_id):
+    """ Build the roles map from the database, an approved admin membership wins over the others """
+    from .models import Membership
+
+    roles = {}
+
+    memberships = Membership.objects.filter(
+        user=user_id,
+        is_deleted=False,
+        group__is_deleted=False).values_list('group_id', 'status', 'membership_type')
+
+    for group_id, status, membership_type in memberships:
+        role = (status, membership_type)
+
+        if group_id not in roles or _rank(role) > _rank(roles[group_id]):
+            roles[group_id] = role
+
+    return roles
+
+
+def _rank(role):
+    status, membership_type = role
+
+    return status == RequestStatus.APPROVED, membership_type == MembershipTypes.ADMIN
+
+
+def get_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+
+    if version is None:
+        # another worker may have set it meanwhile
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_version(user_id):
+    """
+    Drop the cached roles of the user
+
+    Bumped again once the transaction commits, as other workers may have cached the roles
+    from before the commit meanwhile
+    """
+    if not is_shared():
+        return
+
+    _bump_version(user_id)
+    transaction.on_commit(lambda: _bump_version(user_id))
+
+
+def _bump_version(user_id):
+    try:
+        cache.incr(VERSION_KEY.format(user_id=user_id))
+    except ValueError:
+        cache.set(VERSION_KEY.format(user_id=user_id), _new_version(), None)
+
+
+def _new_version():
+    """ Versions start from the time, so an evicted version does not bring back old maps """
+    return int(time.time() * 1000)
+
+
+def get_flags(role):
+    """ :return (approved member, approved admin) of a role from the map, None without a membership """
+    if role is None:
+        return False, False
+
+    return role[0] == RequestStatus.APPROVED, role == (RequestStatus.APPROVED, MembershipTypes.ADMIN)
+
+
+def is_member(user_id, group_id):
+    return get_flags(get_roles(user_id).get(group_id, None))[0]
+
+
+def is_admin(user_id, group_id):
+    return get_flags(get_roles(user_id).get(group_id, None))[1]
@@ -1,12 +1,13 @@
 from rest_framework import serializers
 
-from apps.activities.constants import RequestStatus
 from apps.users.serializers import UserSerializer
+from apps.utils.fast_serializers import ValuesSerializer
+from apps.utils.serializers_mixins import PrefetchPlanMixin
 
 from .models import Group, Membership
 
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     uuid = serializers.UUIDField(format='hex', read_only=True)
     title = serializers.CharField(max_length=100, required=False)
     description = serializers.CharField(
@@ -28,6 +29,9 @@ class GroupSerializer(serializers.ModelSerializer):
             'needs_approval',
             'user'
         )
+        select_related = (
+            'user',
+        )
 
     def create(self, validated_data):
         if 'title' not in validated_data:
@@ -50,20 +54,23 @@ class GroupSerializer(serializers.ModelSerializer):
         return self.instance
 
 
+class FastGroupSerializer(ValuesSerializer):
+    """ `GroupSerializer` for read-only lists, see `apps.utils.fast_serializers` """
+    serializer_class = GroupSerializer
+
+
 class BriefGroupSerializer(GroupSerializer):
-    number_of_users = serializers.SerializerMethodField()
+    number_of_users = serializers.IntegerField(source='member_count', read_only=True)
 
     class Meta:
         model = Group
         fields = GroupSerializer.Meta.fields + (
             'number_of_users',
         )
-    
-    def get_number_of_users(self, obj):
-        return obj.memberships.only_active().filter(status=RequestStatus.APPROVED).count()
+        select_related = GroupSerializer.Meta.select_related
 
 
-class MembershipSerializer(serializers.ModelSerializer):
+class MembershipSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     """
     A read-only membership serializers
     """
@@ -80,6 +87,9 @@ class MembershipSerializer(serializers.ModelSerializer):
             'user',
             'membership_type'
         )
+        select_related = (
+            'user',
+        )
 
     def update(self, instance, validated_data):
         instance.status = validated_data.get('status', instance.status)
@@ -93,7 +103,12 @@ class MembershipSerializer(serializers.ModelSerializer):
         return self.instance
 
 
-class UserMembershipSerializer(serializers.ModelSerializer):
+class FastMembershipSerializer(ValuesSerializer):
+    """ `MembershipSerializer` for read-only lists, see `apps.utils.fast_serializers` """
+    serializer_class = MembershipSerializer
+
+
+class UserMembershipSerializer(PrefetchPlanMixin, serializers.ModelSerializer):
     """
     A read-only user membership serializers
     """
@@ -110,3 +125,11 @@ class UserMembershipSerializer(serializers.ModelSerializer):
             'group',
             'membership_type'
         )
+        select_related = (
+            'group',
+        )
+
+
+class FastUserMembershipSerializer(ValuesSerializer):
+    """ `UserMembershipSerializer` for read-only lists, see `apps.utils.fast_serializers` """
+    serializer_class = UserMembershipSerializer
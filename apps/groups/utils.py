@@ -1,45 +1,25 @@
-from django.http import HttpResponseForbidden
+from django.core.exceptions import PermissionDenied
 
-from apps.activities.constants import RequestStatus
-
-from .constants import MembershipTypes
+from apps.activities.access import get_access
 
 
 def has_access(user, group, raise_exception=False):
-    if group.user == user:
+    """ Owner or approved member of the group """
+    if get_access(user).group(group).can_view:
         return True
-    
-    memberships = group.membershps.filter(
-        user=user,
-        is_deleted=False,
-        status=RequestStatus.APPROVED)
-
-    return memberships.exists()
 
     if raise_exception:
-        raise HttpResponseForbidden()
+        raise PermissionDenied()
     
     return False
 
 
 def can_edit(user, group, raise_exception=False):
-    if not group:
-        if raise_exception:
-            raise HttpResponseForbidden()
-        return False
-
-    if group.user == user:
+    """ Owner or admin of the group """
+    if group and get_access(user).group(group).can_edit:
         return True
-    
-    memberships = group.membershps.filter(
-        user=user,
-        is_deleted=False,
-        status=RequestStatus.APPROVED,
-        membership_type=MembershipTypes.ADMIN)
-
-    return memberships.exists()
 
     if raise_exception:
-        raise HttpResponseForbidden()
+        raise PermissionDenied()
     
     return False
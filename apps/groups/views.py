@@ -1,14 +1,16 @@
+from django.db.models import Q
 from django.shortcuts import get_object_or_404
 
 from apps.activities.constants import RequestStatus
 from apps.activities.models import Activity
-from apps.activities.serializers import ActivitySerializer
+from apps.activities.serializers import FastActivitySerializer
+from apps.pages.generations import activity_scope, group_scope, user_scope
 from apps.pages.views_mixins import PageViewMixin
 from apps.users.serializers import UserSerializer
 
 from .constants import MembershipTypes
 from .models import Group, Membership
-from .serializer import BriefGroupSerializer, MembershipSerializer, GroupSerializer
+from .serializer import BriefGroupSerializer, FastMembershipSerializer, GroupSerializer
 from .utils import has_access
 
 
@@ -16,17 +18,26 @@ class UserGroupsView(PageViewMixin):
     BUNDLE_NAME = 'user_groups'
     TITLE = 'Groups'
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        memberships = request.user.memberships.only_active().filter(status=RequestStatus.APPROVED)
+
+        group_ids = Group.objects.filter(
+            Q(user=request.user) | Q(pk__in=memberships.values('group')),
+            is_deleted=False).values_list('pk', flat=True)
+
+        return [user_scope(request.user.pk)] + [group_scope(pk) for pk in group_ids]
+
     def create_js_context(self, request, *args, **kwargs):
         owned_groups = request.user.owned_groups.only_active().order_by('-title')
 
         memberships = request.user.memberships.only_active().filter(status=RequestStatus.APPROVED)
 
-        groups = Group.objects.none()
+        groups = Group.objects.filter(
+            is_deleted=False,
+            pk__in=memberships.values('group')).order_by('title')
 
-        for membership in memberships:
-            groups |= Group.objects.filter(uuid=membership.group.uuid, is_deleted=False)
-
-        groups = groups.order_by('title')
+        owned_groups = BriefGroupSerializer.prepare_queryset(owned_groups)
+        groups = BriefGroupSerializer.prepare_queryset(groups)
 
         return {
             'owned_groups': BriefGroupSerializer(owned_groups, many=True).data,
@@ -59,15 +70,21 @@ class GroupView(PageViewMixin):
 class GroupMembersView(PageViewMixin):
     BUNDLE_NAME = 'group_members'
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        group_id = get_group_id(kwargs['uuid'])
+
+        if group_id is None:
+            return None
+
+        return [user_scope(request.user.pk), group_scope(group_id)]
+
     def create_js_context(self, request, *args, **kwargs):
         group = get_object_or_404(Group, uuid=kwargs['uuid'], is_deleted=False)
 
         has_access(request.user, group, raise_exception=True)
 
-        memberships = group.memberships.only_active()
-
         serialized_group = GroupSerializer(group)
-        serialized_memberships = MembershipSerializer(memberships, many=True)
+        serialized_memberships = FastMembershipSerializer(group.memberships.only_active())
         serialized_user = UserSerializer(request.user)
 
         self.TITLE = 'Members of {}'.format(group.title)
@@ -82,14 +99,23 @@ class GroupMembersView(PageViewMixin):
 class GroupActivitiesView(PageViewMixin):
     BUNDLE_NAME = 'group_activities'
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        group_id = get_group_id(kwargs['uuid'])
+
+        if group_id is None:
+            return None
+
+        activity_ids = Activity.objects.only_active().filter(group=group_id).values_list('pk', flat=True)
+
+        return [user_scope(request.user.pk), group_scope(group_id)] + [activity_scope(pk) for pk in activity_ids]
+
     def create_js_context(self, request, *args, **kwargs):
         group = get_object_or_404(Group, uuid=kwargs['uuid'], is_deleted=False)
 
         has_access(request.user, group, raise_exception=True)
 
-        activities = Activity.objects.only_active().filter(group=group)
-
-        serialized_activities = ActivitySerializer(activities, many=True)
+        serialized_activities = FastActivitySerializer(
+            Activity.objects.only_active().filter(group=group))
         serialized_group = GroupSerializer(group)
         serialized_user = UserSerializer(request.user)
 
@@ -136,3 +162,8 @@ class CreateGroupView(PageViewMixin):
         return {
             'user': serialized_user.data
         }
+
+
+def get_group_id(uuid):
+    """ :return id of the group, None when it does not exist, which the page answers """
+    return Group.objects.filter(uuid=uuid, is_deleted=False).values_list('pk', flat=True).first()
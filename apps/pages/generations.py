@@ -0,0 +1,74 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.utils.shared_cache import is_shared
+
+
+GENERATION_KEY = 'page-generation:{scope}'
+
+
+def user_scope(user_id):
+    """ Changes of the user, their requests, memberships and the activities and groups they own """
+    return 'user:{}'.format(user_id)
+
+
+def group_scope(group_id):
+    """ Changes of the group, its memberships and activities """
+    return 'group:{}'.format(group_id)
+
+
+def activity_scope(activity_id):
+    """ Changes of the activity, its tags and requests """
+    return 'activity:{}'.format(activity_id)
+
+
+def get_generations(scopes):
+    """
+    Current generations of the scopes, in their order
+
+    Receivers in `apps.pages.models` bump the scopes a save changes, see `bump`,
+    so keys built from them stop matching once any of the rows they cover may have changed
+    """
+    keys = [GENERATION_KEY.format(scope=scope) for scope in scopes]
+    generations = cache.get_many(keys)
+
+    for key in keys:
+        if key not in generations:
+            # another worker may have set it meanwhile
+            cache.add(key, _new_generation(), None)
+            generations[key] = cache.get(key)
+
+    return [generations[key] for key in keys]
+
+
+def bump(*scopes):
+    """
+    Start new generations of the scopes
+
+    Bumped again once the transaction commits, as other workers may have cached pages
+    from before the commit meanwhile. Pages are not cached without a shared cache
+    """
+    scopes = {scope for scope in scopes if scope is not None}
+
+    if not scopes or not is_shared():
+        return
+
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = GENERATION_KEY.format(scope=scope)
+
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def _new_generation():
+    """ Generations start from the time, so an evicted one does not bring back old pages """
+    return int(time.time() * 1000)
@@ -1,3 +1,76 @@
-from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 
-# Create your models here.
+from apps.activities.models import Activity, GroupActivity, IndividualActivity, Request
+from apps.groups.models import Group, Membership
+from apps.users.models import User
+from apps.utils.shared_cache import is_shared
+
+from .generations import activity_scope, bump, group_scope, user_scope
+
+
+@receiver(post_save, sender=IndividualActivity)
+@receiver(post_save, sender=GroupActivity)
+@receiver(post_delete, sender=IndividualActivity)
+@receiver(post_delete, sender=GroupActivity)
+def bump_activity_pages(sender, instance, *args, **kwargs):
+    group_id = getattr(instance, 'group_id', None)
+
+    bump(
+        activity_scope(instance.pk),
+        user_scope(instance.user_id),
+        group_scope(group_id) if group_id is not None else None)
+
+
+@receiver(m2m_changed, sender=Activity.tags.through)
+def bump_activity_tag_pages(sender, instance, action, reverse=False, pk_set=None, *args, **kwargs):
+    # nothing is bumped without a shared cache, the cleared tags are not loaded then
+    if is_shared():
+        activity_ids = get_changed_ids(instance, action, reverse, pk_set, 'activities')
+        bump(*[activity_scope(pk) for pk in activity_ids])
+
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def bump_request_pages(sender, instance, *args, **kwargs):
+    bump(activity_scope(instance.activity_id), user_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Membership)
+@receiver(post_delete, sender=Membership)
+def bump_membership_pages(sender, instance, *args, **kwargs):
+    bump(group_scope(instance.group_id), user_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_pages(sender, instance, *args, **kwargs):
+    bump(group_scope(instance.pk), user_scope(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def bump_user_pages(sender, instance, *args, **kwargs):
+    bump(user_scope(instance.pk))
+
+
+@receiver(m2m_changed, sender=User.tags.through)
+def bump_user_tag_pages(sender, instance, action, reverse=False, pk_set=None, *args, **kwargs):
+    if is_shared():
+        user_ids = get_changed_ids(instance, action, reverse, pk_set, 'followers')
+        bump(*[user_scope(pk) for pk in user_ids])
+
+
+def get_changed_ids(instance, action, reverse, pk_set, related_name):
+    """ Ids of the objects whose tags changed, empty until the change is made """
+    if not reverse:
+        return [instance.pk] if action.startswith('post_') else []
+
+    if action == 'pre_clear':
+        # the links are gone once the tag is cleared
+        instance._cleared_ids = list(getattr(instance, related_name).values_list('pk', flat=True))
+    elif action == 'post_clear':
+        return instance.__dict__.pop('_cleared_ids', [])
+    elif action.startswith('post_'):
+        return pk_set or []
+
+    return []
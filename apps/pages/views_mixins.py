@@ -1,9 +1,19 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
 from django.views import View
 from django.core.serializers.json import DjangoJSONEncoder
 
+import hashlib
 import json
 
+from apps.utils.shared_cache import is_shared
+
+from .generations import get_generations
+
+
+CONTEXT_KEY = 'page-context:{digest}'
+
 
 class PageViewMixin(View):
     """
@@ -13,6 +23,9 @@ class PageViewMixin(View):
     
     Create `modify_context(request, context, *args, **kwargs)` to edit pre-send context
 
+    Override `get_cache_scopes` to cache the JS context per user and URL arguments.
+    It is kept until a save changes any of the scopes, see `apps.pages.generations`
+
     `get` is handled by default
     """
     TITLE = None
@@ -22,17 +35,64 @@ class PageViewMixin(View):
     def create_js_context(self, request, *args, **kwargs):
         return None
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        """ Scopes of the rows the JS context is read from, None to build it on every request """
+        return None
+
+    def get_js_context(self, request, *args, **kwargs):
+        """ JSON of `create_js_context`, None without a context """
+        js_context = self.create_js_context(request, *args, **kwargs)
+
+        if js_context is None:
+            return None
+
+        return json.dumps(js_context, cls=DjangoJSONEncoder)
+
+    def get_cached_js_context(self, request, scopes, *args, **kwargs):
+        """ `get_js_context` through the cache, with the title it sets """
+        key = self.get_cache_key(request, scopes, *args, **kwargs)
+        cached = cache.get(key)
+
+        if cached is None:
+            cached = (self.get_js_context(request, *args, **kwargs), self.TITLE)
+            cache.set(key, cached, settings.PAGE_CONTEXT_CACHE_TIMEOUT)
+
+        js_context, self.TITLE = cached
+
+        return js_context
+
+    def get_cache_key(self, request, scopes, *args, **kwargs):
+        view = type(self)
+        scopes = sorted(set(scopes))
+
+        parts = (
+            view.__module__,
+            view.__qualname__,
+            request.user.pk,
+            args,
+            sorted(kwargs.items()),
+            request.GET.urlencode(),
+            scopes,
+            get_generations(scopes))
+
+        return CONTEXT_KEY.format(digest=hashlib.sha1(repr(parts).encode()).hexdigest())
+
     def get_context(self, request, *args, **kwargs):
         """ Setup the full context for rendering """
         context = {
             'bundle_name': self.BUNDLE_NAME
         }
 
-        if hasattr(self, 'create_js_context'):
-            js_context = self.create_js_context(request, *args, **kwargs)
-            
-            if js_context is not None:
-                context['context'] = json.dumps(js_context, cls=DjangoJSONEncoder)
+        # other workers would not see the bumped generations
+        scopes = self.get_cache_scopes(request, *args, **kwargs) if is_shared() else None
+
+        if scopes is not None:
+            js_context = self.get_cached_js_context(request, scopes, *args, **kwargs)
+        else:
+            js_context = self.get_js_context(request, *args, **kwargs)
+
+        if js_context is not None:
+            context['context'] = js_context
         
         if hasattr(self, 'TITLE') and self.TITLE:
             context['title'] = self.TITLE
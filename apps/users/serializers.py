@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from apps.utils.serializers import TagSerializer
+from apps.utils.serializers_mixins import PrefetchPlanMixin
 
 from .models import User
 
@@ -40,12 +41,13 @@ class UserSerializer(serializers.ModelSerializer):
         return self.instance
 
 
-class DetailedUserSerializer(UserSerializer):
+class DetailedUserSerializer(PrefetchPlanMixin, UserSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
     class Meta:
         model = User
         fields = UserSerializer.Meta.fields + ('tags',)
+        prefetch_related = ('tags',)
 
 
 class MobileUserSerializer(serializers.ModelSerializer):
@@ -6,6 +6,7 @@ from django.views import View
 
 from apps.activities.models import Activity
 from apps.activities.serializers import ActivitySerializer
+from apps.pages.generations import activity_scope, user_scope
 from apps.pages.views_mixins import PageViewMixin
 
 from apps.utils.serializers import TagSerializer
@@ -23,14 +24,29 @@ class SelfProfileView(View):
 class ProfileView(PageViewMixin):
     BUNDLE_NAME = 'profile'
 
-    def create_js_context(self, request, *args, **kwargs):
-        user = get_object_or_404(User, uuid=kwargs['uuid'], is_deleted=False)
-        self.TITLE = '{} Profile'.format(user.username if user.username else user.email)
-        activities = Activity.objects.only_active().filter(
+    def get_activities(self, user):
+        """ Public upcoming activities of the user """
+        return Activity.objects.only_active().filter(
             user=user,
             public=True,
             time__gte=datetime.today())
 
+    def get_cache_scopes(self, request, *args, **kwargs):
+        user_id = User.objects.filter(
+            uuid=kwargs['uuid'], is_deleted=False).values_list('pk', flat=True).first()
+
+        if user_id is None:
+            return None
+
+        activity_ids = self.get_activities(user_id).values_list('pk', flat=True)
+
+        return [user_scope(user_id)] + [activity_scope(pk) for pk in activity_ids]
+
+    def create_js_context(self, request, *args, **kwargs):
+        user = get_object_or_404(User, uuid=kwargs['uuid'], is_deleted=False)
+        self.TITLE = '{} Profile'.format(user.username if user.username else user.email)
+        activities = ActivitySerializer.prepare_queryset(self.get_activities(user))
+
         serializer = DetailedUserSerializer(user)
 
         activity_serializer = ActivitySerializer(
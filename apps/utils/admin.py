@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 
-from .models import Tag, Address
+from .models import Tag, Address, AddressEnrichmentJob, GeocodingCacheEntry, LocationPing
 
 
 class AddressAdmin(admin.ModelAdmin):
@@ -19,6 +19,40 @@ class AddressAdmin(admin.ModelAdmin):
     ]
 
 
+class LocationPingAdmin(admin.ModelAdmin):
+    list_display = [
+        '__str__',
+        'created_at'
+    ]
+
+    raw_id_fields = [
+        'user'
+    ]
+
+
+class AddressEnrichmentJobAdmin(admin.ModelAdmin):
+    list_display = [
+        '__str__',
+        'attempts',
+        'next_attempt_at'
+    ]
+
+    raw_id_fields = [
+        'address'
+    ]
+
+
+class GeocodingCacheEntryAdmin(admin.ModelAdmin):
+    list_display = [
+        '__str__',
+        'expires_at'
+    ]
+
+    search_fields = [
+        'key'
+    ]
+
+
 class TagAdmin(admin.ModelAdmin):
     readonly_fields = [
         'uuid'
@@ -32,4 +66,7 @@ class TagAdmin(admin.ModelAdmin):
 
 admin.site.register(Address, AddressAdmin)
 admin.site.register(Tag, TagAdmin)
+admin.site.register(LocationPing, LocationPingAdmin)
+admin.site.register(GeocodingCacheEntry, GeocodingCacheEntryAdmin)
+admin.site.register(AddressEnrichmentJob, AddressEnrichmentJobAdmin)
 admin.site.unregister(Group)
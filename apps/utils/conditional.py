@@ -0,0 +1,40 @@
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.http import parse_etags, quote_etag
+
+
+def get_etag(*versions):
+    """ Strong ETag of the versions, which have to have a stable `repr` """
+    return quote_etag(hashlib.sha1(repr(versions).encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    """ Whether `If-None-Match` has the ETag, compared weakly as for GETs """
+    header = request.META.get('HTTP_IF_NONE_MATCH', None)
+
+    if not header:
+        return False
+
+    etags = parse_etags(header)
+
+    return '*' in etags or any(value.replace('W/', '', 1) == etag for value in etags)
+
+
+def latest(queryset, relation, field='updated_at'):
+    """ Subquery of the latest `field` of the rows pointing at the outer object through `relation` """
+    return _aggregate(queryset, relation, Max(field))
+
+
+def count(queryset, relation):
+    """ Subquery of the number of rows pointing at the outer object, catches hard deletes """
+    return _aggregate(queryset, relation, Count('pk'))
+
+
+def _aggregate(queryset, relation, aggregate):
+    rows = queryset.filter(
+        **{relation: OuterRef('pk')}
+    ).order_by().values(relation).annotate(value=aggregate).values('value')
+
+    # Django 2.2 does not always infer it
+    return Subquery(rows, output_field=rows.query.annotations['value'].output_field)
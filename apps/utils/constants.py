@@ -1,6 +1,41 @@
 # Mathematical Constants for calculations
 EARTH_RADIUS = 6371
 EARTH_RADIUS_METERS = EARTH_RADIUS * 1000
+KILOMETERS_PER_DEGREE = 111
+
+# Geohash spatial indexing
+GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+# Address fields filled in from the geocoded address
+ADDRESS_DETAIL_FIELDS = (
+    'address',
+    'street',
+    'streen_number',
+    'city',
+    'country',
+    'country_short',
+    'postal_code',
+    'google_place_id',
+    'global_code',
+    'address_type',
+)
+
+
+class EnrichmentStatus:
+    """ Geocoding state of addresses saved before it """
+    PENDING = 'pending'
+    DONE = 'done'
+    NOT_FOUND = 'not_found'
+    FAILED = 'failed'
+
+    CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (NOT_FOUND, 'Not found'),
+        (FAILED, 'Failed'),
+    )
+
 
 class Currencies:
     DKK = 'dkk'
@@ -0,0 +1,129 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class Counter(object):
+    """
+    Number of rows of `model` kept on the object they point to, e.g. approved requests of an activity
+
+    Rows are counted when their fields equal `conditions`. `saved` and `deleted` are called by receivers
+    and compare the row with the state it was loaded with, see `remember`, so only changes which
+    start or stop counting it update the counter, with an `F()` expression in the same transaction.
+    Updates through querysets skip the counter, `diff` and `reconcile` find and fix the drift
+    """
+
+    def __init__(self, model, relation, target, field, **conditions):
+        self.model = model
+        self.relation = model._meta.get_field(relation)
+        self.target = target
+        self.field = field
+        self.conditions = conditions
+
+        # fields which have to be loaded to know the state
+        self.attnames = [self.relation.attname] + list(conditions)
+        self.fields = {relation} | set(conditions)
+        self.state_key = '_counted_{}'.format(field)
+
+    def get_state(self, instance):
+        """ :return id of the counting object, None when the row is not counted """
+        if all(getattr(instance, name) == value for name, value in self.conditions.items()):
+            return getattr(instance, self.relation.attname)
+
+        return None
+
+    def remember(self, instance):
+        """ Keep the state of a loaded row, deferred fields leave it unknown """
+        if all(name in instance.__dict__ for name in self.attnames):
+            instance.__dict__[self.state_key] = self.get_state(instance)
+
+    def saved(self, instance, created=False, update_fields=None):
+        if update_fields is not None and not self.fields.intersection(update_fields):
+            return
+
+        after = self.get_state(instance)
+
+        if created:
+            self.change(after, 1)
+        elif self.state_key in instance.__dict__:
+            before = instance.__dict__[self.state_key]
+
+            if before != after:
+                self.change(before, -1)
+                self.change(after, 1)
+        else:
+            # loaded without the fields, nothing to compare with
+            self.reconcile([getattr(instance, self.relation.attname)])
+
+        instance.__dict__[self.state_key] = after
+
+    def deleted(self, instance):
+        if self.state_key in instance.__dict__:
+            self.change(instance.__dict__[self.state_key], -1)
+        else:
+            self.reconcile([getattr(instance, self.relation.attname)])
+
+    def change(self, target_id, delta):
+        if target_id is None:
+            return
+
+        targets = self.target.objects.filter(pk=target_id)
+
+        if delta < 0:
+            # drifted counters stay positive
+            targets = targets.filter(**{self.field + '__gte': -delta})
+
+        targets.update(**{self.field: F(self.field) + delta})
+
+    def get_counts(self, target_ids):
+        """ Counted rows as {target id: count}, targets without rows included """
+        counts = dict.fromkeys(target_ids, 0)
+
+        rows = self.model.objects.filter(
+            **{self.relation.name + '__in': target_ids},
+            **self.conditions
+        ).order_by().values(self.relation.name).annotate(count=Count('pk'))
+
+        counts.update((row[self.relation.name], row['count']) for row in rows)
+
+        return counts
+
+    def diff(self, target_ids):
+        """ Targets whose stored count is wrong as {target id: (stored, counted)} """
+        counts = self.get_counts(target_ids)
+        stored = self.target.objects.filter(pk__in=target_ids).values_list('pk', self.field)
+
+        return {pk: (count, counts[pk]) for pk, count in stored if count != counts[pk]}
+
+    def reconcile(self, target_ids):
+        """ Recount the targets in a single update """
+        counts = self.model.objects.filter(
+            **{self.relation.name: OuterRef('pk')},
+            **self.conditions
+        ).order_by().values(self.relation.name).annotate(count=Count('pk')).values('count')
+
+        return self.target.objects.filter(pk__in=target_ids).update(
+            **{self.field: Coalesce(Subquery(counts), 0)})
+
+
+class CounterFieldsMixin(object):
+    """
+    Saves of loaded objects leave out `counter_fields`,
+    so a stale value does not overwrite the `F()` updates of other requests
+
+    Such saves are updates of the loaded fields, like saves of objects with deferred fields.
+    New objects, objects without a primary key and explicit `update_fields` are saved as usual.
+    A row deleted in the meantime is not inserted again, the save raises `DatabaseError`
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if kwargs.get('update_fields') is None and not args and not kwargs.get('force_insert') \
+                and not self._state.adding and self.pk is not None:
+            deferred = self.get_deferred_fields()
+
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counter_fields and field.attname not in deferred
+            ]
+
+        return super().save(*args, **kwargs)
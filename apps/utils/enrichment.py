@@ -0,0 +1,143 @@
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import geocoding
+from .constants import ADDRESS_DETAIL_FIELDS, EnrichmentStatus
+from .location_utils import build_address, build_city_address
+from .models import Address, AddressEnrichmentJob
+
+
+def create_pending_address(address=None, lat=None, lng=None):
+    """
+    Save the address as the client sent it and leave geocoding to `enrich_addresses`
+    Coordinates get their city and country right away if it is known offline
+    """
+    if address is not None:
+        instance = Address(address=address)
+    else:
+        instance = build_city_address(lat, lng)
+
+    instance.enrichment_status = EnrichmentStatus.PENDING
+    instance = Address.objects.get_canonical(instance)
+
+    # the same place may have been saved and geocoded before
+    if instance.enrichment_status == EnrichmentStatus.PENDING:
+        AddressEnrichmentJob.objects.get_or_create(address=instance)
+
+    return instance
+
+
+def process_due_jobs(batch_size):
+    """
+    Geocode a batch of addresses which are due, concurrently
+    No transaction is open while waiting for the geocoder, see `claim_jobs`
+    :return number of processed jobs
+    """
+    jobs = claim_jobs(batch_size)
+
+    results = geocoding.geocoding_executor.map(_lookup, [job.address for job in jobs])
+
+    for job, (response, error) in zip(jobs, results):
+        with transaction.atomic():
+            if error is not None:
+                retry(job, error)
+            else:
+                enrich(job, response)
+
+    return len(jobs)
+
+
+def claim_jobs(batch_size):
+    """
+    Take a batch of due jobs by moving them `ADDRESS_ENRICHMENT_LEASE` seconds ahead
+    Jobs locked by another worker are skipped, jobs of a worker which stopped are due again after the lease
+    """
+    with transaction.atomic():
+        jobs = list(AddressEnrichmentJob.objects
+            .select_for_update(skip_locked=True)
+            .select_related('address')
+            .filter(
+                next_attempt_at__lte=timezone.now(),
+                attempts__lt=settings.ADDRESS_ENRICHMENT_MAX_ATTEMPTS)
+            .order_by('next_attempt_at')[:batch_size])
+
+        AddressEnrichmentJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            next_attempt_at=timezone.now() + datetime.timedelta(seconds=settings.ADDRESS_ENRICHMENT_LEASE))
+
+    return jobs
+
+
+def _lookup(address):
+    """ :return (response, error) """
+    try:
+        if address.latitude is None or address.longitude is None:
+            return geocoding.geocode(address.address or '', raise_errors=True), None
+
+        return geocoding.reverse_geocode(address.latitude, address.longitude, raise_errors=True), None
+    except Exception as e:
+        return None, e
+    finally:
+        # pool threads have their own connections, do not leave them open
+        connection.close()
+
+
+def enrich(job, response):
+    address = job.address
+
+    if not response:
+        address.enrichment_status = EnrichmentStatus.NOT_FOUND
+        address.save(update_fields=['enrichment_status'])
+        job.delete()
+        return
+
+    geocoded = build_address(response[0])
+
+    for field in ADDRESS_DETAIL_FIELDS:
+        value = getattr(geocoded, field)
+
+        if value is not None:
+            setattr(address, field, value)
+
+    # coordinates from the client are more precise than the geocoded ones
+    if address.latitude is None or address.longitude is None:
+        address.latitude = geocoded.latitude
+        address.longitude = geocoded.longitude
+
+    address.enrichment_status = EnrichmentStatus.DONE
+
+    canonical = None
+
+    if address.google_place_id:
+        canonical = Address.objects.filter(
+            google_place_id=address.google_place_id
+        ).exclude(pk=address.pk).order_by('pk').first()
+
+    if canonical is not None:
+        # the place was already stored, the job goes together with the duplicate
+        Address.objects.merge(canonical, [address.pk])
+        return
+
+    address.save()
+    job.delete()
+
+
+def retry(job, error):
+    job.attempts += 1
+    job.last_error = str(error)
+
+    if job.attempts >= settings.ADDRESS_ENRICHMENT_MAX_ATTEMPTS:
+        # the job stays with the last error, reset its attempts to try again
+        job.address.enrichment_status = EnrichmentStatus.FAILED
+        job.address.save(update_fields=['enrichment_status'])
+        job.save(update_fields=['attempts', 'last_error'])
+        return
+
+    delay = min(
+        settings.ADDRESS_ENRICHMENT_BACKOFF * 2 ** (job.attempts - 1),
+        settings.ADDRESS_ENRICHMENT_MAX_BACKOFF)
+
+    job.next_attempt_at = timezone.now() + datetime.timedelta(seconds=delay)
+    job.save(update_fields=['attempts', 'last_error', 'next_attempt_at'])
@@ -0,0 +1,171 @@
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework import serializers
+
+
+# Kinds of the entries of a plan
+VALUE = 'value'
+NESTED = 'nested'
+MANY = 'many'
+METHOD = 'method'
+
+
+class ValuesSerializer(object):
+    """
+    Read-only output of a DRF serializer built straight from `.values()` rows
+
+    Fields of `serializer_class` are read once per class. Nested serializers become lookups
+    through their relation, many-to-many ones are loaded with one query grouped by the object
+    and the other fields keep their own `to_representation`, so the output is the same.
+    No model or serializer is instantiated per object.
+
+    Fields whose source is not a lookup, e.g. properties, need an entry in `sources`.
+    Method fields need `get_<field name>(rows)` returning {pk: value}.
+
+    Use `serializer.data` for a queryset, or `get_rows` and `serialize` to paginate the rows
+    """
+    serializer_class = None
+    sources = {}
+
+    def __init__(self, queryset=None):
+        self.queryset = queryset
+
+    @property
+    def data(self):
+        return self.serialize(list(self.get_rows(self.queryset)))
+
+    @classmethod
+    def get_plan(cls):
+        if '_plan' not in cls.__dict__:
+            cls._plan = cls._build_plan(cls.serializer_class(), '', cls.sources)
+
+        return cls._plan
+
+    @classmethod
+    def _build_plan(cls, serializer, prefix, sources):
+        """ :return [(kind, field name, lookup, handler)] """
+        plan = []
+        model = serializer.Meta.model
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+
+            # DRF leaves out read-only fields whose attribute is missing
+            if name not in sources and not has_attribute(model, field.source_attrs):
+                continue
+
+            lookup = prefix + sources.get(name, field.source.replace('.', '__'))
+
+            if isinstance(field, serializers.SerializerMethodField):
+                plan.append((METHOD, name, None, None))
+            elif isinstance(field, serializers.ListSerializer):
+                relation = model._meta.get_field(field.source)
+                through = relation.remote_field.through
+
+                plan.append((MANY, name, lookup, (
+                    through,
+                    relation.m2m_field_name(),
+                    relation.m2m_reverse_field_name(),
+                    cls._build_plan(field.child, relation.m2m_reverse_field_name() + '__', {}))))
+            elif isinstance(field, serializers.BaseSerializer):
+                plan.append((NESTED, name, lookup + '__pk', cls._build_plan(field, lookup + '__', {})))
+            else:
+                plan.append((VALUE, name, lookup, field.to_representation))
+
+        return plan
+
+    @classmethod
+    def get_lookups(cls, plan=None):
+        """ Lookups of the `.values()` rows """
+        lookups = []
+
+        for kind, name, lookup, handler in plan or cls.get_plan():
+            if kind == VALUE:
+                lookups.append(lookup)
+            elif kind == NESTED:
+                lookups.append(lookup)
+                lookups.extend(cls.get_lookups(handler))
+
+        return lookups
+
+    def get_rows(self, queryset, extra=()):
+        """ Values queryset of the objects, with the `extra` lookups added, e.g. an ordering """
+        lookups = ['pk'] + self.get_lookups()
+        lookups += [lookup for lookup in extra if lookup not in lookups]
+
+        # relations are read through the lookups
+        return queryset.prefetch_related(None).values(*lookups)
+
+    def serialize(self, rows):
+        """ :return list of the represented rows """
+        plan = self.get_plan()
+        related = self.get_related(plan, rows)
+
+        return [self.represent(plan, row, related) for row in rows]
+
+    def get_related(self, plan, rows):
+        """ Many-to-many and method fields of the rows as {field name: {pk: value}} """
+        related = {}
+        pks = [row['pk'] for row in rows]
+
+        if not pks:
+            return related
+
+        for kind, name, lookup, handler in plan:
+            if kind == MANY:
+                related[name] = self.get_many(handler, pks)
+            elif kind == METHOD:
+                related[name] = getattr(self, 'get_' + name)(rows)
+
+        return related
+
+    def get_many(self, relation, pks):
+        """ Represented related objects grouped by the pk, in the order of their own pks """
+        through, source, target, plan = relation
+        grouped = defaultdict(list)
+
+        rows = through.objects.filter(
+            **{source + '__in': pks}
+        ).order_by(target).values(source, *self.get_lookups(plan))
+
+        for row in rows:
+            grouped[row[source]].append(self.represent(plan, row, {}))
+
+        return grouped
+
+    def represent(self, plan, row, related):
+        item = {}
+
+        for kind, name, lookup, handler in plan:
+            if kind == VALUE:
+                value = row[lookup]
+                item[name] = None if value is None else handler(value)
+            elif kind == NESTED:
+                item[name] = None if row[lookup] is None else self.represent(handler, row, related)
+            elif kind == MANY:
+                item[name] = related.get(name, {}).get(row['pk'], [])
+            else:
+                item[name] = related[name].get(row['pk'], None)
+
+        return item
+
+
+def has_attribute(model, attrs):
+    """ Whether the model has the attribute at the path, through its relations """
+    if not attrs:
+        # source='*'
+        return True
+
+    for attr in attrs[:-1]:
+        try:
+            model = model._meta.get_field(attr).related_model
+        except FieldDoesNotExist:
+            return False
+
+        if model is None:
+            return False
+
+    return hasattr(model, attrs[-1])
@@ -0,0 +1,275 @@
+import datetime
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import GeocodingCacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+
+class StubGeocodingClient:
+    """
+    Offline stand-in for `googlemaps.Client`
+
+    Answers every query with a made up but stable result, so the geocoding
+    can be tested and benchmarked without network access.
+    Set `GEOCODING_CLIENT = 'apps.utils.geocoding.StubGeocodingClient'` to use it.
+    """
+    def __init__(self, latency=0, city='Copenhagen', country='Denmark', country_short='DK'):
+        self.latency = latency
+        self.city = city
+        self.country = country
+        self.country_short = country_short
+        self.calls = 0
+
+    def geocode(self, address):
+        self._wait()
+
+        if not address or not address.strip():
+            return []
+
+        digest = hashlib.sha1(address.encode('utf-8')).hexdigest()
+
+        # spread the made up places around a kilometer or two
+        latitude = 55.6761 + (int(digest[:4], 16) / 0xffff - 0.5) / 50
+        longitude = 12.5683 + (int(digest[4:8], 16) / 0xffff - 0.5) / 50
+
+        return [self._result(address, 'stub-' + digest[:20], latitude, longitude)]
+
+    def reverse_geocode(self, latlng):
+        self._wait()
+
+        latitude, longitude = float(latlng[0]), float(latlng[1])
+        digest = hashlib.sha1('{:.5f},{:.5f}'.format(latitude, longitude).encode('utf-8')).hexdigest()
+
+        return [self._result(
+            '{:.5f}, {:.5f}'.format(latitude, longitude), 'stub-' + digest[:20], latitude, longitude)]
+
+    def _wait(self):
+        self.calls += 1
+
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _result(self, formatted_address, place_id, latitude, longitude):
+        return {
+            'formatted_address': '{0}, {1}, {2}'.format(formatted_address, self.city, self.country),
+            'address_components': [
+                {'long_name': self.city, 'short_name': self.city, 'types': ['locality', 'political']},
+                {'long_name': self.country, 'short_name': self.country_short, 'types': ['country', 'political']},
+            ],
+            'geometry': {
+                'location': {'lat': latitude, 'lng': longitude}
+            },
+            'place_id': place_id,
+            'types': ['establishment'],
+        }
+
+
+class LRUCache:
+    """
+    Thread safe in-memory cache with limited size and expiring values
+    """
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.values = OrderedDict()
+
+    def get(self, key):
+        """ Return (found, value) """
+        with self.lock:
+            if key not in self.values:
+                return False, None
+
+            value, expires_at = self.values[key]
+
+            if expires_at <= time.monotonic():
+                del self.values[key]
+                return False, None
+
+            self.values.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, timeout):
+        with self.lock:
+            self.values[key] = (value, time.monotonic() + timeout)
+            self.values.move_to_end(key)
+
+            while len(self.values) > self.size:
+                self.values.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class GeocodingCache:
+    """
+    Two tier cache of geocoding responses
+
+    Responses are looked up in memory first and then in the database.
+    Empty responses are kept for `negative_ttl` seconds, others for `ttl`.
+    Failed requests are never cached.
+    """
+    def __init__(self, size, ttl, negative_ttl):
+        self.memory = LRUCache(size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+    def get_or_fetch(self, key, fetch):
+        found, value = self.memory.get(key)
+
+        if found:
+            return value
+
+        now = timezone.now()
+        entry = GeocodingCacheEntry.objects.filter(key=key, expires_at__gt=now).first()
+
+        if entry is not None:
+            value = json.loads(entry.response)
+            remaining = (entry.expires_at - now).total_seconds()
+            self.memory.set(key, value, remaining)
+            return value
+
+        value = fetch()
+        ttl = self.ttl if value else self.negative_ttl
+
+        self.memory.set(key, value, ttl)
+
+        try:
+            GeocodingCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    'response': json.dumps(value),
+                    'expires_at': now + datetime.timedelta(seconds=ttl)
+                })
+        except Exception:
+            # the response is good even if it could not be stored
+            logger.exception('Could not cache geocoding response %s', key)
+
+        return value
+
+
+def get_client():
+    """
+    Return the geocoding client
+    `GEOCODING_CLIENT` setting overrides the Google Maps client
+    """
+    global _client
+
+    if settings.GEOCODING_CLIENT is None:
+        return settings.GOOGLE_MAPS_API
+
+    if _client is None:
+        _client = import_string(settings.GEOCODING_CLIENT)(**settings.GEOCODING_CLIENT_OPTIONS)
+
+    return _client
+
+
+def normalize_query(query):
+    """ Queries differing only in case and spacing share the cache """
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+
+def make_key(prefix, value):
+    # responses of other clients must not be served as Google ones
+    if settings.GEOCODING_CLIENT is not None:
+        prefix = '{0}:{1}'.format(settings.GEOCODING_CLIENT, prefix)
+
+    key = '{0}:{1}'.format(prefix, value)
+
+    # keep long queries inside the key column
+    if len(key) > 200:
+        key = '{0}:sha1:{1}'.format(prefix, hashlib.sha1(value.encode('utf-8')).hexdigest())
+
+    return key
+
+
+def geocode(query, raise_errors=False):
+    """
+    Geocode address query through the cache
+    Returns None if the geocoding request failed, unless `raise_errors` is set
+    """
+    key = make_key('geocode', normalize_query(query))
+
+    try:
+        return geocoding_cache.get_or_fetch(key, lambda: get_client().geocode(query))
+    except Exception:
+        if raise_errors:
+            raise
+        logger.exception('Could not geocode %r', query)
+        return None
+
+
+def reverse_geocode(lat, lng, raise_errors=False):
+    """
+    Reverse geocode coordinates through the cache
+    Coordinates are rounded to `GEOCODING_REVERSE_PRECISION` decimal places
+    Returns None if the geocoding request failed, unless `raise_errors` is set
+    """
+    precision = settings.GEOCODING_REVERSE_PRECISION
+    lat = round(float(lat), precision)
+    lng = round(float(lng), precision)
+
+    key = make_key('reverse', '{0:.{2}f},{1:.{2}f}'.format(lat, lng, precision))
+
+    try:
+        return geocoding_cache.get_or_fetch(key, lambda: get_client().reverse_geocode((lat, lng)))
+    except Exception:
+        if raise_errors:
+            raise
+        logger.exception('Could not reverse geocode %s,%s', lat, lng)
+        return None
+
+
+def geocode_many(queries, timeout):
+    """
+    Geocode the queries concurrently
+    Lookups still running after `timeout` seconds are left to finish in the background,
+    their responses get cached for the next call
+    :return list of responses in the order of queries, None where the lookup failed or timed out
+    """
+    pending = {geocoding_executor.submit(_geocode_in_thread, query): index for index, query in enumerate(queries)}
+    responses = [None] * len(queries)
+
+    try:
+        for future in futures.as_completed(pending, timeout=timeout):
+            responses[pending[future]] = future.result()
+    except futures.TimeoutError:
+        logger.warning(
+            'Geocoding of %d queries did not finish in %ss',
+            sum(1 for future in pending if not future.done()), timeout)
+
+    return responses
+
+
+def _geocode_in_thread(query):
+    try:
+        return geocode(query)
+    finally:
+        # pool threads have their own connections, do not leave them open
+        connection.close()
+
+
+_client = None
+
+geocoding_cache = GeocodingCache(
+    size=settings.GEOCODING_CACHE_SIZE,
+    ttl=settings.GEOCODING_CACHE_TTL,
+    negative_ttl=settings.GEOCODING_NEGATIVE_CACHE_TTL)
+
+geocoding_executor = futures.ThreadPoolExecutor(
+    max_workers=settings.GEOCODING_WORKERS,
+    thread_name_prefix='geocoding')
@@ -0,0 +1,221 @@
+import math
+
+import numpy as np
+
+from .constants import (
+    GEOHASH_BASE32,
+    GEOHASH_PRECISION,
+    KILOMETERS_PER_DEGREE)
+
+
+def _bits(precision):
+    """ Number of latitude and longitude bits in geohash of the precision """
+    bits = precision * 5
+    lat_bits = bits // 2
+
+    return lat_bits, bits - lat_bits
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode coordinates into a geohash of the given precision
+    """
+    lat_bits, lon_bits = _bits(precision)
+
+    # position of the coordinates in the grid of the smallest cells
+    lat_cell = min(int((float(latitude) + 90.0) / 180.0 * (1 << lat_bits)), (1 << lat_bits) - 1)
+    lon_cell = min(int((float(longitude) + 180.0) / 360.0 * (1 << lon_bits)), (1 << lon_bits) - 1)
+
+    # interleave the bits starting from longitude
+    value = 0
+
+    for bit in range(precision * 5):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            value = (value << 1) | ((lon_cell >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            value = (value << 1) | ((lat_cell >> lat_bits) & 1)
+
+    return ''.join(
+        GEOHASH_BASE32[(value >> shift) & 31]
+        for shift in range(precision * 5 - 5, -1, -5))
+
+
+def encode_integers(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """
+    Encode sequences of coordinates into geohashes in one NumPy pass
+    Geohashes are returned as integers, see `to_integer`
+    """
+    lat_bits, lon_bits = _bits(precision)
+
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+
+    lat_cells = np.minimum(
+        ((latitudes + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64), (1 << lat_bits) - 1)
+    lon_cells = np.minimum(
+        ((longitudes + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64), (1 << lon_bits) - 1)
+
+    values = np.zeros(len(latitudes), dtype=np.int64)
+
+    for bit in range(precision * 5):
+        if bit % 2 == 0:
+            lon_bits -= 1
+            values = (values << 1) | ((lon_cells >> lon_bits) & 1)
+        else:
+            lat_bits -= 1
+            values = (values << 1) | ((lat_cells >> lat_bits) & 1)
+
+    return values
+
+
+def encode_many(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    """
+    Encode sequences of coordinates into geohashes in one NumPy pass
+    Results are the same as calling `encode` for every pair
+    """
+    values = encode_integers(latitudes, longitudes, precision)
+
+    alphabet = np.array(list(GEOHASH_BASE32))
+    hashes = alphabet[(values >> (precision * 5 - 5)) & 31]
+
+    for shift in range(precision * 5 - 10, -1, -5):
+        hashes = np.char.add(hashes, alphabet[(values >> shift) & 31])
+
+    return hashes
+
+
+def to_integer(geohash):
+    """
+    Convert geohash to the integer made of its bits
+    Geohashes of the same precision sort the same way as integers and strings
+    """
+    value = 0
+
+    for char in geohash:
+        value = (value << 5) | GEOHASH_BASE32.index(char)
+
+    return value
+
+
+def integer_range(prefix, precision=GEOHASH_PRECISION):
+    """
+    Range of integer geohashes of the precision starting with the prefix
+    :return (first, last + 1)
+    """
+    shift = (precision - len(prefix)) * 5
+    value = to_integer(prefix)
+
+    return value << shift, (value + 1) << shift
+
+
+def decode(geohash):
+    """
+    Decode geohash into the center of its cell
+    :return (latitude, longitude, latitude error, longitude error)
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = GEOHASH_BASE32.index(char)
+
+        for mask in (16, 8, 4, 2, 1):
+            current = lon_range if even else lat_range
+            middle = (current[0] + current[1]) / 2
+
+            if value & mask:
+                current[0] = middle
+            else:
+                current[1] = middle
+
+            even = not even
+
+    latitude = (lat_range[0] + lat_range[1]) / 2
+    longitude = (lon_range[0] + lon_range[1]) / 2
+
+    return latitude, longitude, (lat_range[1] - lat_range[0]) / 2, (lon_range[1] - lon_range[0]) / 2
+
+
+def cell_size(precision):
+    """
+    Size of a geohash cell in degrees
+    :return (latitude degrees, longitude degrees)
+    """
+    lat_bits, lon_bits = _bits(precision)
+
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def neighbours(geohash):
+    """
+    Return the eight cells surrounding the geohash cell
+    """
+    latitude, longitude, lat_error, lon_error = decode(geohash)
+    precision = len(geohash)
+
+    cells = []
+
+    for lat_step in (-1, 0, 1):
+        for lon_step in (-1, 0, 1):
+            if lat_step == 0 and lon_step == 0:
+                continue
+
+            lat = latitude + lat_step * lat_error * 2
+
+            # there is nothing above the poles
+            if lat > 90 or lat < -90:
+                continue
+
+            lon = longitude + lon_step * lon_error * 2
+
+            # wrap around the antimeridian
+            if lon > 180:
+                lon -= 360
+            elif lon < -180:
+                lon += 360
+
+            cell = encode(lat, lon, precision)
+
+            if cell != geohash and cell not in cells:
+                cells.append(cell)
+
+    return cells
+
+
+def precision_for_distance(latitude, distance):
+    """
+    Find the longest geohash precision which cells are at least `distance` wide at given latitude
+    Looking up a cell together with its neighbours then covers every point within the distance
+
+    Distance is in kilometers
+    """
+    longitude_scale = math.cos(math.radians(float(latitude)))
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_degrees, lon_degrees = cell_size(precision)
+
+        if lat_degrees * KILOMETERS_PER_DEGREE >= distance and \
+            lon_degrees * KILOMETERS_PER_DEGREE * longitude_scale >= distance:
+            return precision
+
+    return 0
+
+
+def cells_for_distance(latitude, longitude, distance):
+    """
+    Return geohash prefixes covering every point within the distance of coordinates
+    Empty list means that the distance is too big to be narrowed down by the geohash
+
+    Distance is in kilometers
+    """
+    precision = precision_for_distance(latitude, distance)
+
+    if precision == 0:
+        return []
+
+    center = encode(latitude, longitude, precision)
+
+    return [center] + neighbours(center)
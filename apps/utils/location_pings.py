@@ -0,0 +1,102 @@
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .models import LocationPing
+
+
+logger = logging.getLogger(__name__)
+
+
+class LocationPingBuffer:
+    """
+    Collects location pings in memory and writes them with one bulk insert
+
+    Pings are flushed once `flush_size` of them are buffered
+    or `flush_interval` seconds after the first buffered one, whichever comes first
+    Anything left is flushed when the process exits
+    """
+    def __init__(self, flush_interval, flush_size):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+
+        self.lock = threading.Lock()
+        self.pings = []
+        self.timer = None
+
+    def add(self, user, latitude, longitude):
+        ping = LocationPing(user=user, latitude=latitude, longitude=longitude)
+
+        with self.lock:
+            self.pings.append(ping)
+
+            if len(self.pings) < self.flush_size:
+                self._start_timer()
+                return
+
+            pings = self._take()
+
+        self._write(pings)
+
+    def flush(self):
+        with self.lock:
+            pings = self._take()
+
+        self._write(pings)
+
+    def _take(self):
+        """ Empty the buffer, has to be called while holding the lock """
+        pings = self.pings
+        self.pings = []
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        return pings
+
+    def _start_timer(self):
+        """ Schedule a flush for the first ping, has to be called while holding the lock """
+        if self.timer is not None:
+            return
+
+        self.timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # the timer thread has its own connection, do not leave it open
+            connection.close()
+
+    def _write(self, pings):
+        if len(pings) == 0:
+            return
+
+        try:
+            LocationPing.objects.bulk_create(pings, batch_size=self.flush_size)
+        except Exception:
+            # location history is best effort, never fail the request because of it
+            logger.exception('Could not write %d location pings', len(pings))
+
+
+location_ping_buffer = LocationPingBuffer(
+    flush_interval=settings.LOCATION_PING_FLUSH_INTERVAL,
+    flush_size=settings.LOCATION_PING_FLUSH_SIZE)
+
+atexit.register(location_ping_buffer.flush)
+
+
+def record_location(user, latitude, longitude):
+    """
+    Buffer user's location if location history is enabled
+    """
+    if not settings.LOCATION_HISTORY_ENABLED or not user.is_authenticated:
+        return
+
+    location_ping_buffer.add(user, latitude, longitude)
@@ -1,9 +1,14 @@
 import math
 
+import numpy as np
+
 from django.conf import settings
+from django.db.models import Q
 
+from . import geocoding, geohash
 from .constants import EARTH_RADIUS, EARTH_RADIUS_METERS
 from .models import Address
+from .reverse_geocoder import reverse_geocoder
 
 
 def build_address(geocoded):
@@ -58,40 +63,26 @@ def build_address(geocoded):
 
 def _geocode_many_addresses(address):
     # This function returns all the addresses found based on query
-    try:
-        geocoded = settings.GOOGLE_MAPS_API.geocode(address)
-        print(geocoded)
-        return geocoded
-    except Exception as e:
-        print(e)
-        return None
+    return geocoding.geocode(address)
 
 
 def _geocode_address(address):
-    try:
-        geocoded = settings.GOOGLE_MAPS_API.geocode(address)
+    geocoded = geocoding.geocode(address)
 
-        if len(geocoded) == 0:
-            return None
-        
-        return geocoded[0]
-    except Exception as e:
-        print(e)
+    if not geocoded:
         return None
 
+    return geocoded[0]
 
-def _reverse_geocode_location(lat, lng):
-    try:
-        geocoded = settings.GOOGLE_MAPS_API.reverse_geocode((lat, lng))
 
-        if len(geocoded) == 0:
-            return None
+def _reverse_geocode_location(lat, lng):
+    geocoded = geocoding.reverse_geocode(lat, lng)
 
-        return geocoded[0]
-    except Exception as e:
-        print(e)
+    if not geocoded:
         return None
 
+    return geocoded[0]
+
 
 def get_address_coordinates(address):
     geocoded = _geocode_address(address)
@@ -121,29 +112,102 @@ def create_address_from_address(address):
     return build_address(geocoded)
 
 
-def get_similar_addresses(address):
+def get_similar_addresses(address, variants=None, persist=True, place_id=None):
     """
     Return all query matches for address input
+
+    Variants of the query are geocoded concurrently within `GEOCODING_TIMEOUT`
+    Matches are unique by Google place id, places already stored are reused
+    and new ones are saved together unless `persist` is False
+    Pass `place_id` to save only the selected match
     """
-    geocoded = _geocode_many_addresses(address)
+    queries = [address] + [variant for variant in variants or [] if variant != address]
+
+    geocoded = []
+
+    for response in geocoding.geocode_many(queries, timeout=settings.GEOCODING_TIMEOUT):
+        if isinstance(response, list):
+            geocoded.extend(response)
+
+    # first match of every place, in the order of queries
+    matches = []
+    place_ids = set()
+
+    for _geocoded in geocoded:
+        _place_id = _geocoded.get('place_id', None)
+
+        if _place_id is not None:
+            if _place_id in place_ids:
+                continue
+            place_ids.add(_place_id)
+
+        if place_id is None or _place_id == place_id:
+            matches.append(_geocoded)
+
+    existing = {}
+
+    for addr in Address.objects.filter(google_place_id__in=place_ids).order_by('-pk'):
+        existing[addr.google_place_id] = addr
 
     addresses = []
+    new_addresses = []
 
-    if isinstance(geocoded, list):
-        for _geocoded in geocoded:
+    for _geocoded in matches:
+        addr = existing.get(_geocoded.get('place_id', None), None)
+
+        if addr is None:
             addr = build_address(_geocoded)
-            addr.save()
-            addresses.append(addr)
+            # bulk_create does not send pre_save
+            addr.update_geohash()
+            addr.update_coordinates_key()
+            new_addresses.append(addr)
+
+        addresses.append(addr)
+
+    if persist:
+        Address.objects.bulk_create(new_addresses)
+    else:
+        for addr in new_addresses:
+            # not stored, there is nothing to refer to yet
+            addr.uuid = None
 
     return addresses
 
 
-def create_address_from_coordinates(lat, lng):
+def create_address_from_coordinates(lat, lng, detailed=True):
+    """
+    Build address of the coordinates
+    Unless `detailed` is requested, only city and country are resolved, without Google
+    when the coordinates are close enough to a known city
+    """
+    if not detailed:
+        address = build_city_address(lat, lng)
+
+        if address.city is not None:
+            return address
+
     geocoded = _reverse_geocode_location(lat, lng)
 
     return build_address(geocoded)
 
 
+def build_city_address(lat, lng):
+    """
+    Build address of the coordinates with the closest city found offline
+    City and country are left empty if there is no city close enough
+    """
+    address = Address(latitude=lat, longitude=lng)
+
+    place = reverse_geocoder.resolve(lat, lng)
+
+    if place is not None:
+        address.city = place['city']
+        address.country = place['country']
+        address.country_short = place['country_short']
+
+    return address
+
+
 def get_distance(from_address, to_address, **kwargs):
     """
     Get distance between two addresses
@@ -198,11 +262,120 @@ def get_distance_haversine(from_lat, from_lon, to_lat, to_lon):
     return c * EARTH_RADIUS_METERS
 
 
+def get_distances_haversine(from_lat, from_lon, to_lats, to_lons):
+    """
+    Returns distances between one point and many points using haversine formula
+    Destinations are passed as sequences of latitudes and longitudes
+    Distances are represented in meters and returned in the order of destinations
+    """
+    from_lat_rad = math.radians(float(from_lat))
+    from_lon_rad = math.radians(float(from_lon))
+
+    to_lats_rad = np.radians(np.asarray(to_lats, dtype=np.float64))
+    to_lons_rad = np.radians(np.asarray(to_lons, dtype=np.float64))
+
+    var1 = to_lats_rad - from_lat_rad
+    var2 = to_lons_rad - from_lon_rad
+
+    a = np.sin(var1 / 2.0) ** 2 + \
+        math.cos(from_lat_rad) * np.cos(to_lats_rad) * np.sin(var2 / 2.0) ** 2
+
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return c * EARTH_RADIUS_METERS
+
+
+def filter_within_radius(distances, radius):
+    """
+    Return indexes of distances not further than radius, in the original order
+    Radius is in meters
+    """
+    return np.flatnonzero(np.asarray(distances) <= radius)
+
+
+def select_nearest(distances, k, radius=None):
+    """
+    Return indexes of the k smallest distances sorted from the closest
+    Equal distances keep their original order
+    Provide `radius` in meters to drop the distances further than it
+    """
+    distances = np.asarray(distances)
+
+    if radius is not None:
+        indexes = filter_within_radius(distances, radius)
+    else:
+        indexes = np.arange(len(distances))
+
+    if k is not None and k <= 0:
+        return indexes[:0]
+
+    if k is not None and k < len(indexes):
+        # partition first so only the k closest (and their ties) have to be sorted
+        kth_distance = np.partition(distances[indexes], k - 1)[k - 1]
+        indexes = indexes[distances[indexes] <= kth_distance]
+
+    indexes = indexes[np.lexsort((indexes, distances[indexes]))]
+
+    return indexes[:k]
+
+
+def select_closest(latitude, longitude, pks, latitudes, longitudes, radius, k=None, after=None):
+    """
+    Measure distances from coordinates to candidate points and select the closest ones
+    Equal distances are ordered by pk so results can be paged
+
+    Provide `k` to only select the k closest candidates
+    Provide `after` as (distance, pk) to skip everything up to and including it
+    Radius and distances are in meters
+    :return list of (pk, distance) from the closest
+    """
+    if len(pks) == 0:
+        return []
+
+    pks = np.asarray(pks)
+    order = np.argsort(pks, kind='stable')
+
+    pks = pks[order]
+    latitudes = np.asarray(latitudes, dtype=np.float64)[order]
+    longitudes = np.asarray(longitudes, dtype=np.float64)[order]
+
+    distances = get_distances_haversine(latitude, longitude, latitudes, longitudes)
+
+    if after is not None:
+        after_distance, after_pk = after
+
+        # drop everything up to and including the last point seen
+        distances = np.where(
+            (distances > after_distance) |
+            ((distances == after_distance) & (pks > after_pk)),
+            distances,
+            np.inf)
+
+    closest = select_nearest(distances, k, radius=radius)
+
+    return [(int(pks[index]), float(distances[index])) for index in closest]
+
+
 def get_degree_of_longitude(latitude):
     """ 
     Get distance between two longitude degrees at given latitude
     :return is given in kilometers
     """
 
-    latitude = float(latitude)
+    latitude = math.radians(float(latitude))
     return float(math.cos(latitude) * 111.6)
+
+
+def get_geohash_filter(latitude, longitude, distance, field='geohash'):
+    """
+    Build a filter matching addresses in the geohash cell of coordinates and its neighbours
+    Provide `field` to filter through relations, e.g. `address__geohash`
+
+    Distance is in kilometers
+    """
+    query = Q()
+
+    for cell in geohash.cells_for_distance(latitude, longitude, distance):
+        query |= Q(**{'{}__startswith'.format(field): cell})
+
+    return query
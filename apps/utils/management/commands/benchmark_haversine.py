@@ -0,0 +1,51 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.location_utils import get_distance_haversine, get_distances_haversine
+
+
+class Command(BaseCommand):
+    help = 'Compare the scalar haversine distance with the batch version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[10000, 1000000],
+            help='Numbers of destinations to measure')
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        origin = (55.6761, 12.5683)
+
+        for size in options['sizes']:
+            latitudes = [generator.uniform(-90, 90) for _ in range(size)]
+            longitudes = [generator.uniform(-180, 180) for _ in range(size)]
+
+            start = time.perf_counter()
+            scalar = [
+                get_distance_haversine(origin[0], origin[1], lat, lng)
+                for lat, lng in zip(latitudes, longitudes)]
+            scalar_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batch = get_distances_haversine(origin[0], origin[1], latitudes, longitudes)
+            batch_time = time.perf_counter() - start
+
+            max_error = max(abs(a - b) for a, b in zip(scalar, batch))
+
+            self.stdout.write(
+                '{size:>9} points: scalar {scalar:.4f}s, batch {batch:.4f}s, '
+                'speedup {speedup:.1f}x, max difference {error:.6f}m'.format(
+                    size=size,
+                    scalar=scalar_time,
+                    batch=batch_time,
+                    speedup=scalar_time / batch_time if batch_time else float('inf'),
+                    error=max_error))
@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.utils import geocoding
+from apps.utils.location_utils import create_address_from_coordinates
+from apps.utils.management.transactions import rolled_back
+from apps.utils.reverse_geocoder import reverse_geocoder
+
+
+class Command(BaseCommand):
+    help = 'Compare the offline reverse geocoder with geocoding through the stub client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=100000, help='Offline lookups to measure')
+        parser.add_argument('--live-lookups', type=int, default=50, help='Lookups through the client to measure')
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0.2,
+            help='Seconds the stub client waits per request, Google takes 0.2-0.6s')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+
+        start = time.perf_counter()
+        reverse_geocoder.load()
+        load_time = time.perf_counter() - start
+
+        self.stdout.write('Loaded {count} places in {elapsed:.3f}s'.format(
+            count=len(reverse_geocoder.places), elapsed=load_time))
+
+        # points around the known places, with the spread of half a degree some are too far from any of them
+        def coordinates(count, spread):
+            for _ in range(count):
+                _, _, _, latitude, longitude = generator.choice(reverse_geocoder.places)
+                yield latitude + generator.uniform(-spread, spread), longitude + generator.uniform(-spread, spread)
+
+        points = list(coordinates(options['lookups'], 0.5))
+
+        start = time.perf_counter()
+        resolved = sum(1 for lat, lng in points if reverse_geocoder.resolve(lat, lng) is not None)
+        offline_time = time.perf_counter() - start
+
+        self.stdout.write('Offline: {per_lookup:.1f}us per lookup, {resolved} of {count} resolved'.format(
+            per_lookup=offline_time / len(points) * 1e6, resolved=resolved, count=len(points)))
+
+        # close enough to be resolved offline, city only addresses do not reach the client
+        points = list(coordinates(options['live_lookups'], 0.1))
+
+        # leave no stub responses in the database cache
+        with rolled_back():
+            live_time, city_time = self.measure_client(points, options['latency'], generator)
+
+        self.stdout.write('Through the client: {per_lookup:.1f}ms per lookup'.format(
+            per_lookup=live_time / len(points) * 1e3))
+        self.stdout.write('City only address: {per_lookup:.1f}us per lookup, {speedup:.0f}x faster'.format(
+            per_lookup=city_time / len(points) * 1e6, speedup=live_time / city_time if city_time else float('inf')))
+
+    def measure_client(self, points, latency, generator):
+        client = 'apps.utils.geocoding.StubGeocodingClient'
+
+        with override_settings(GEOCODING_CLIENT=client, GEOCODING_CLIENT_OPTIONS={'latency': latency}):
+            geocoding._client = None
+
+            start = time.perf_counter()
+
+            for lat, lng in points:
+                # every lookup has to reach the client
+                geocoding.geocoding_cache.memory.clear()
+                create_address_from_coordinates(lat + generator.random(), lng, detailed=True)
+
+            live_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+
+            for lat, lng in points:
+                create_address_from_coordinates(lat, lng, detailed=False)
+
+            city_time = time.perf_counter() - start
+
+        geocoding._client = None
+        geocoding.geocoding_cache.memory.clear()
+
+        return live_time, city_time
@@ -0,0 +1,155 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from apps.activities.models import Activity, ActivityType
+from apps.activities.serializers import ActivitySerializer, FastActivitySerializer
+from apps.communication.models import COMMENTS, Comment, Post
+from apps.communication.serializers import FastPostSerializer, PostSerializer
+from apps.groups.models import Group, Membership
+from apps.groups.serializer import FastGroupSerializer, FastMembershipSerializer, GroupSerializer, MembershipSerializer
+from apps.users.models import User
+from apps.utils.management.transactions import rolled_back
+from apps.utils.models import Address, Tag
+
+
+class Command(BaseCommand):
+    help = 'Compare the DRF list serializers with the `.values()` ones on seeded data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            nargs='+',
+            type=int,
+            default=[100, 1000],
+            help='Numbers of objects to serialize')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs of every measurement, the best one is printed')
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0)
+
+    def handle(self, *args, **options):
+        # seeded data is not kept
+        with rolled_back():
+            self.seed(max(options['sizes']), random.Random(options['seed']))
+            self.run(options)
+
+    def run(self, options):
+        render = JSONRenderer().render
+
+        serializers = (
+            ('Activities', ActivitySerializer, FastActivitySerializer,
+                Activity.objects.filter(title__startswith='Benchmark ')),
+            ('Groups', GroupSerializer, FastGroupSerializer, Group.objects.filter(title__startswith='Benchmark ')),
+            ('Memberships', MembershipSerializer, FastMembershipSerializer,
+                Membership.objects.filter(group__title__startswith='Benchmark ')),
+            ('Posts', PostSerializer, FastPostSerializer, Post.objects.filter(body='Benchmark')),
+        )
+
+        for label, serializer_class, fast_serializer_class, queryset in serializers:
+            for size in options['sizes']:
+                objects = queryset.order_by('pk')[:size]
+
+                drf_time, drf_data = measure(
+                    lambda: serializer_class(serializer_class.prepare_queryset(objects), many=True).data,
+                    options['repeat'])
+                fast_time, fast_data = measure(lambda: fast_serializer_class(objects).data, options['repeat'])
+
+                self.stdout.write(
+                    '{label:<12} {size:>6}: drf {drf:.4f}s, values {fast:.4f}s, '
+                    'speedup {speedup:.1f}x, same JSON: {same}'.format(
+                        label=label,
+                        size=len(drf_data),
+                        drf=drf_time,
+                        fast=fast_time,
+                        speedup=drf_time / fast_time if fast_time else float('inf'),
+                        same=render(drf_data) == render(fast_data)))
+
+    def seed(self, size, generator):
+        now = timezone.now()
+
+        User.objects.bulk_create(
+            [
+                User(email='benchmark{}@serializers.gymder.com'.format(i), username='benchmark{}'.format(i), password='!')
+                for i in range(max(10, size // 10))
+            ])
+        users = list(User.objects.filter(email__endswith='@serializers.gymder.com'))
+
+        tags = [Tag.objects.create(title='benchmark {}'.format(i)) for i in range(10)]
+        activity_types = [
+            ActivityType.objects.create(title='benchmark {}'.format(i), approved=True) for i in range(5)]
+
+        Address.objects.bulk_create(
+            [
+                Address(
+                    address='Benchmark {}'.format(i),
+                    city='Copenhagen',
+                    country='Denmark',
+                    latitude=generator.uniform(55.6, 55.7),
+                    longitude=generator.uniform(12.5, 12.6))
+                for i in range(size)
+            ])
+        addresses = list(Address.objects.filter(address__startswith='Benchmark '))
+
+        Group.objects.bulk_create(
+            [Group(title='Benchmark {}'.format(i), user=generator.choice(users)) for i in range(size)])
+        groups = list(Group.objects.filter(title__startswith='Benchmark '))
+
+        Membership.objects.bulk_create(
+            [Membership(group=generator.choice(groups), user=generator.choice(users)) for i in range(size)])
+
+        Activity.objects.bulk_create(
+            [
+                Activity(
+                    title='Benchmark {}'.format(i),
+                    user=generator.choice(users),
+                    address=generator.choice(addresses),
+                    activity_type=generator.choice(activity_types),
+                    time=now + datetime.timedelta(hours=generator.randint(1, 24 * 365)))
+                for i in range(size)
+            ])
+        activities = list(Activity.objects.filter(title__startswith='Benchmark '))
+
+        Activity.tags.through.objects.bulk_create(
+            Activity.tags.through(activity=activity, tag=tag)
+            for activity in activities
+            for tag in generator.sample(tags, 3))
+
+        Post.objects.bulk_create(
+            [
+                Post(body='Benchmark', user=generator.choice(users), activity=generator.choice(activities))
+                for i in range(size)
+            ])
+        posts = list(Post.objects.filter(body='Benchmark'))
+
+        Comment.objects.bulk_create(
+            Comment(body='Benchmark', user=generator.choice(users), post=generator.choice(posts))
+            for i in range(size * 3))
+
+        # bulk inserts skip the counters
+        COMMENTS.reconcile([post.pk for post in posts])
+
+
+def measure(function, repeat):
+    """ :return (best time, result) """
+    best = None
+
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best, result
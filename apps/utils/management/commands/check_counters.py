@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.activities.models import APPROVED_REQUESTS, Activity
+from apps.communication.models import COMMENTS, Post
+from apps.groups.models import MEMBERS, Group
+from apps.pages import generations
+
+
+# Scopes of the cached pages showing the counts
+PAGE_SCOPES = {
+    Activity: generations.activity_scope,
+    Group: generations.group_scope,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare the stored attendee, member and comment counts with the rows they count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Objects compared at a time')
+        parser.add_argument('--fix', action='store_true', help='Recount the objects which differ')
+        parser.add_argument('--show', type=int, default=10, help='Differing counts to print')
+
+    def handle(self, *args, **options):
+        counters = (
+            ('Activity attendees', Activity, APPROVED_REQUESTS),
+            ('Group members', Group, MEMBERS),
+            ('Post comments', Post, COMMENTS),
+        )
+
+        drifted = 0
+
+        for label, model, counter in counters:
+            wrong = self.compare(model, counter, options)
+            drifted += len(wrong)
+
+            self.stdout.write('{label}: {count} wrong'.format(label=label, count=len(wrong)))
+
+            for pk, (stored, counted) in sorted(wrong.items())[:options['show']]:
+                self.stdout.write('  {} stored {} counted {}'.format(pk, stored, counted))
+
+        if not drifted:
+            self.stdout.write('Counters are consistent')
+            return
+
+        if not options['fix']:
+            raise CommandError('Counters have drifted, run with --fix to recount them')
+
+        self.stdout.write('Recounted {} objects'.format(drifted))
+
+    def compare(self, model, counter, options):
+        """ :return {pk: (stored, counted)} of the wrong counts, recounted with --fix """
+        batch_size = options['batch_size']
+        ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+
+        wrong = {}
+
+        for start in range(0, len(ids), batch_size):
+            batch = counter.diff(ids[start:start + batch_size])
+
+            if batch and options['fix']:
+                counter.reconcile(list(batch))
+
+            wrong.update(batch)
+
+        if wrong and options['fix'] and model in PAGE_SCOPES:
+            # recounts skip the signals, drop the cached pages showing the counts
+            generations.bump(*[PAGE_SCOPES[model](pk) for pk in wrong])
+
+        return wrong
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.utils.models import GeocodingCacheEntry
+
+
+class Command(BaseCommand):
+    help = 'Delete expired geocoding responses from the database cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Delete every cached response')
+
+    def handle(self, *args, **options):
+        entries = GeocodingCacheEntry.objects.all()
+
+        if not options['all']:
+            entries = entries.filter(expires_at__lte=timezone.now())
+
+        deleted, _ = entries.delete()
+
+        self.stdout.write('Deleted {0} geocoding cache entries'.format(deleted))
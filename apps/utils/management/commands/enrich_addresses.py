@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.utils.enrichment import process_due_jobs
+
+
+class Command(BaseCommand):
+    help = 'Geocode addresses saved with ADDRESS_ENRICHMENT_DEFERRED'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Addresses geocoded at a time')
+        parser.add_argument('--sleep', type=float, default=5, help='Seconds to wait when there is nothing to do')
+        parser.add_argument('--once', action='store_true', help='Process the due addresses and exit')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_due_jobs(options['batch_size'])
+
+            if processed:
+                self.stdout.write('Processed {0} addresses'.format(processed))
+
+            if processed < options['batch_size']:
+                if options['once']:
+                    break
+
+                time.sleep(options['sleep'])
@@ -0,0 +1,232 @@
+import datetime
+import random
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.activities import visibility
+from apps.activities.constants import RequestStatus
+from apps.activities.models import Activity, Request
+from apps.communication.models import Comment, Post
+from apps.groups.models import Group, Membership
+from apps.users.models import User
+from apps.utils.management.transactions import rolled_back
+
+
+# Partial indexes of the hot filters, dropped for the plans before them
+# Other indexes, e.g. the keyset pagination ones, stay
+PARTIAL_INDEXES = (
+    'activity_public_time_live',
+    'request_activity_user_live',
+    'request_user_status_live',
+    'membership_group_user_live',
+    'membership_user_status_live',
+    'comment_post_created_live',
+)
+
+INDEX_PATTERNS = (
+    # sqlite
+    re.compile(r'USING (?:COVERING )?INDEX (\w+)'),
+    # postgres
+    re.compile(r'Index (?:Only )?Scan (?:Backward )?using (\w+)'),
+    re.compile(r'Bitmap Index Scan on (\w+)'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Print query plans of the main endpoint queries without and with the partial indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--activities', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=100000)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--no-seed',
+            action='store_true',
+            help='Use the data already in the database')
+        parser.add_argument(
+            '--no-seqscan',
+            action='store_true',
+            help='Discourage sequential scans on Postgres, shows usable indexes on small tables')
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print the whole plans, not only the indexes used')
+
+    def handle(self, *args, **options):
+        # seeded data and dropped indexes are not kept
+        with rolled_back():
+            self.run(options)
+
+    def run(self, options):
+        if not options['no_seed']:
+            self.seed(options, random.Random(options['seed']))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+            if options['no_seqscan'] and connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        queries = self.get_queries()
+
+        after = [self.explain(queryset) for label, queryset in queries]
+
+        self.drop_indexes()
+
+        before = [self.explain(queryset) for label, queryset in queries]
+
+        for (label, queryset), before_plan, after_plan in zip(queries, before, after):
+            self.stdout.write(label)
+
+            for title, plan in (('before', before_plan), ('after', after_plan)):
+                indexes = get_used_indexes(plan)
+
+                self.stdout.write('  {title}: {indexes}'.format(
+                    title=title, indexes=', '.join(indexes) if indexes else 'no index'))
+
+                if options['plans']:
+                    for line in plan.splitlines():
+                        self.stdout.write('    ' + line)
+
+    def explain(self, queryset):
+        return queryset.explain()
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for name in PARTIAL_INDEXES:
+                cursor.execute('DROP INDEX {}'.format(connection.ops.quote_name(name)))
+
+    def get_queries(self):
+        """ :return [(label, queryset)] of the queries behind the main endpoints """
+        user = _most_common(Request.objects.filter(is_deleted=False), 'user', User)
+        activity = _most_common(Request.objects.filter(is_deleted=False), 'activity', Activity)
+        group = _most_common(Membership.objects.filter(is_deleted=False), 'group', Group)
+        post = _most_common(Comment.objects.filter(is_deleted=False), 'post', Post)
+
+        if None in (user, activity, group, post):
+            raise CommandError('The database needs requests, memberships and comments, seed it')
+
+        group_post = Post.objects.filter(group__isnull=False).first() or post
+
+        return (
+            ('Upcoming public activities', Activity.objects.filter(
+                is_deleted=False, public=True, time__gte=timezone.now()).order_by('time')[:20]),
+            ('Activities visible to the user', Activity.objects.visible_to(user).order_by('-time', '-pk')[:20]),
+            ('Request of the user', Request.objects.filter(activity=activity, user=user, is_deleted=False)),
+            ('Activity requests', Request.objects.filter(activity=activity, is_deleted=False)),
+            ('Activities the user asked to join', Request.objects.filter(
+                user=user,
+                is_deleted=False,
+                status__in=[RequestStatus.PENDING, RequestStatus.APPROVED]).values('activity')),
+            ('Membership of the user', Membership.objects.filter(
+                group=group, user=user, is_deleted=False, status=RequestStatus.APPROVED)),
+            ('Group memberships', Membership.objects.filter(group=group, is_deleted=False)),
+            ('Memberships of the user', Membership.objects.filter(user=user, is_deleted=False)),
+            ('Activity posts', Post.objects.filter(
+                activity=post.activity_id, is_deleted=False).order_by('-created_at', '-pk')[:20]),
+            ('Group posts', Post.objects.filter(
+                group=group_post.group_id, is_deleted=False).order_by('-created_at', '-pk')[:20]),
+            ('Post comments', Comment.objects.filter(post=post, is_deleted=False).order_by('created_at')),
+        )
+
+    def seed(self, options, generator):
+        now = timezone.now()
+
+        def deleted():
+            return generator.random() < 0.1
+
+        User.objects.bulk_create(
+            [
+                User(email='explain{}@benchmark.gymder.com'.format(i), password='!')
+                for i in range(options['users'])
+            ])
+        users = list(User.objects.filter(email__endswith='@benchmark.gymder.com'))
+
+        Group.objects.bulk_create(
+            [
+                Group(title='Explain {}'.format(i), user=generator.choice(users), is_deleted=deleted())
+                for i in range(options['groups'])
+            ])
+        groups = list(Group.objects.filter(title__startswith='Explain '))
+
+        Membership.objects.bulk_create(
+            [
+                Membership(
+                    group=group,
+                    user=user,
+                    status=generator.choice([RequestStatus.APPROVED, RequestStatus.PENDING]),
+                    is_deleted=deleted())
+                for group in groups
+                for user in generator.sample(users, min(50, len(users)))
+            ])
+
+        Activity.objects.bulk_create(
+            [
+                Activity(
+                    title='Explain {}'.format(i),
+                    user=generator.choice(users),
+                    group=generator.choice(groups) if generator.random() < 0.3 else None,
+                    public=generator.random() < 0.5,
+                    is_deleted=deleted(),
+                    time=now + datetime.timedelta(hours=generator.randint(-24 * 365, 24 * 365)))
+                for i in range(options['activities'])
+            ])
+        activities = list(Activity.objects.filter(title__startswith='Explain '))
+
+        statuses = [RequestStatus.APPROVED, RequestStatus.PENDING, RequestStatus.DENIED]
+
+        Request.objects.bulk_create(
+            Request(
+                user=generator.choice(users),
+                activity=generator.choice(activities),
+                status=generator.choice(statuses),
+                is_deleted=deleted())
+            for i in range(options['requests']))
+
+        Post.objects.bulk_create(
+            [
+                Post(
+                    body='Explain',
+                    user=generator.choice(users),
+                    activity=generator.choice(activities) if i % 2 else None,
+                    group=None if i % 2 else generator.choice(groups),
+                    is_deleted=deleted())
+                for i in range(options['posts'])
+            ])
+        posts = list(Post.objects.filter(body='Explain'))
+
+        Comment.objects.bulk_create(
+            Comment(body='Explain', user=generator.choice(users), post=generator.choice(posts), is_deleted=deleted())
+            for i in range(options['comments']))
+
+        # bulk inserts do not send signals
+        visibility.rebuild()
+
+
+def _most_common(queryset, field, model):
+    """ The related object with the most rows in the queryset """
+    row = queryset.values(field).annotate(rows=Count('pk')).order_by('-rows').first()
+
+    if row is None:
+        return None
+
+    return model.objects.get(pk=row[field])
+
+
+def get_used_indexes(plan):
+    indexes = []
+
+    for pattern in INDEX_PATTERNS:
+        for name in pattern.findall(plan):
+            if name not in indexes:
+                indexes.append(name)
+
+    return indexes
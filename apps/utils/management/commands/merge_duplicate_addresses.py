@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from apps.utils.models import Address, get_coordinates_key
+
+
+class Command(BaseCommand):
+    help = 'Merge addresses of the same place and point activities and users at the remaining one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Places merged and rows updated at a time')
+        parser.add_argument('--refresh-keys', action='store_true', help='Recalculate the rounded coordinates first')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the duplicates')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        if options['refresh_keys']:
+            self.refresh_keys(batch_size)
+
+        without_place = Q(google_place_id__isnull=True) | Q(google_place_id='')
+
+        place_ids = list(Address.objects
+            .exclude(without_place)
+            .values('google_place_id')
+            .annotate(count=Count('pk'))
+            .filter(count__gt=1)
+            .order_by()
+            .values_list('google_place_id', flat=True))
+
+        # addresses without place id go to the first address with the same coordinates, see `AddressManager.get_canonical`
+        coordinates_keys = list(Address.objects
+            .filter(coordinates_key__isnull=False)
+            .values('coordinates_key')
+            .annotate(count=Count('pk'), without_place=Count('pk', filter=without_place))
+            .filter(count__gt=1, without_place__gt=0)
+            .order_by()
+            .values_list('coordinates_key', flat=True))
+
+        self.stdout.write('Found {0} places and {1} coordinates with duplicates'.format(
+            len(place_ids), len(coordinates_keys)))
+
+        merged = 0
+
+        for start in range(0, len(place_ids), batch_size):
+            addresses = Address.objects.filter(google_place_id__in=place_ids[start:start + batch_size])
+            merged += self.merge(addresses, 'google_place_id', lambda address: True, options)
+
+        for start in range(0, len(coordinates_keys), batch_size):
+            addresses = Address.objects.filter(coordinates_key__in=coordinates_keys[start:start + batch_size])
+            merged += self.merge(addresses, 'coordinates_key', lambda address: not address.google_place_id, options)
+
+        self.stdout.write('{0} {1} duplicate addresses'.format('Would merge' if options['dry_run'] else 'Merged', merged))
+
+    def merge(self, addresses, key, is_duplicate, options):
+        """ Merge addresses grouped by the key, the first address of every group stays """
+        groups = {}
+
+        for address in addresses.order_by('pk').only('pk', 'user', 'latitude', 'longitude', 'google_place_id', key):
+            groups.setdefault(getattr(address, key), []).append(address)
+
+        merged = 0
+
+        for canonical, *rest in groups.values():
+            duplicates = [address.pk for address in rest if is_duplicate(address)]
+
+            if options['dry_run']:
+                merged += len(duplicates)
+            else:
+                merged += Address.objects.merge(canonical, duplicates, batch_size=options['batch_size'])
+
+        return merged
+
+    def refresh_keys(self, batch_size):
+        addresses = Address.objects.filter(
+            latitude__isnull=False,
+            longitude__isnull=False).only('latitude', 'longitude', 'coordinates_key')
+
+        changed = []
+
+        for address in addresses.iterator(chunk_size=batch_size):
+            key = get_coordinates_key(address.latitude, address.longitude)
+
+            if key != address.coordinates_key:
+                address.coordinates_key = key
+                changed.append(address)
+
+            if len(changed) == batch_size:
+                Address.objects.bulk_update(changed, ['coordinates_key'])
+                changed = []
+
+        Address.objects.bulk_update(changed, ['coordinates_key'])
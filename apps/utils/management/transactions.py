@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block in a transaction which is always rolled back,
+    e.g. to benchmark on seeded data which is not kept
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback()
+    except Rollback:
+        pass
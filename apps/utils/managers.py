@@ -1,6 +1,85 @@
-from django.db import models
+from django.db import models, transaction
+
+from .constants import ADDRESS_DETAIL_FIELDS
 
 
 class BaseManager(models.Manager):
     def only_active(self):
         return self.exclude(is_deleted=True)
+
+
+class AddressManager(models.Manager):
+    def get_canonical(self, address):
+        """
+        Return the stored address of the same place, or save and return the given one
+
+        Addresses with a Google place id are matched by it,
+        others by the coordinates rounded to `ADDRESS_COORDINATES_PRECISION`
+        A place stored with its city only takes the details of the given address
+        """
+        address.update_coordinates_key()
+
+        if address.google_place_id:
+            existing = self.filter(google_place_id=address.google_place_id)
+        elif address.coordinates_key is not None:
+            existing = self.filter(coordinates_key=address.coordinates_key)
+        else:
+            existing = self.none()
+
+        canonical = existing.order_by('pk').first()
+
+        if canonical is None:
+            address.save()
+            return address
+
+        if canonical.is_city_only() and not address.is_city_only():
+            self.add_details(canonical, address)
+
+        return canonical
+
+    def add_details(self, canonical, address):
+        """ Fill in the details of the city only address, coordinates from the client stay """
+        fields = [field for field in ADDRESS_DETAIL_FIELDS if getattr(address, field) is not None]
+
+        for field in fields:
+            setattr(canonical, field, getattr(address, field))
+
+        # addresses saved for geocoding later are pending until `enrich_addresses` runs
+        canonical.enrichment_status = address.enrichment_status
+        canonical.save(update_fields=fields + ['enrichment_status'])
+
+    def merge(self, canonical, duplicates, batch_size=1000):
+        """
+        Point everything referring to the duplicates at the canonical address and delete them
+        Foreign keys are rewritten `batch_size` rows at a time
+        :return number of deleted addresses
+        """
+        duplicates = [pk for pk in duplicates if pk != canonical.pk]
+
+        if len(duplicates) == 0:
+            return 0
+
+        with transaction.atomic():
+            for relation in self.model._meta.related_objects:
+                # one to one relations could not point at the same address
+                if not relation.one_to_many:
+                    continue
+
+                manager = relation.related_model._base_manager
+                name = relation.field.name
+
+                pks = list(manager.filter(**{name + '__in': duplicates}).values_list('pk', flat=True))
+
+                for start in range(0, len(pks), batch_size):
+                    manager.filter(pk__in=pks[start:start + batch_size]).update(**{name: canonical})
+
+            if canonical.user_id is None:
+                user_id = self.filter(pk__in=duplicates, user__isnull=False).values_list('user_id', flat=True).first()
+
+                if user_id is not None:
+                    canonical.user_id = user_id
+                    canonical.save(update_fields=['user'])
+
+            deleted, _ = self.filter(pk__in=duplicates).delete()
+
+        return deleted
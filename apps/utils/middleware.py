@@ -1,8 +1,14 @@
+import logging
 import re
 
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect, reverse
 
+from .queries import QueryRecorder, get_query_budget
+
+
+logger = logging.getLogger(__name__)
 
 EXEMPT_URLS = [re.compile(settings.LOGIN_URL.lstrip('/'))]
 
@@ -52,3 +58,43 @@ class LoginRequiredMiddleware:
         elif request.user.is_authenticated or url_is_exempt:
             # Let it be
             return None
+
+
+class QueryCountMiddleware:
+    """
+    Records the SQL queries of every request and adds them to response headers
+
+    `X-DB-Query-Count` - number of queries
+    `X-DB-Query-Time` - total time in the database in milliseconds
+    `X-DB-Duplicate-Queries` - queries repeating an earlier one with the same parameters
+
+    Requests over the route's budget in `QUERY_BUDGETS` are logged as warnings
+    Only enabled with `QUERY_COUNT_HEADERS`, which follows `DEBUG`
+    """
+    def __init__(self, get_response):
+        if not settings.QUERY_COUNT_HEADERS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+
+        response['X-DB-Query-Count'] = str(recorder.count)
+        response['X-DB-Query-Time'] = '{:.2f}'.format(recorder.duration * 1000)
+        response['X-DB-Duplicate-Queries'] = str(recorder.duplicates)
+
+        if request.resolver_match is not None:
+            budget = get_query_budget(request.resolver_match.view_name, request.method)
+
+            if recorder.count > budget:
+                logger.warning(
+                    '%s %s issued %d queries, budget is %d. Most repeated:\n%s',
+                    request.method,
+                    request.path,
+                    recorder.count,
+                    budget,
+                    '\n'.join('  {}x {}'.format(times, sql[:200]) for sql, times in recorder.most_common(3)))
+
+        return response
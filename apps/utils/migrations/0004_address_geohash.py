@@ -0,0 +1,33 @@
+# Generated by Django 2.2.7 on 2026-10-18 10:42
+
+from django.db import migrations, models
+
+from apps.utils import geohash
+
+
+def fill_geohashes(apps, schema_editor):
+    Address = apps.get_model('utils', 'Address')
+
+    addresses = Address.objects.filter(
+        latitude__isnull=False,
+        longitude__isnull=False).only('latitude', 'longitude')
+
+    for address in addresses.iterator():
+        address.geohash = geohash.encode(address.latitude, address.longitude)
+        address.save(update_fields=['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0003_auto_20191111_2107'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
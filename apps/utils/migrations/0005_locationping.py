@@ -0,0 +1,27 @@
+# Generated by Django 2.2.7 on 2026-10-18 10:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('utils', '0004_address_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationPing',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('latitude', models.DecimalField(decimal_places=5, max_digits=12)),
+                ('longitude', models.DecimalField(decimal_places=5, max_digits=12)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='location_pings', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
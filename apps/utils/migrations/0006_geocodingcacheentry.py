@@ -0,0 +1,25 @@
+# Generated by Django 2.2.7 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0005_locationping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodingCacheEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('response', models.TextField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Geocoding cache entries',
+            },
+        ),
+    ]
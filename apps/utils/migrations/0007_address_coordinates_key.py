@@ -0,0 +1,38 @@
+# Generated by Django 2.2.7 on 2026-10-18 10:53
+
+from django.db import migrations, models
+
+from apps.utils.models import get_coordinates_key
+
+
+def fill_coordinates_keys(apps, schema_editor):
+    Address = apps.get_model('utils', 'Address')
+
+    addresses = Address.objects.filter(
+        latitude__isnull=False,
+        longitude__isnull=False).only('latitude', 'longitude')
+
+    for address in addresses.iterator():
+        address.coordinates_key = get_coordinates_key(address.latitude, address.longitude)
+        address.save(update_fields=['coordinates_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0006_geocodingcacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='coordinates_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AlterField(
+            model_name='address',
+            name='google_place_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(fill_coordinates_keys, migrations.RunPython.noop),
+    ]
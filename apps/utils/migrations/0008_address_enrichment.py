@@ -0,0 +1,31 @@
+# Generated by Django 2.2.7 on 2026-10-18 10:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils', '0007_address_coordinates_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='enrichment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('not_found', 'Not found'), ('failed', 'Failed')], default='done', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='AddressEnrichmentJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('address', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='enrichment_job', to='utils.Address')),
+            ],
+        ),
+    ]
@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 import uuid
 
-from .managers import BaseManager
+from . import geohash
+from .constants import EnrichmentStatus
+from .managers import AddressManager, BaseManager
 
 
 class Model(models.Model):
@@ -24,6 +30,19 @@ class BaseModel(Model):
     class Meta:
         abstract = True
 
+    def save(self, *args, **kwargs):
+        """
+        Saves with `update_fields` write `updated_at` too, the ETags of the API are built from it,
+        e.g. a status change of a request is a new version of its activity.
+        An empty `update_fields` still saves nothing
+        """
+        update_fields = kwargs.get('update_fields')
+
+        if update_fields and 'updated_at' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['updated_at']
+
+        return super().save(*args, **kwargs)
+
 
 class Address(Model):
     """
@@ -41,11 +60,24 @@ class Address(Model):
     latitude = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
     longitude = models.DecimalField(max_digits=12, decimal_places=5, null=True, blank=True)
 
-    google_place_id = models.CharField(max_length=100, null=True, blank=True)
+    # Spatial index of the coordinates, look up cell prefixes to find nearby addresses
+    geohash = models.CharField(max_length=12, null=True, blank=True, db_index=True, editable=False)
+
+    # Rounded coordinates, addresses without place id are the same place if they match
+    coordinates_key = models.CharField(max_length=40, null=True, blank=True, db_index=True, editable=False)
+
+    google_place_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
     global_code = models.CharField(max_length=100, null=True, blank=True)
 
     address_type = models.CharField(max_length=100, null=True, blank=True)
 
+    enrichment_status = models.CharField(
+        max_length=20,
+        choices=EnrichmentStatus.CHOICES,
+        default=EnrichmentStatus.DONE)
+
+    # only set on addresses saved before they were shared, see `AddressManager.get_canonical`
+    # canonical addresses belong to nobody and no permission check reads it
     user = models.ForeignKey(
         'users.User',
         related_name='addresses',
@@ -53,6 +85,8 @@ class Address(Model):
         null=True,
         blank=True)
 
+    objects = AddressManager()
+
     def __str__(self):
         if self.user:
             return '{0} of {1}'.format(self.address if self.address else 'None', str(self.user) if self.user else 'None')
@@ -62,6 +96,101 @@ class Address(Model):
     class Meta:
         verbose_name_plural = 'Addresses'
 
+    def update_geohash(self):
+        """ Recalculate geohash from the coordinates """
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash.encode(self.latitude, self.longitude)
+        else:
+            self.geohash = None
+
+    def update_coordinates_key(self):
+        """ Recalculate the rounded coordinates """
+        self.coordinates_key = get_coordinates_key(self.latitude, self.longitude)
+
+    def is_city_only(self):
+        """ Whether only the city and country are known, see `build_city_address` """
+        return not self.google_place_id and not self.address \
+            and self.enrichment_status == EnrichmentStatus.DONE
+
+
+def touches(update_fields, fields):
+    """ Whether a save with `update_fields` may have changed any of the fields """
+    return update_fields is None or bool(fields.intersection(update_fields))
+
+
+def get_coordinates_key(latitude, longitude):
+    """
+    Key of coordinates rounded to `ADDRESS_COORDINATES_PRECISION` decimal places
+    """
+    if latitude is None or longitude is None:
+        return None
+
+    precision = settings.ADDRESS_COORDINATES_PRECISION
+
+    return '{0:.{2}f},{1:.{2}f}'.format(float(latitude), float(longitude), precision)
+
+
+@receiver(pre_save, sender=Address)
+def update_address_geohash(sender, instance, *args, **kwargs):
+    instance.update_geohash()
+    instance.update_coordinates_key()
+
+
+class AddressEnrichmentJob(models.Model):
+    """
+    Geocoding of an address saved as the client sent it
+    Processed by the `enrich_addresses` command
+    """
+    address = models.OneToOneField(
+        Address,
+        related_name='enrichment_job',
+        on_delete=models.CASCADE)
+
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return 'Enrichment of {0}'.format(str(self.address))
+
+
+class LocationPing(models.Model):
+    """
+    Location reported by the user's device
+    Written in batches by `apps.utils.location_pings`
+    """
+    latitude = models.DecimalField(max_digits=12, decimal_places=5)
+    longitude = models.DecimalField(max_digits=12, decimal_places=5)
+
+    user = models.ForeignKey(
+        'users.User',
+        related_name='location_pings',
+        on_delete=models.CASCADE)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return '{0} at {1}, {2}'.format(str(self.user), self.latitude, self.longitude)
+
+
+class GeocodingCacheEntry(models.Model):
+    """
+    Geocoding response kept by `apps.utils.geocoding`
+    Key is the normalized query or the rounded coordinates
+    """
+    key = models.CharField(max_length=255, unique=True)
+    response = models.TextField()
+
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'Geocoding cache entries'
+
+    def __str__(self):
+        return self.key
+
 
 class Tag(Model):
     """ Used for hashtagging activities, following 'streams'"""
@@ -0,0 +1,150 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+CURSOR_QUERY_PARAM = 'cursor'
+
+
+def encode_cursor(values):
+    """
+    Encode position in the results as an opaque cursor string
+    """
+    data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """
+    Decode cursor created by `encode_cursor`
+    Raises ValueError if the cursor is malformed
+    """
+    try:
+        data = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        return json.loads(data.decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def get_next_link(request, cursor):
+    """
+    Build the `Link` header value pointing to the next page of results
+    """
+    url = replace_query_param(
+        request.build_absolute_uri(), CURSOR_QUERY_PARAM, cursor)
+
+    return '<{}>; rel="next"'.format(url)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates on a unique ordering, e.g. `('-time', '-pk')`, instead of offsets
+
+    Set `ordering` on the view, it has to end with the primary key.
+    Values querysets have to include the ordering lookups.
+    Results are returned as a list, the next page is linked in the `Link` header
+    """
+    ordering = ('-created_at', '-pk')
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'ordering', self.ordering)
+        self.fields = [
+            get_ordering_field(queryset.model, lookup) for lookup in self.ordering]
+
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get(CURSOR_QUERY_PARAM, None)
+
+        if cursor:
+            queryset = queryset.filter(self.get_position_filter(cursor))
+
+        # one more to know if there is a next page
+        results = list(queryset[:page_size + 1])
+
+        self.has_next = len(results) > page_size
+        self.results = results[:page_size]
+
+        return self.results
+
+    def get_paginated_response(self, data):
+        headers = {}
+
+        if self.has_next:
+            headers['Link'] = get_next_link(self.request, encode_cursor(self.get_position(self.results[-1])))
+
+        return Response(data=data, headers=headers)
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=settings.API_MAX_PAGE_SIZE)
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+
+    def get_position(self, result):
+        """ Ordering values of a model instance or a `.values()` row as strings """
+        if isinstance(result, dict):
+            values = [result[lookup.lstrip('-')] for lookup in self.ordering]
+        else:
+            values = [field.value_from_object(result) for field in self.fields]
+
+        return [value.isoformat() if hasattr(value, 'isoformat') else str(value) for value in values]
+
+    def get_position_filter(self, cursor):
+        """
+        Filter of the rows after the position in the cursor
+
+        Leading column is also bounded by itself so the index can be used for it
+        """
+        try:
+            position = decode_cursor(cursor)
+
+            if not isinstance(position, list) or len(position) != len(self.fields):
+                raise ValueError('Invalid cursor')
+
+            values = [field.to_python(value) for field, value in zip(self.fields, position)]
+        except (ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        lookups = [lookup.lstrip('-') for lookup in self.ordering]
+        operators = ['lt' if lookup.startswith('-') else 'gt' for lookup in self.ordering]
+
+        after = Q()
+
+        for i in range(len(lookups)):
+            condition = Q(**{'{}__{}'.format(lookups[i], operators[i]): values[i]})
+
+            for j in range(i):
+                condition &= Q(**{lookups[j]: values[j]})
+
+            after |= condition
+
+        bound = Q(**{'{}__{}e'.format(lookups[0], operators[0]): values[0]})
+
+        return bound & after
+
+
+def get_ordering_field(model, lookup):
+    """ Model field of an ordering lookup, e.g. `-time` """
+    name = lookup.lstrip('-')
+
+    if name == 'pk':
+        return model._meta.pk
+
+    return model._meta.get_field(name)
@@ -0,0 +1,72 @@
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+class QueryRecorder:
+    """
+    Records SQL queries executed on all database connections of the current thread
+
+    Works without `DEBUG`, use as a context manager:
+
+        with QueryRecorder() as recorder:
+            ...
+        recorder.count, recorder.duration, recorder.duplicates
+    """
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+
+        return self
+
+    def __exit__(self, *args):
+        self._stack.close()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), time.monotonic() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        """ Total time spent in the database in seconds """
+        return sum(duration for sql, params, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        """ Number of queries repeating an earlier one with the same parameters """
+        return self.count - len(set((sql, params) for sql, params, duration in self.queries))
+
+    def most_common(self, n=5):
+        """ :return [(sql, times executed)] for the most repeated statements """
+        return Counter(sql for sql, params, duration in self.queries).most_common(n)
+
+
+def get_query_budget(view_name, method='GET'):
+    """
+    Maximum number of queries a route may issue, view name includes the namespace
+    Budgets of other methods than GET are looked up as '<method> <view name>' first
+    """
+    budgets = settings.QUERY_BUDGETS
+
+    if method != 'GET' and '{} {}'.format(method, view_name) in budgets:
+        return budgets['{} {}'.format(method, view_name)]
+
+    return budgets.get(view_name, settings.QUERY_BUDGET_DEFAULT)
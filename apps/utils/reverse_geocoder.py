@@ -0,0 +1,165 @@
+import csv
+import math
+import threading
+
+from django.conf import settings
+
+from .constants import EARTH_RADIUS
+
+
+def to_vector(latitude, longitude):
+    """ Point on the unit sphere, straight line distances order the same way as great circle ones """
+    latitude = math.radians(float(latitude))
+    longitude = math.radians(float(longitude))
+
+    return (
+        math.cos(latitude) * math.cos(longitude),
+        math.cos(latitude) * math.sin(longitude),
+        math.sin(latitude))
+
+
+class KDTree:
+    """
+    Static 3-d tree for nearest point lookups
+
+    The tree is implicit: points are ordered so that the middle point of every range
+    splits the rest of the range along the axis of its depth
+    """
+    def __init__(self, points):
+        self.indexes = list(range(len(points)))
+        self.points = points
+
+        self._build(0, len(points), 0)
+
+        self.points = [points[index] for index in self.indexes]
+
+    def _build(self, start, end, axis):
+        if end - start <= 1:
+            return
+
+        self.indexes[start:end] = sorted(self.indexes[start:end], key=lambda index: self.points[index][axis])
+
+        middle = (start + end) // 2
+        self._build(start, middle, (axis + 1) % 3)
+        self._build(middle + 1, end, (axis + 1) % 3)
+
+    def nearest(self, point):
+        """
+        Find the closest point
+        :return (index in the list the tree was built from, squared distance)
+        """
+        if len(self.points) == 0:
+            return None, None
+
+        best = [None, math.inf]
+        self._search(point, 0, len(self.points), 0, best)
+
+        return self.indexes[best[0]], best[1]
+
+    def _search(self, point, start, end, axis, best):
+        if start >= end:
+            return
+
+        middle = (start + end) // 2
+        candidate = self.points[middle]
+
+        distance = \
+            (candidate[0] - point[0]) ** 2 + \
+            (candidate[1] - point[1]) ** 2 + \
+            (candidate[2] - point[2]) ** 2
+
+        if distance < best[1]:
+            best[0], best[1] = middle, distance
+
+        difference = point[axis] - candidate[axis]
+        next_axis = (axis + 1) % 3
+
+        if difference < 0:
+            near, far = (start, middle), (middle + 1, end)
+        else:
+            near, far = (middle + 1, end), (start, middle)
+
+        self._search(point, near[0], near[1], next_axis, best)
+
+        # the other side can only be closer if the splitting plane is
+        if difference ** 2 < best[1]:
+            self._search(point, far[0], far[1], next_axis, best)
+
+
+def load_places(path):
+    """
+    Read places from a CSV file with name, country, country_short, latitude and longitude columns
+    or from a GeoNames cities dump (`cities15000.txt` etc.), which has no country names
+    :return list of (city, country, country_short, latitude, longitude)
+    """
+    places = []
+
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.txt'):
+            for row in csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE):
+                places.append((row[1], row[8], row[8], float(row[4]), float(row[5])))
+        else:
+            for row in csv.DictReader(f):
+                places.append((
+                    row['name'],
+                    row['country'],
+                    row['country_short'],
+                    float(row['latitude']),
+                    float(row['longitude'])))
+
+    return places
+
+
+class ReverseGeocoder:
+    """
+    Resolves coordinates to the closest known city without network access
+
+    Places are loaded from `path` on the first lookup
+    Coordinates further than `max_distance` kilometers from every place are not resolved
+    """
+    def __init__(self, path, max_distance):
+        self.path = path
+        self.max_distance = max_distance
+
+        self.lock = threading.Lock()
+        self.places = None
+        self.tree = None
+
+    def load(self):
+        self.places = load_places(self.path)
+        self.tree = KDTree([to_vector(place[3], place[4]) for place in self.places])
+
+    def resolve(self, latitude, longitude):
+        """
+        Find the closest city
+        :return dictionary with city, country, country_short and distance in kilometers or None
+        """
+        if self.tree is None:
+            with self.lock:
+                if self.tree is None:
+                    self.load()
+
+        index, distance = self.tree.nearest(to_vector(latitude, longitude))
+
+        if index is None:
+            return None
+
+        # straight line through the sphere to the distance along it
+        distance = 2 * math.asin(min(math.sqrt(distance) / 2, 1)) * EARTH_RADIUS
+
+        if distance > self.max_distance:
+            return None
+
+        city, country, country_short, _, _ = self.places[index]
+
+        return {
+            'city': city,
+            'country': country,
+            'country_short': country_short,
+            'distance': distance,
+        }
+
+
+reverse_geocoder = ReverseGeocoder(
+    path=settings.OFFLINE_GEOCODER_DATASET,
+    max_distance=settings.OFFLINE_GEOCODER_MAX_DISTANCE)
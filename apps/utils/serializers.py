@@ -1,8 +1,11 @@
 from decimal import Decimal
 
+from django.conf import settings
+
 from rest_framework import serializers
 
-from .location_utils import create_address_from_address, create_address_from_coordinates
+from .enrichment import create_pending_address
+from .location_utils import build_city_address, create_address_from_address, create_address_from_coordinates
 from .models import Address, Tag
 
 
@@ -11,6 +14,8 @@ class AddressSerializer(serializers.ModelSerializer):
     Full address serializer
     On create will collect the data from Google about the location
     Needs to have either address or latitude and longitude passed
+    Pass `detailed` False in the context when city and country of the coordinates are enough
+    With `ADDRESS_ENRICHMENT_DEFERRED` the address is saved right away and geocoded later
     """
     uuid = serializers.UUIDField(format='hex', read_only=True)
     address = serializers.CharField(max_length=200, required=False)
@@ -34,6 +39,7 @@ class AddressSerializer(serializers.ModelSerializer):
     country = serializers.CharField(read_only=True)
     country_short = serializers.CharField(read_only=True)
     postal_code = serializers.CharField(read_only=True)
+    place_id = serializers.CharField(source='google_place_id', read_only=True)
 
     class Meta:
         model = Address
@@ -47,7 +53,8 @@ class AddressSerializer(serializers.ModelSerializer):
             'latitude',
             'longitude',
             'postal_code',
-            'country_short'
+            'country_short',
+            'place_id'
             )
 
     def validate(self, data):
@@ -59,22 +66,26 @@ class AddressSerializer(serializers.ModelSerializer):
         raise serializers.ValidationError('address or latitude and longitude has to be defined')
 
     def create(self, validated_data):
+        if settings.ADDRESS_ENRICHMENT_DEFERRED:
+            return create_pending_address(
+                address=validated_data.get('address', None),
+                lat=validated_data.get('latitude', None),
+                lng=validated_data.get('longitude', None))
+
         if validated_data.get('address', None) is not None:
             address = create_address_from_address(validated_data['address'])
         else:
-            address = create_address_from_coordinates(validated_data['latitude'], validated_data['longitude'])
-        
-        address.save()
-        return address
+            address = create_address_from_coordinates(
+                validated_data['latitude'],
+                validated_data['longitude'],
+                detailed=self.context.get('detailed', True))
+
+        return Address.objects.get_canonical(address)
 
     def save(self, **kwargs):
+        # canonical addresses are shared by everyone saving the same place, they are not owned
         if self.instance is None:
-            user = kwargs.get('user', None)
             self.instance = self.create(self.validated_data)
-
-            if user:
-                self.instance.user = user
-                self.instance.save(update_fields=['user'])
         # We should never update address, instead just discard
         # and leave it hanging for machine learning
         # else:
@@ -88,7 +99,6 @@ class MinimalAddressSerializer(serializers.ModelSerializer):
     Minimal address serializer
     This should only be used when storing the location from the phone for example
     We retrieve raw coordinates but do not care about the formatted address
-    Attach it to the user to have a track of user
     """
     uuid = serializers.UUIDField(format='hex', read_only=True)
     latitude = serializers.DecimalField(
@@ -113,21 +123,32 @@ class MinimalAddressSerializer(serializers.ModelSerializer):
         )
 
     def create(self, validated_data):
-        return Address.objects.create(
-            latitude=validated_data['latitude'], 
-            longitude=validated_data['longitude'])
+        return Address.objects.get_canonical(build_city_address(
+            validated_data['latitude'], 
+            validated_data['longitude']))
 
 
     def save(self, **kwargs):
         if self.instance is None:
-            user = kwargs.get('user', None)
             self.instance = self.create(self.validated_data)
-
-            self.instance.user = user
-            self.instance.save(update_fields=['user'])
         return self.instance
 
 
+class AddressLookupSerializer(serializers.Serializer):
+    """
+    Address picker query
+    Variants are alternative spellings of the address looked up together with it
+    Set persist to false to only preview the matches, then send back the place id of the selected one
+    """
+    address = serializers.CharField(max_length=200)
+    variants = serializers.ListField(
+        child=serializers.CharField(max_length=200),
+        required=False,
+        max_length=settings.GEOCODING_MAX_VARIANTS)
+    persist = serializers.BooleanField(default=True)
+    place_id = serializers.CharField(max_length=100, required=False)
+
+
 class TagSerializer(serializers.ModelSerializer):
     """
     Tag serializer
@@ -0,0 +1,81 @@
+import copy
+
+from django.db.models import Prefetch
+
+from rest_framework import serializers
+
+
+class PrefetchPlanMixin(object):
+    """
+    Lets serializers declare the relations they read
+
+    Set `select_related` and `prefetch_related` in `Meta` to the relations used by the serializer itself.
+    Plans of nested serializers using the mixin are added under the relation they are nested in,
+    so only the outermost serializer has to be asked for the plan.
+
+    Use `prepare_queryset(queryset)` before serializing many objects
+    """
+
+    @classmethod
+    def get_prefetch_plan(cls):
+        """
+        Compose the relations to load for the serializer and everything nested in it
+        :return (select_related lookups, prefetch_related lookups)
+        """
+        if '_prefetch_plan' not in cls.__dict__:
+            cls._prefetch_plan = cls._build_prefetch_plan()
+
+        return cls._prefetch_plan
+
+    @classmethod
+    def _build_prefetch_plan(cls):
+        meta = getattr(cls, 'Meta', None)
+        select = list(getattr(meta, 'select_related', ()))
+        prefetch = list(getattr(meta, 'prefetch_related', ()))
+
+        fields = getattr(meta, 'fields', None)
+
+        for name, field in cls._declared_fields.items():
+            if isinstance(fields, (list, tuple)) and name not in fields:
+                continue
+
+            if isinstance(field, serializers.ListSerializer):
+                field = field.child
+
+            if not isinstance(field, PrefetchPlanMixin):
+                continue
+
+            source = field.source or name
+            nested_select, nested_prefetch = field.get_prefetch_plan()
+
+            # relations under a prefetched one have to be prefetched as well
+            if source in select:
+                select.extend('{0}__{1}'.format(source, lookup) for lookup in nested_select)
+            else:
+                prefetch.extend(_add_prefix(lookup, source) for lookup in nested_select)
+
+            prefetch.extend(_add_prefix(lookup, source) for lookup in nested_prefetch)
+
+        return tuple(select), tuple(prefetch)
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        """ Apply the prefetch plan to the queryset """
+        select, prefetch = cls.get_prefetch_plan()
+
+        if select:
+            queryset = queryset.select_related(*select)
+
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+
+        return queryset
+
+
+def _add_prefix(lookup, prefix):
+    if isinstance(lookup, Prefetch):
+        lookup = copy.copy(lookup)
+        lookup.add_prefix(prefix)
+        return lookup
+
+    return '{0}__{1}'.format(prefix, lookup)
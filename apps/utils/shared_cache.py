@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+# Backends keeping the values inside the process
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared(alias='default'):
+    """
+    Whether every worker reads and writes the same cache
+
+    Values invalidated by saves, e.g. the group roles, may only be cached when it is,
+    a version bumped in one process is not seen by the others otherwise
+    """
+    return settings.LOCAL_CACHE_IS_SHARED or not isinstance(caches[alias], LOCAL_BACKENDS)
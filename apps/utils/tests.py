@@ -1,3 +1,578 @@
-from django.test import TestCase
+import datetime
+import math
+import random
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+import uuid
+
+from apps.activities.models import Activity
+from apps.groups.models import Group
+from apps.users.models import User
+
+from . import geocoding, geohash
+from .constants import EnrichmentStatus, KILOMETERS_PER_DEGREE
+from .enrichment import claim_jobs, create_pending_address, process_due_jobs
+from .geocoding import GeocodingCache, LRUCache, StubGeocodingClient, geocode_many
+from .location_utils import (
+    get_distance_haversine,
+    get_distances_haversine,
+    get_similar_addresses,
+    select_closest,
+    select_nearest
+)
+from .management.commands.explain_queries import PARTIAL_INDEXES
+from .models import Address, AddressEnrichmentJob, GeocodingCacheEntry
+from .reverse_geocoder import KDTree, ReverseGeocoder, load_places, to_vector
+
+
+@override_settings(
+    ADDRESS_ENRICHMENT_DEFERRED=True,
+    ADDRESS_ENRICHMENT_MAX_ATTEMPTS=3,
+    ADDRESS_ENRICHMENT_BACKOFF=60,
+    ADDRESS_ENRICHMENT_MAX_BACKOFF=100)
+class AddressEnrichmentTests(TestCase):
+
+    def setUp(self):
+        self.client_stub = StubGeocodingClient()
+
+    def lookup(self, address):
+        """ Geocode like `enrichment._lookup` does, through the stub """
+        return self.client_stub.geocode(address.address), None
+
+    def process(self, lookup=None):
+        with mock.patch('apps.utils.enrichment._lookup', side_effect=lookup or self.lookup):
+            return process_due_jobs(10)
+
+    def make_due(self):
+        AddressEnrichmentJob.objects.update(next_attempt_at=timezone.now())
+
+    def test_pending_addresses(self):
+        address = create_pending_address(address='Vesterbrogade 1')
+
+        self.assertEqual(address.enrichment_status, EnrichmentStatus.PENDING)
+        self.assertTrue(AddressEnrichmentJob.objects.filter(address=address).exists())
+
+        # the same coordinates are saved and geocoded once
+        first = create_pending_address(lat=Decimal('55.67601'), lng=Decimal('12.56801'))
+        second = create_pending_address(lat=Decimal('55.67602'), lng=Decimal('12.56802'))
+
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(AddressEnrichmentJob.objects.filter(address=first).count(), 1)
+
+    def test_enrich(self):
+        address = create_pending_address(address='Vesterbrogade 1')
+
+        self.assertEqual(self.process(), 1)
+
+        address.refresh_from_db()
+        self.assertEqual(address.enrichment_status, EnrichmentStatus.DONE)
+        self.assertEqual(address.city, 'Copenhagen')
+        self.assertEqual(address.google_place_id, self.client_stub.geocode('Vesterbrogade 1')[0]['place_id'])
+        self.assertFalse(AddressEnrichmentJob.objects.exists())
+
+    def test_claimed_jobs_are_leased(self):
+        create_pending_address(address='Vesterbrogade 1')
+
+        self.assertEqual(len(claim_jobs(10)), 1)
+        # another worker does not take it while the lookup runs
+        self.assertEqual(claim_jobs(10), [])
+
+        self.make_due()
+        self.assertEqual(len(claim_jobs(10)), 1)
+
+    def test_retry_with_backoff(self):
+        address = create_pending_address(address='Vesterbrogade 1')
+
+        def fail(address):
+            return None, Exception('timed out')
+
+        for attempt, delay in ((1, 60), (2, 100)):
+            self.assertEqual(self.process(fail), 1)
+
+            job = AddressEnrichmentJob.objects.get(address=address)
+            self.assertEqual(job.attempts, attempt)
+            self.assertEqual(job.last_error, 'timed out')
+            self.assertAlmostEqual(
+                (job.next_attempt_at - timezone.now()).total_seconds(), delay, delta=5)
+
+            # not due until the backoff passed
+            self.assertEqual(self.process(fail), 0)
+            self.make_due()
+
+        self.assertEqual(self.process(fail), 1)
+
+        # the job is kept with the last error after the last attempt
+        address.refresh_from_db()
+        self.assertEqual(address.enrichment_status, EnrichmentStatus.FAILED)
+        self.assertEqual(AddressEnrichmentJob.objects.get(address=address).attempts, 3)
+
+        self.make_due()
+        self.assertEqual(self.process(fail), 0)
+
+    def test_duplicate_place_is_merged(self):
+        user = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+        geocoded = self.client_stub.geocode('Vesterbrogade 1')[0]
+
+        canonical = Address.objects.create(address=geocoded['formatted_address'], google_place_id=geocoded['place_id'])
+        address = create_pending_address(address='Vesterbrogade 1')
+        activity = Activity.objects.create(title='Run', user=user, address=address)
+
+        self.assertEqual(self.process(), 1)
+
+        activity.refresh_from_db()
+        self.assertEqual(activity.address_id, canonical.pk)
+        self.assertFalse(Address.objects.filter(pk=address.pk).exists())
+        self.assertFalse(AddressEnrichmentJob.objects.exists())
+
+
+class ExplainQueriesTests(TestCase):
+
+    def test_partial_indexes_are_dropped_and_restored(self):
+        out = StringIO()
+        call_command(
+            'explain_queries', users=50, groups=5, activities=200, requests=1000, posts=50, comments=200, stdout=out)
+
+        plans = {}
+        label = None
+
+        for line in out.getvalue().splitlines():
+            if not line.startswith(' '):
+                label = line
+            else:
+                title, indexes = line.strip().split(': ')
+                plans.setdefault(title, {})[label] = indexes.split(', ')
+
+        before = {index for indexes in plans['before'].values() for index in indexes}
+        after = {index for indexes in plans['after'].values() for index in indexes}
+
+        self.assertFalse(before.intersection(PARTIAL_INDEXES))
+        self.assertTrue(after.intersection(PARTIAL_INDEXES))
+        # other indexes stay, e.g. the keyset ones
+        self.assertIn('post_group_created_live', plans['before']['Group posts'])
+
+        # the seeded data and the dropped indexes are rolled back
+        self.assertFalse(Activity.objects.exists())
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Activity._meta.db_table)
+        self.assertIn('activity_public_time_live', constraints)
+
+
+class ModelSaveTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@gymder.com', password='password', username='owner')
+
+    def setUp(self):
+        self.group = Group.objects.create(title='Runners', user=self.user)
+
+    def test_partial_save_writes_updated_at(self):
+        updated_at = self.group.updated_at
+
+        self.group.public = False
+        self.group.title = 'Not saved'
+        self.group.save(update_fields=['public'])
+
+        group = Group.objects.get(pk=self.group.pk)
+        self.assertFalse(group.public)
+        self.assertEqual(group.title, 'Runners')
+        self.assertGreater(group.updated_at, updated_at)
+
+        with self.assertNumQueries(0):
+            self.group.save(update_fields=[])
+
+    def test_full_save_keeps_counters(self):
+        group = Group.objects.get(pk=self.group.pk)
+        # counted by another request meanwhile
+        Group.objects.filter(pk=group.pk).update(member_count=3)
+
+        group.title = 'Walkers'
+        group.save()
+
+        group.refresh_from_db()
+        self.assertEqual(group.title, 'Walkers')
+        self.assertEqual(group.member_count, 3)
+
+    def test_full_save_of_deferred_object(self):
+        group = Group.objects.only('title').get(pk=self.group.pk)
+        group.title = 'Walkers'
+
+        # deferred fields are neither loaded nor written
+        with CaptureQueriesContext(connection) as queries:
+            group.save()
+
+        update = queries.captured_queries[0]['sql']
+        self.assertTrue(update.startswith('UPDATE'))
+        self.assertNotIn('description', update)
+
+        self.assertEqual(Group.objects.get(pk=group.pk).title, 'Walkers')
+
+    def test_copies_are_inserted(self):
+        self.group.pk = None
+        self.group.uuid = uuid.uuid4()
+        self.group.save()
+
+        self.assertEqual(Group.objects.filter(title='Runners').count(), 2)
+
+
+class GeohashTests(SimpleTestCase):
+
+    def test_encode(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash.encode(42.6, -5.6, 5), 'ezs42')
+
+        # the edges of the world are in the last cells
+        self.assertEqual(geohash.encode(90, 180, 3), 'zzz')
+        self.assertEqual(geohash.encode(-90, -180, 3), '000')
+
+    def test_encode_many(self):
+        generator = random.Random(0)
+        latitudes = [generator.uniform(-90, 90) for i in range(200)] + [90, -90, 0]
+        longitudes = [generator.uniform(-180, 180) for i in range(200)] + [180, -180, 0]
+
+        self.assertEqual(
+            list(geohash.encode_many(latitudes, longitudes)),
+            [geohash.encode(latitude, longitude) for latitude, longitude in zip(latitudes, longitudes)])
+
+    def test_neighbours(self):
+        self.assertEqual(
+            sorted(geohash.neighbours('ezs42')),
+            ['ezefp', 'ezefr', 'ezefx', 'ezs40', 'ezs41', 'ezs43', 'ezs48', 'ezs49'])
+
+        # nothing above the north pole, the west wraps around the antimeridian
+        self.assertEqual(sorted(geohash.neighbours('b')), ['8', '9', 'c', 'x', 'z'])
+
+    def test_neighbours_across_the_antimeridian(self):
+        for precision in (3, 5, 7):
+            east = geohash.encode(10.5, 179.9999, precision)
+            west = geohash.encode(10.5, -179.9999, precision)
+
+            self.assertIn(west, geohash.neighbours(east))
+            self.assertIn(east, geohash.neighbours(west))
+
+    def test_cells_for_distance(self):
+        generator = random.Random(0)
+
+        # the last ones sit on cell edges and the antimeridian
+        centers = [(generator.uniform(-60, 60), generator.uniform(-180, 180)) for i in range(50)] + \
+            [(55.0, 11.25), (0.0, 0.0), (-33.75, 179.999), (10.0, -180.0)]
+
+        for latitude, longitude in centers:
+            for distance in (0.5, 5, 50):
+                cells = geohash.cells_for_distance(latitude, longitude, distance)
+                degrees = distance / KILOMETERS_PER_DEGREE
+
+                for angle in range(0, 360, 15):
+                    point_latitude = latitude + degrees * math.sin(math.radians(angle))
+                    point_longitude = longitude + \
+                        degrees * math.cos(math.radians(angle)) / math.cos(math.radians(point_latitude))
+                    point_longitude = (point_longitude + 180) % 360 - 180
+
+                    point = geohash.encode(point_latitude, point_longitude)
+                    self.assertTrue(any(point.startswith(cell) for cell in cells), (latitude, longitude, distance))
+
+
+class HaversineTests(SimpleTestCase):
+
+    def setUp(self):
+        generator = random.Random(0)
+
+        self.latitude, self.longitude = 55.676, 12.568
+        self.pks = list(range(1, 301))
+        generator.shuffle(self.pks)
+        self.latitudes = [self.latitude + generator.uniform(-0.5, 0.5) for pk in self.pks]
+        self.longitudes = [self.longitude + generator.uniform(-0.5, 0.5) for pk in self.pks]
+
+        # ties and the same point
+        self.latitudes[:3] = [self.latitudes[3]] * 3
+        self.longitudes[:3] = [self.longitudes[3]] * 3
+        self.latitudes[4], self.longitudes[4] = self.latitude, self.longitude
+
+        self.distances = [
+            get_distance_haversine(self.latitude, self.longitude, latitude, longitude)
+            for latitude, longitude in zip(self.latitudes, self.longitudes)]
+
+    def test_get_distances_haversine(self):
+        distances = get_distances_haversine(self.latitude, self.longitude, self.latitudes, self.longitudes)
+
+        for distance, expected in zip(distances, self.distances):
+            self.assertAlmostEqual(distance, expected, delta=1e-6)
+
+        # across the antimeridian and between the poles
+        for to_latitude, to_longitude in ((10, -179.5), (-90, 0), (90, 0)):
+            self.assertAlmostEqual(
+                get_distances_haversine(10, 179.5, [to_latitude], [to_longitude])[0],
+                get_distance_haversine(10, 179.5, to_latitude, to_longitude),
+                delta=1e-6)
+
+    def test_select_nearest(self):
+        distances = get_distances_haversine(self.latitude, self.longitude, self.latitudes, self.longitudes)
+        expected = sorted(range(len(distances)), key=lambda index: (distances[index], index))
+
+        self.assertEqual(list(select_nearest(distances, 10)), expected[:10])
+        self.assertEqual(list(select_nearest(distances, None)), expected)
+        self.assertEqual(list(select_nearest(distances, 0)), [])
+        self.assertEqual(
+            list(select_nearest(distances, 1000, radius=20000)),
+            [index for index in expected if distances[index] <= 20000])
+
+    def test_select_closest(self):
+        radius = 30000
+        expected = sorted(
+            (distance, pk) for pk, distance in zip(self.pks, self.distances) if distance <= radius)
+
+        closest = select_closest(
+            self.latitude, self.longitude, self.pks, self.latitudes, self.longitudes, radius)
+
+        self.assertEqual([pk for pk, distance in closest], [pk for distance, pk in expected])
+
+        # paging through the results visits every point once
+        seen = []
+        after = None
+
+        while True:
+            page = select_closest(
+                self.latitude, self.longitude, self.pks, self.latitudes, self.longitudes, radius, k=7, after=after)
+
+            if not page:
+                break
+
+            seen.extend(pk for pk, distance in page)
+            after = page[-1][1], page[-1][0]
+
+        self.assertEqual(seen, [pk for distance, pk in expected])
+
+
+class LRUCacheTests(SimpleTestCase):
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(2)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+
+        self.assertEqual(cache.get('a'), (True, 1))
+        cache.set('c', 3, 60)
+
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        self.assertEqual(cache.get('c'), (True, 3))
+
+    def test_values_expire(self):
+        cache = LRUCache(2)
+
+        with mock.patch('apps.utils.geocoding.time.monotonic', return_value=100):
+            cache.set('a', 1, 60)
+
+        with mock.patch('apps.utils.geocoding.time.monotonic', return_value=159):
+            self.assertEqual(cache.get('a'), (True, 1))
+
+        with mock.patch('apps.utils.geocoding.time.monotonic', return_value=160):
+            self.assertEqual(cache.get('a'), (False, None))
+
+
+class GeocodingCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = GeocodingCache(size=10, ttl=3600, negative_ttl=60)
+        self.fetch = mock.Mock(return_value=[{'place_id': 'place'}])
+
+    def get_expiry(self, key):
+        """ Seconds until the stored entry expires """
+        return (GeocodingCacheEntry.objects.get(key=key).expires_at - timezone.now()).total_seconds()
+
+    def test_memory_then_database(self):
+        self.assertEqual(self.cache.get_or_fetch('key', self.fetch), [{'place_id': 'place'}])
+        self.assertAlmostEqual(self.get_expiry('key'), 3600, delta=5)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_or_fetch('key', self.fetch), [{'place_id': 'place'}])
+
+        # another worker only finds it in the database
+        self.cache.memory.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get_or_fetch('key', self.fetch), [{'place_id': 'place'}])
+
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_expired_entries_are_fetched_again(self):
+        self.cache.get_or_fetch('key', self.fetch)
+        GeocodingCacheEntry.objects.update(expires_at=timezone.now())
+        self.cache.memory.clear()
+
+        self.cache.get_or_fetch('key', self.fetch)
+
+        self.assertEqual(self.fetch.call_count, 2)
+        self.assertAlmostEqual(self.get_expiry('key'), 3600, delta=5)
+
+    def test_empty_responses_are_kept_shorter(self):
+        self.fetch.return_value = []
+
+        self.assertEqual(self.cache.get_or_fetch('key', self.fetch), [])
+        self.assertEqual(self.cache.get_or_fetch('key', self.fetch), [])
+
+        self.assertEqual(self.fetch.call_count, 1)
+        self.assertAlmostEqual(self.get_expiry('key'), 60, delta=5)
+
+    def test_failures_are_not_cached(self):
+        self.fetch.side_effect = [Exception('over query limit'), [{'place_id': 'place'}]]
+
+        with self.assertRaises(Exception):
+            self.cache.get_or_fetch('key', self.fetch)
+
+        self.assertFalse(GeocodingCacheEntry.objects.exists())
+        self.assertEqual(self.cache.get_or_fetch('key', self.fetch), [{'place_id': 'place'}])
+
+    def test_failed_geocode_is_logged(self):
+        client = mock.Mock()
+        client.geocode.side_effect = Exception('over query limit')
+
+        with mock.patch('apps.utils.geocoding.geocoding_cache', self.cache), \
+                mock.patch('apps.utils.geocoding.get_client', return_value=client), \
+                self.assertLogs('apps.utils.geocoding', 'ERROR'):
+            self.assertIsNone(geocoding.geocode('Vesterbrogade 1'))
+
+            with self.assertRaises(Exception):
+                geocoding.geocode('Vesterbrogade 1', raise_errors=True)
+
+
+class GeocodeManyTests(SimpleTestCase):
+
+    def test_responses_keep_the_order_of_queries(self):
+        def geocode(query):
+            # the first queries finish last
+            time.sleep(0.01 * (3 - int(query)))
+            return [query]
+
+        with mock.patch('apps.utils.geocoding.geocode', side_effect=geocode):
+            self.assertEqual(geocode_many(['0', '1', '2', '3'], timeout=5), [['0'], ['1'], ['2'], ['3']])
+
+    def test_slow_lookups_are_left_behind(self):
+        release = threading.Event()
+
+        def geocode(query):
+            if query == 'slow':
+                release.wait(5)
+            return [query]
+
+        try:
+            with mock.patch('apps.utils.geocoding.geocode', side_effect=geocode), \
+                    self.assertLogs('apps.utils.geocoding', 'WARNING'):
+                started = time.monotonic()
+                responses = geocode_many(['fast', 'slow', 'other'], timeout=0.2)
+
+                self.assertLess(time.monotonic() - started, 2)
+        finally:
+            release.set()
+
+        self.assertEqual(responses, [['fast'], None, ['other']])
+
+
+class SimilarAddressesTests(TestCase):
+
+    def setUp(self):
+        self.client_stub = StubGeocodingClient()
+        # variants naming the same place
+        self.aliases = {'vesterbrogade 1 copenhagen': 'Vesterbrogade 1'}
+
+        patcher = mock.patch('apps.utils.geocoding.geocode', side_effect=self.geocode)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def geocode(self, query):
+        if query == 'failing':
+            return None
+
+        return self.client_stub.geocode(self.aliases.get(query, query))
+
+    def place_id(self, query):
+        return self.client_stub.geocode(query)[0]['place_id']
+
+    def find(self, **kwargs):
+        return get_similar_addresses(
+            'Vesterbrogade 1',
+            variants=['Vesterbrogade 1', 'failing', 'Istedgade 2', 'vesterbrogade 1 copenhagen', ' '],
+            **kwargs)
+
+    def test_matches_are_unique_in_the_order_of_queries(self):
+        existing = Address.objects.create(address='Istedgade 2', google_place_id=self.place_id('Istedgade 2'))
+
+        addresses = self.find()
+
+        self.assertEqual(
+            [address.google_place_id for address in addresses],
+            [self.place_id('Vesterbrogade 1'), self.place_id('Istedgade 2')])
+
+        # stored places are reused, new ones saved with their geohash
+        self.assertEqual(addresses[1].pk, existing.pk)
+        self.assertEqual(Address.objects.count(), 2)
+
+        address = Address.objects.get(google_place_id=self.place_id('Vesterbrogade 1'))
+        self.assertEqual(address.city, 'Copenhagen')
+        self.assertIsNotNone(address.geohash)
+
+        # found again without duplicates
+        self.assertEqual([address.pk for address in self.find()], [address.pk, existing.pk])
+        self.assertEqual(Address.objects.count(), 2)
+
+    def test_matches_are_not_persisted(self):
+        addresses = self.find(persist=False)
+
+        self.assertEqual(len(addresses), 2)
+        self.assertTrue(all(address.pk is None and address.uuid is None for address in addresses))
+        self.assertFalse(Address.objects.exists())
+
+    def test_only_the_selected_place_is_saved(self):
+        addresses = self.find(place_id=self.place_id('Istedgade 2'))
+
+        self.assertEqual([address.address for address in addresses], ['Istedgade 2, Copenhagen, Denmark'])
+        self.assertEqual(
+            list(Address.objects.values_list('google_place_id', flat=True)), [self.place_id('Istedgade 2')])
+
+
+class ReverseGeocoderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.geocoder = ReverseGeocoder(
+            path=settings.OFFLINE_GEOCODER_DATASET, max_distance=settings.OFFLINE_GEOCODER_MAX_DISTANCE)
+
+    def test_closest_city(self):
+        place = self.geocoder.resolve(Decimal('55.68'), Decimal('12.57'))
+
+        self.assertEqual((place['city'], place['country'], place['country_short']), ('Copenhagen', 'Denmark', 'DK'))
+        self.assertLess(place['distance'], 1)
+
+        self.assertEqual(self.geocoder.resolve(-33.87, 151.21)['city'], 'Sydney')
+        self.assertEqual(self.geocoder.resolve(-36.85, 174.76)['country_short'], 'NZ')
+
+    def test_far_from_every_city(self):
+        # the middle of the Pacific
+        self.assertIsNone(self.geocoder.resolve(0, -140))
+        self.assertIsNone(self.geocoder.resolve(-90, 0))
+
+    def test_tree_finds_the_closest_place(self):
+        places = load_places(settings.OFFLINE_GEOCODER_DATASET)
+        points = [to_vector(place[3], place[4]) for place in places]
+        tree = KDTree(points)
+
+        generator = random.Random(0)
+
+        for i in range(200):
+            point = to_vector(generator.uniform(-90, 90), generator.uniform(-180, 180))
+            distances = [sum((a - b) ** 2 for a, b in zip(point, other)) for other in points]
+
+            index, distance = tree.nearest(point)
+            self.assertAlmostEqual(distance, min(distances))
+            self.assertEqual(distances[index], distance)
+
+        self.assertEqual(KDTree([]).nearest(point), (None, None))
@@ -1,6 +1,77 @@
+from rest_framework import status
+from rest_framework.response import Response
+
+from .conditional import etag_matches, get_etag
+
+
 class PutPatchMixin(object):
     def put(self, request, *args, **kwargs):
         return self.post(request, *args, **kwargs)
 
     def put(self, request, *args, **kwargs):
         return self.post(request, *args, **kwargs)
+
+
+class PrefetchPlanViewMixin(object):
+    """
+    Loads the relations declared by the serializer for list views
+    Serializer has to use `apps.utils.serializers_mixins.PrefetchPlanMixin`
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+
+        return self.get_serializer_class().prepare_queryset(queryset)
+
+
+class FastListMixin(object):
+    """
+    Lists with `fast_serializer_class` built from `.values()` rows, see `apps.utils.fast_serializers`
+    `serializer_class` is still used for everything else
+    """
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.fast_serializer_class()
+
+        # keyset pagination reads the ordering from the rows
+        ordering = [lookup.lstrip('-') for lookup in getattr(self, 'ordering', ())]
+        rows = serializer.get_rows(self.get_queryset(), extra=ordering)
+
+        page = self.paginate_queryset(rows)
+
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+
+        return Response(serializer.serialize(list(rows)))
+
+
+class ConditionalGetMixin(object):
+    """
+    Conditional GETs of a single object with strong ETags
+
+    `get_version_annotations()` returns annotations of what the representation depends on besides
+    the object's own `updated_at`, e.g. the latest `updated_at` of related rows, see `apps.utils.conditional`.
+    Load the object with `with_versions(queryset)` and answer with `get_conditional_response`,
+    a client sending the current ETag in `If-None-Match` gets a 304 before anything is serialized
+    """
+
+    def get_version_annotations(self):
+        return {}
+
+    def with_versions(self, queryset):
+        return queryset.annotate(**self.get_version_annotations())
+
+    def get_etag(self, request, obj):
+        versions = [getattr(obj, name) for name in sorted(self.get_version_annotations())]
+
+        # representations may depend on the user
+        return get_etag(type(self).__name__, request.user.pk, obj.pk, obj.updated_at, *versions)
+
+    def get_conditional_response(self, request, obj, get_data):
+        """ 304 when the client has the current version, otherwise `get_data()` """
+        etag = self.get_etag(request, obj)
+
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        return Response(data=get_data(), headers={'ETag': etag})
@@ -16,7 +16,11 @@ Including another URLconf
 from django.conf.urls import url, include
 from django.contrib import admin
 
+from apps.activities.views import WarmupView
+
 urlpatterns = [
+    url(r'^_ah/warmup$', WarmupView.as_view(), name='warmup'),
+
     url(r'^api/', include(('apps.api.urls', 'api'), namespace='api')),
     
     url(r'^admin/', admin.site.urls),
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.utils.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -104,6 +105,10 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Page size of the list endpoints, clients can ask for up to the max with `page_size`
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
 # Override authentication model
 
 AUTH_USER_MODEL = 'users.User'
@@ -141,12 +146,112 @@ GOOGLE_MAPS_API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', None)
 if GOOGLE_MAPS_API_KEY:
     GOOGLE_MAPS_API = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
 
+# Geocoding client used instead of Google Maps, e.g. 'apps.utils.geocoding.StubGeocodingClient'
+GEOCODING_CLIENT = os.environ.get('GEOCODING_CLIENT', None)
+GEOCODING_CLIENT_OPTIONS = {}
+
+# Geocoding responses are cached in memory and in the database
+# TTLs are in seconds, empty responses are kept for the negative TTL
+# Reverse lookups share the cache when coordinates match to the precision (decimal places)
+GEOCODING_CACHE_SIZE = 1000
+GEOCODING_CACHE_TTL = 30 * 24 * 60 * 60
+GEOCODING_NEGATIVE_CACHE_TTL = 60 * 60
+GEOCODING_REVERSE_PRECISION = 4
+
+# Address lookups geocode query variants concurrently and wait for them up to the timeout (seconds)
+GEOCODING_WORKERS = 4
+GEOCODING_TIMEOUT = 2
+GEOCODING_MAX_VARIANTS = 5
+
+# Offline reverse geocoding of coordinates to the closest city within the distance (kilometers)
+# Accepts the bundled CSV or a GeoNames cities dump, e.g. cities15000.txt
+OFFLINE_GEOCODER_DATASET = os.path.join(BASE_DIR, 'apps', 'utils', 'data', 'cities.csv')
+OFFLINE_GEOCODER_MAX_DISTANCE = 50
+
+# Save addresses without waiting for Google and geocode them with the enrich_addresses command
+# Only enable where the command runs, failed attempts are retried after the backoff doubled every time (seconds)
+# Addresses taken by a command are left to it for the lease (seconds), longer than geocoding a batch takes
+ADDRESS_ENRICHMENT_DEFERRED = False
+ADDRESS_ENRICHMENT_MAX_ATTEMPTS = 8
+ADDRESS_ENRICHMENT_LEASE = 5 * 60
+ADDRESS_ENRICHMENT_BACKOFF = 60
+ADDRESS_ENRICHMENT_MAX_BACKOFF = 6 * 60 * 60
+
+# Addresses without Google place id are the same place when coordinates match to the precision (decimal places)
+# Run merge_duplicate_addresses after changing it
+ADDRESS_COORDINATES_PRECISION = 4
+
+# Location history from nearby searches
+# Pings are buffered in memory and written together once the interval (seconds) or size is reached
+LOCATION_HISTORY_ENABLED = True
+LOCATION_PING_FLUSH_INTERVAL = 30
+LOCATION_PING_FLUSH_SIZE = 100
+
+# Read activity visibility from the table maintained on saves instead of joining requests and memberships
+# Run check_activity_visibility to compare the table with the source tables
+ACTIVITY_VISIBILITY_MATERIALIZED = True
+
+# Cache shared by all the workers, e.g. Memorystore for Memcached on App Engine ('host:port')
+# Without it every process keeps its own cache in memory
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', None)
+
+if CACHE_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION,
+        }
+    }
+
+# Values which saves in other processes invalidate (group roles, page contexts, activity index versions)
+# are only cached when the cache is shared, see `apps.utils.shared_cache`.
+# Set to True when a single process serves the requests, e.g. the development server
+LOCAL_CACHE_IS_SHARED = False
+
+# Group memberships of each user are cached for the permission checks (seconds)
+# Only with a shared cache, otherwise they are loaded on every request
+GROUP_ROLES_CACHE_TIMEOUT = 60 * 60
+
+# JS contexts of the pages overriding get_cache_scopes are cached per user (seconds), only with a shared cache
+# Saves invalidate the scopes they change. The timeout bounds pages which change with time, e.g. upcoming
+# activities becoming past ones, and details of related rows, e.g. the names of other users
+PAGE_CONTEXT_CACHE_TIMEOUT = 5 * 60
+
+# Text search configuration of the activity search vectors (Postgres only)
+# Run update_search_vectors after changing it
+ACTIVITY_SEARCH_CONFIG = 'english'
+
+# In-process index of public upcoming activities used by the nearby searches, built by the warmup request
+# Rebuilt in the background once older than the max age (seconds), which bounds how long saves made
+# in other workers are missed. rebuild_activity_index reaches the workers through a shared cache only,
+# they read its version at most every check interval (seconds)
+ACTIVITY_INDEX_ENABLED = True
+ACTIVITY_INDEX_MAX_AGE = 300
+ACTIVITY_INDEX_CHECK_INTERVAL = 10
+
+# Query count, database time and duplicate queries of every request in X-DB-* response headers
+QUERY_COUNT_HEADERS = DEBUG
+
+# Maximum number of queries per route (view name, '<method> <view name>' for writes), checked by apps.api.tests
+# Requests over the budget are logged as warnings by apps.utils.middleware when the headers are enabled
+QUERY_BUDGET_DEFAULT = 8
+QUERY_BUDGETS = {
+    'api:requests': 12,
+    # writes lock rows, update the counters and the visibility table,
+    # the tests also count the savepoints of the transactions they run in
+    'POST api:activity-requests': 15,
+    'POST api:requests': 17,
+    'DELETE api:requests': 16,
+    'POST api:groups-memberships': 15,
+}
+
 LOGIN_URL = '/users/login/'
 
 LOGIN_REDIRECT_URL = '/users/profile/'
 
 LOGIN_EXEMPT_URLS = (
     r'^$',
+    r'^_ah/',
     r'^users/logout/$',
     r'^users/register/$',
     r'^api/',
@@ -154,6 +259,7 @@ LOGIN_EXEMPT_URLS = (
 )
 
 ALLOW_ALL_URLS = (
+    r'^_ah/',
     r'^api/',
     r'^m/',
 )
@@ -14,6 +14,9 @@ DATABASES = {
 
 STATIC_URL = '/static/'
 
+# runserver is a single process
+LOCAL_CACHE_IS_SHARED = True
+
 # STATIC_ROOT = 'static'
 
 STATICFILES_DIRS = (